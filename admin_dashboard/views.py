@@ -50,6 +50,7 @@ def admin_dashboard(request):
 
     # Chat statistics
     active_chats = ChatRoom.objects.filter(is_active=True).count()
+    # Site-wide: every unread message not sent by this admin, whichever room it is in
     unread_messages = Message.objects.filter(is_read=False).exclude(sender=request.user).count()
 
     # User list with pagination and search
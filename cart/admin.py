@@ -1,3 +1,18 @@
 from django.contrib import admin
+from .models import Cart, CartItem
 
-# Register your models here.
+
+class CartItemInline(admin.TabularInline):
+    model = CartItem
+    raw_id_fields = ('product',)
+    extra = 0
+
+
+class CartAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'user', 'created_at', 'updated_at')
+    search_fields = ('user__email', 'session_key')
+    raw_id_fields = ('user',)
+    inlines = [CartItemInline]
+
+
+admin.site.register(Cart, CartAdmin)
@@ -1,5 +1,8 @@
+from django.utils.functional import SimpleLazyObject
+
 from .utils import SessionCart
 
 
 def cart(request):
-    return {'cart': SessionCart(request)}
+    # Same instance the views use, so the page loads the cart's products only once
+    return {'cart': SimpleLazyObject(lambda: SessionCart.for_request(request))}
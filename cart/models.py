@@ -14,6 +14,9 @@ class Cart(models.Model):
         verbose_name = "Cart"
         verbose_name_plural = "Carts"
         unique_together = (('user', 'session_key'),)
+        constraints = [
+            models.UniqueConstraint(fields=['user'], condition=models.Q(user__isnull=False), name='cart_one_per_user'),
+        ]
 
     def __str__(self):
         if self.user:
@@ -0,0 +1,9 @@
+from django.contrib.auth.signals import user_logged_in
+from django.dispatch import receiver
+from .stores import get_cart_store
+
+
+@receiver(user_logged_in)
+def merge_anonymous_cart(sender, request, user, **kwargs):
+    if request is not None and hasattr(request, 'session'):
+        get_cart_store(request, user).merge_anonymous()
@@ -0,0 +1,193 @@
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils.module_loading import import_string
+
+from .models import Cart, CartItem
+
+
+class BaseCartStore:
+    """
+    Where a visitor's cart lives. `load()` returns {product id (str): {'quantity': int,
+    'price': str}}; writes touch a single item rather than re-saving the whole cart.
+    Anonymous carts are found through a reference kept in the session, which survives
+    the session key change on login so `merge_anonymous()` can fold them into the user's.
+    """
+
+    def __init__(self, request, user=None):
+        self.request = request
+        self.session = request.session
+        self.user = user or request.user
+
+    @property
+    def is_authenticated(self):
+        return self.user.is_authenticated
+
+    def session_reference(self):
+        reference = self.session.get(settings.CART_SESSION_ID)
+        # Sessions from before carts moved out of the session hold the whole cart dict
+        return None if isinstance(reference, dict) else reference
+
+    def load(self):
+        raise NotImplementedError
+
+    def add(self, product_id, quantity, price, replace=False):
+        raise NotImplementedError
+
+    def remove(self, product_id):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def merge_anonymous(self):
+        """Move the anonymous cart referenced by the session into the logged-in user's cart."""
+        raise NotImplementedError
+
+
+class DatabaseCartStore(BaseCartStore):
+    """Cart and CartItem rows, one upsert per changed item."""
+
+    def __init__(self, request, user=None):
+        super().__init__(request, user)
+        self._cart_id = None
+
+    def items(self):
+        if self.is_authenticated:
+            return CartItem.objects.filter(cart__user=self.user)
+        cart_id = self.session_reference()
+        if cart_id is None:
+            return CartItem.objects.none()
+        return CartItem.objects.filter(cart_id=cart_id, cart__user__isnull=True)
+
+    def load(self):
+        return {
+            str(product_id): {'quantity': quantity, 'price': str(price)}
+            for product_id, quantity, price in self.items().order_by('added_at', 'pk').values_list(
+                'product_id', 'quantity', 'price'
+            )
+        }
+
+    def get_cart_id(self):
+        if self._cart_id is None:
+            if self.is_authenticated:
+                self._cart_id = self.get_user_cart_id(self.user)
+            else:
+                self._cart_id = self.session_reference()
+                if self._cart_id is None or not Cart.objects.filter(pk=self._cart_id, user__isnull=True).exists():
+                    if self.session.session_key is None:
+                        self.session.save()
+                    self._cart_id = Cart.objects.create(session_key=self.session.session_key).pk
+                    self.session[settings.CART_SESSION_ID] = self._cart_id
+        return self._cart_id
+
+    @staticmethod
+    def get_user_cart_id(user):
+        cart = Cart.objects.filter(user=user).only('pk').first()
+        if cart is None:
+            try:
+                with transaction.atomic():
+                    cart = Cart.objects.create(user=user)
+            except IntegrityError:
+                cart = Cart.objects.get(user=user)
+        return cart.pk
+
+    @staticmethod
+    def upsert_item(cart_id, product_id, quantity, price, replace=False):
+        items = CartItem.objects.filter(cart_id=cart_id, product_id=product_id)
+        change = {'quantity': quantity} if replace else {'quantity': F('quantity') + quantity}
+        if items.update(**change):
+            return
+        try:
+            with transaction.atomic():
+                CartItem.objects.create(cart_id=cart_id, product_id=product_id, quantity=quantity, price=price)
+        except IntegrityError:
+            # Added concurrently (double click), apply the change to that row
+            items.update(**change)
+
+    def add(self, product_id, quantity, price, replace=False):
+        self.upsert_item(self.get_cart_id(), product_id, quantity, price, replace)
+
+    def remove(self, product_id):
+        self.items().filter(product_id=product_id).delete()
+
+    def clear(self):
+        self.items().delete()
+
+    def merge_anonymous(self):
+        cart_id = self.session_reference()
+        self.session.pop(settings.CART_SESSION_ID, None)
+        if cart_id is None:
+            return
+        anonymous = CartItem.objects.filter(cart_id=cart_id, cart__user__isnull=True)
+        user_cart_id = self.get_user_cart_id(self.user)
+        for product_id, quantity, price in anonymous.values_list('product_id', 'quantity', 'price'):
+            self.upsert_item(user_cart_id, product_id, quantity, price)
+        Cart.objects.filter(pk=cart_id, user__isnull=True).delete()
+
+
+class CacheCartStore(BaseCartStore):
+    """
+    Carts kept in the shared cache (e.g. Redis) under one key per cart, for sites
+    that would rather not write cart rows to the database. Only the cart itself is
+    rewritten on change, never the session.
+    """
+    timeout = 60 * 60 * 24 * 30
+
+    def cache_key(self, owner=None):
+        return f'cart:{owner or self.owner()}'
+
+    def owner(self, create=False):
+        if self.is_authenticated:
+            return f'user:{self.user.pk}'
+        token = self.session_reference()
+        if token is None and create:
+            token = uuid.uuid4().hex
+            self.session[settings.CART_SESSION_ID] = token
+        return f'anon:{token}' if token else None
+
+    def load(self):
+        owner = self.owner()
+        return cache.get(self.cache_key(owner), {}) if owner else {}
+
+    def write(self, items, owner=None):
+        cache.set(self.cache_key(owner), items, self.timeout)
+
+    def add(self, product_id, quantity, price, replace=False):
+        owner = self.owner(create=True)
+        items = cache.get(self.cache_key(owner), {})
+        item = items.setdefault(str(product_id), {'quantity': 0, 'price': str(price)})
+        item['quantity'] = quantity if replace else item['quantity'] + quantity
+        self.write(items, owner)
+
+    def remove(self, product_id):
+        items = self.load()
+        if items.pop(str(product_id), None) is not None:
+            self.write(items)
+
+    def clear(self):
+        owner = self.owner()
+        if owner:
+            cache.delete(self.cache_key(owner))
+
+    def merge_anonymous(self):
+        token = self.session_reference()
+        self.session.pop(settings.CART_SESSION_ID, None)
+        if token is None:
+            return
+        anonymous = cache.get(self.cache_key(f'anon:{token}'), {})
+        if anonymous:
+            items = self.load()
+            for product_id, item in anonymous.items():
+                merged = items.setdefault(product_id, {'quantity': 0, 'price': item['price']})
+                merged['quantity'] += item['quantity']
+            self.write(items)
+        cache.delete(self.cache_key(f'anon:{token}'))
+
+
+def get_cart_store(request, user=None):
+    store_path = getattr(settings, 'CART_STORE', 'cart.stores.DatabaseCartStore')
+    return import_string(store_path)(request, user)
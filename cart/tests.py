@@ -1,3 +1,136 @@
-from django.test import TestCase
+from decimal import Decimal
 
-# Create your tests here.
+from dataclasses import FrozenInstanceError
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from chat.models import ChatRoom
+from products.models import Category, Product
+from users.models import CustomUser
+from .models import Cart, CartItem
+from .utils import SessionCart
+
+
+class CartStoreTestMixin:
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Football')
+        cls.jersey = Product.objects.create(
+            name='Home Jersey', category=category, sku='J-1', price=1500, discount_price=1200, description='Kit',
+        )
+        cls.boots = Product.objects.create(
+            name='Boots', category=category, sku='B-1', price=3000, description='Boots',
+        )
+        cls.user = CustomUser.objects.create_user(username='fan', email='fan@example.com', password='pass')
+        # The navbar links to the user's support chat room
+        staff = CustomUser.objects.create_user(
+            username='staff', email='staff@example.com', password='pass', is_staff=True
+        )
+        ChatRoom.objects.create(user=cls.user, admin=staff)
+
+    def add(self, product, quantity=1, update=False):
+        data = {'quantity': quantity}
+        if update:
+            data['update'] = 'true'
+        return self.client.post(reverse('cart_add', args=[product.pk]), data)
+
+    def cart_contents(self):
+        cart = self.client.get(reverse('cart_detail')).context['cart']
+        return {item['product'].sku: (item['quantity'], item['price']) for item in cart}
+
+    def test_add_update_remove(self):
+        self.client.force_login(self.user)
+        self.add(self.jersey)
+        self.add(self.jersey, 2)
+        self.add(self.boots)
+        self.assertEqual(self.cart_contents(), {'J-1': (3, Decimal('1200.00')), 'B-1': (1, Decimal('3000.00'))})
+
+        self.add(self.jersey, 1, update=True)
+        self.client.post(reverse('cart_remove', args=[self.boots.pk]))
+        self.assertEqual(self.cart_contents(), {'J-1': (1, Decimal('1200.00'))})
+
+        self.client.get(reverse('cart_clear'))
+        self.assertEqual(self.cart_contents(), {})
+
+    def test_anonymous_cart_is_merged_on_login(self):
+        self.client.force_login(self.user)
+        self.add(self.jersey)
+        self.client.logout()
+
+        self.add(self.jersey, 2)
+        self.add(self.boots)
+        self.client.force_login(self.user)
+        self.assertEqual(self.cart_contents(), {'J-1': (3, Decimal('1200.00')), 'B-1': (1, Decimal('3000.00'))})
+
+
+class DatabaseCartStoreTests(CartStoreTestMixin, TestCase):
+    def test_changes_do_not_rewrite_the_session(self):
+        self.add(self.jersey)
+        session = Session.objects.get()
+        modified = session.expire_date
+        self.add(self.jersey)
+        self.add(self.boots)
+        self.assertEqual(Session.objects.get().expire_date, modified)
+        self.assertEqual(CartItem.objects.get(product=self.jersey).quantity, 2)
+        self.assertEqual(Cart.objects.count(), 1)
+
+    def test_merge_removes_anonymous_cart(self):
+        self.add(self.boots)
+        self.client.force_login(self.user)
+        self.assertEqual(list(Cart.objects.values_list('user', flat=True)), [self.user.pk])
+        self.assertNotIn(settings.CART_SESSION_ID, self.client.session)
+
+
+class CartSnapshotTests(CartStoreTestMixin, TestCase):
+    def product_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [q['sql'] for q in queries if 'FROM "products_product"' in q['sql']]
+
+    def test_products_are_loaded_once_per_page(self):
+        self.client.force_login(self.user)
+        self.add(self.jersey, 2)
+        self.add(self.boots)
+        # Navbar badge, line items and totals all read the same snapshot
+        self.assertEqual(len(self.product_queries(reverse('cart_detail'))), 1)
+        self.assertEqual(len(self.product_queries(reverse('order_create'))), 1)
+
+    def test_snapshot_totals_and_invalidation(self):
+        self.client.force_login(self.user)
+        self.add(self.jersey, 2)
+        request = self.client.get(reverse('cart_detail')).wsgi_request
+        cart = SessionCart.for_request(request)
+        self.assertIs(SessionCart.for_request(request), cart)
+
+        snapshot = cart.snapshot()
+        self.assertEqual((snapshot.total_price, snapshot.total_quantity), (Decimal('2400.00'), 2))
+        self.assertIs(cart.snapshot(), snapshot)
+        with self.assertRaises(FrozenInstanceError):
+            snapshot.lines[0].quantity = 5
+
+        cart.add(self.boots)
+        self.assertEqual(cart.get_total_price(), Decimal('5400.00'))
+        self.assertEqual(len(cart), 3)
+        self.assertEqual(snapshot.total_quantity, 2)
+
+    def test_deleted_products_are_skipped(self):
+        self.client.force_login(self.user)
+        self.add(self.jersey)
+        self.add(self.boots)
+        Product.objects.filter(pk=self.boots.pk).delete()
+        self.assertEqual(self.cart_contents(), {'J-1': (1, Decimal('1200.00'))})
+
+
+@override_settings(CART_STORE='cart.stores.CacheCartStore')
+class CacheCartStoreTests(CartStoreTestMixin, TestCase):
+    def test_no_cart_rows_are_written(self):
+        self.add(self.jersey)
+        self.client.force_login(self.user)
+        self.add(self.boots)
+        self.assertFalse(Cart.objects.exists())
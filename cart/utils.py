@@ -1,57 +1,114 @@
+from dataclasses import dataclass
 from decimal import Decimal
 
-from django.conf import settings
-from .models import Cart, CartItem
+from core.lazy_context import request_memo
+
+from .stores import get_cart_store
+
+
+@dataclass(frozen=True)
+class CartLine:
+    """One product in the cart. Also readable as item['product'] etc. like the old dicts."""
+    product: object
+    quantity: int
+    price: Decimal
+    total_price: Decimal
+
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+
+@dataclass(frozen=True)
+class CartSnapshot:
+    """The cart's lines with their products loaded, and the totals worked out once."""
+    lines: tuple = ()
+    total_price: Decimal = Decimal('0.00')
+    total_quantity: int = 0
+
+    @classmethod
+    def build(cls, items):
+        from products.models import Product
+        products = Product.objects.in_bulk([int(product_id) for product_id in items])
+        lines = []
+        for product_id, item in items.items():
+            product = products.get(int(product_id))
+            if product is None:
+                # Deleted since it was added to the cart
+                continue
+            price = Decimal(item['price'])
+            lines.append(CartLine(product, item['quantity'], price, price * item['quantity']))
+        return cls(
+            lines=tuple(lines),
+            total_price=sum((line.total_price for line in lines), Decimal('0.00')),
+            total_quantity=sum(line.quantity for line in lines),
+        )
+
+    def __iter__(self):
+        return iter(self.lines)
+
+    def __len__(self):
+        return self.total_quantity
 
 
 class SessionCart:
+    """
+    The visitor's cart. Despite the name the items no longer live in the session:
+    they are kept by the configured cart store (settings.CART_STORE, Cart/CartItem
+    rows by default), and each change writes only the item that changed.
+    """
+
     def __init__(self, request):
-        self.session = request.session
-        cart = self.session.get(settings.CART_SESSION_ID)
-        if not cart:
-            cart = self.session[settings.CART_SESSION_ID] = {}
-        self.cart = cart
+        self.store = get_cart_store(request)
+        self._cart = None
+        self._snapshot = None
+
+    @classmethod
+    def for_request(cls, request):
+        """The cart shared by the views, templates and context processor of one request."""
+        return request_memo(request, 'cart', lambda: cls(request))
+
+    @property
+    def cart(self):
+        # Loaded on first use, so building a cart that is never read costs nothing
+        if self._cart is None:
+            self._cart = self.store.load()
+        return self._cart
+
+    def snapshot(self):
+        """The cart's lines and totals, with all products fetched in a single query."""
+        if self._snapshot is None:
+            self._snapshot = CartSnapshot.build(self.cart) if self.cart else CartSnapshot()
+        return self._snapshot
+
+    def _changed(self, items=None):
+        self._cart = items
+        self._snapshot = None
 
     def add(self, product, quantity=1, update_quantity=False):
-        product_id = str(product.id)
-        if product_id not in self.cart:
-            self.cart[product_id] = {
-                'quantity': 0,
-                'price': str(product.discount_price)
-            }
-        if update_quantity:
-            self.cart[product_id]['quantity'] = quantity
-        else:
-            self.cart[product_id]['quantity'] += quantity
-        self.save()
+        price = product.discount_price if product.discount_price is not None else product.price
+        self.store.add(product.id, quantity, price, replace=update_quantity)
+        self._changed()
 
     def save(self):
-        self.session.modified = True
+        # Every change is written by the store as it happens
+        pass
 
     def remove(self, product):
-        product_id = str(product.id)
-        if product_id in self.cart:
-            del self.cart[product_id]
-            self.save()
+        self.store.remove(product.id)
+        self._changed()
 
     def __iter__(self):
-        from products.models import Product
-        product_ids = self.cart.keys()
-        products = Product.objects.filter(id__in=product_ids)
-        cart = self.cart.copy()
-        for product in products:
-            cart[str(product.id)]['product'] = product
-        for item in cart.values():
-            item['price'] = Decimal(item['price'])
-            item['total_price'] = item['price'] * item['quantity']
-            yield item
+        return iter(self.snapshot())
 
     def __len__(self):
+        # The navbar badge only needs the quantities, not the products
+        if self._snapshot is not None:
+            return self._snapshot.total_quantity
         return sum(item['quantity'] for item in self.cart.values())
 
     def get_total_price(self):
-        return sum(Decimal(item['price']) * item['quantity'] for item in self.cart.values())
+        return self.snapshot().total_price
 
     def clear(self):
-        del self.session[settings.CART_SESSION_ID]
-        self.save()
+        self.store.clear()
+        self._changed({})
@@ -6,7 +6,7 @@ from django.views.decorators.http import require_POST
 
 @require_POST
 def cart_add(request, product_id):
-    cart = SessionCart(request)
+    cart = SessionCart.for_request(request)
     product = get_object_or_404(Product, id=product_id)
     quantity = int(request.POST.get('quantity', 1))
     update_quantity = request.POST.get('update', False) == 'true'
@@ -21,18 +21,18 @@ def cart_add(request, product_id):
 
 @require_POST
 def cart_remove(request, product_id):
-    cart = SessionCart(request)
+    cart = SessionCart.for_request(request)
     product = get_object_or_404(Product, id=product_id)
     cart.remove(product)
     return redirect('cart_detail')
 
 
 def cart_detail(request):
-    cart = SessionCart(request)
+    cart = SessionCart.for_request(request)
     return render(request, 'cart/detail.html', {'cart': cart})
 
 
 def cart_clear(request):
-    cart = SessionCart(request)
+    cart = SessionCart.for_request(request)
     cart.clear()
     return redirect('cart_detail')
@@ -1,8 +1,11 @@
 from chat.models import ChatRoom
-from django.shortcuts import redirect
+from core.lazy_context import lazy_context
 
 
 def get_chat_room(request):
-    if request.user.is_authenticated:
-        return {'chat_room_id': ChatRoom.objects.filter(user=request.user).first()}
-    return {}
+    def chat_room():
+        if request.user.is_authenticated:
+            return ChatRoom.objects.filter(user=request.user).first()
+        return None
+
+    return {'chat_room_id': lazy_context(request, 'chat_room', chat_room)}
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import Q
 from users.models import CustomUser
 
 
@@ -24,5 +25,25 @@ class Message(models.Model):
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Conversation history, oldest first
+            models.Index(fields=['chat_room', 'created_at'], name='message_room_created_idx'),
+            # Unread messages not sent by the viewer
+            models.Index(fields=['sender'], condition=Q(is_read=False), name='message_unread_sender_idx'),
+        ]
+
     def __str__(self):
         return f"Message from {self.sender.email} at {self.created_at}"
+
+    @property
+    def recipient_id(self):
+        room = self.chat_room
+        return room.admin_id if self.sender_id == room.user_id else room.user_id
+
+    @classmethod
+    def unread_for(cls, user_id):
+        return cls.objects.filter(
+            Q(chat_room__user_id=user_id) | Q(chat_room__admin_id=user_id),
+            is_read=False,
+        ).exclude(sender_id=user_id)
@@ -0,0 +1,16 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from users.models import UserCounters
+from .models import Message
+
+
+@receiver(post_save, sender=Message)
+def count_unread_message(sender, instance, created, **kwargs):
+    if created and not instance.is_read:
+        UserCounters.adjust(instance.recipient_id, unread_messages=1)
+
+
+@receiver(post_delete, sender=Message)
+def release_unread_message(sender, instance, **kwargs):
+    if not instance.is_read:
+        UserCounters.adjust(instance.recipient_id, unread_messages=-1)
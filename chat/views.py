@@ -4,7 +4,7 @@ from django.urls import reverse_lazy
 from django.shortcuts import get_object_or_404, redirect
 from django.contrib import messages
 from .models import ChatRoom, Message
-from users.models import CustomUser
+from users.models import CustomUser, UserCounters
 from .forms import MessageForm, ChatRoomForm
 
 
@@ -48,6 +48,18 @@ class ChatRoomDetailView(LoginRequiredMixin, DetailView):
         context['chat_messages'] = self.object.messages.all().order_by('created_at')
         return context
 
+    def get(self, request, *args, **kwargs):
+        response = super().get(request, *args, **kwargs)
+        # Opening the room reads its messages: the one write this GET makes, kept
+        # out of get_context_data so rendering the page stays side-effect free
+        self.mark_messages_read()
+        return response
+
+    def mark_messages_read(self):
+        read = self.object.messages.filter(is_read=False).exclude(sender=self.request.user).update(is_read=True)
+        if read:
+            UserCounters.adjust(self.request.user.pk, unread_messages=-read)
+
     def get_queryset(self):
         if self.request.user.is_staff:
             return ChatRoom.objects.filter(admin=self.request.user)
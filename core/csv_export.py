@@ -0,0 +1,40 @@
+import csv
+
+from django.http import StreamingHttpResponse
+
+# Rows fetched per database round trip while exporting
+EXPORT_CHUNK_SIZE = 2000
+# Bytes of CSV gathered before a chunk is sent to the client
+FLUSH_SIZE = 64 * 1024
+
+
+class Echo:
+    """File-like object whose write() returns the line instead of storing it."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(filename, header, rows):
+    """
+    Stream `rows` (any iterable of sequences, typically `values_list(...).iterator()`)
+    as a CSV download. Nothing is held in memory beyond the current chunk, and the
+    download starts as soon as the first rows are read.
+    """
+    writer = csv.writer(Echo())
+
+    def generate():
+        buffer = [writer.writerow(header)]
+        size = 0
+        for row in rows:
+            line = writer.writerow(row)
+            buffer.append(line)
+            size += len(line)
+            if size >= FLUSH_SIZE:
+                yield ''.join(buffer)
+                buffer, size = [], 0
+        yield ''.join(buffer)
+
+    response = StreamingHttpResponse(generate(), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
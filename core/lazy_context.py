@@ -0,0 +1,17 @@
+from django.utils.functional import SimpleLazyObject
+
+
+def request_memo(request, key, factory):
+    """Compute `factory()` at most once per request, shared by every caller using `key`."""
+    memo = request.__dict__.setdefault('_context_memo', {})
+    if key not in memo:
+        memo[key] = factory()
+    return memo[key]
+
+
+def lazy_context(request, key, factory):
+    """
+    Context value that is only computed when a template first touches it, so
+    pages that never render the navbar (JSON endpoints, admin) pay nothing.
+    """
+    return SimpleLazyObject(lambda: request_memo(request, key, factory))
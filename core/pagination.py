@@ -0,0 +1,155 @@
+import base64
+import datetime
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.http import Http404
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    def default(self, o):
+        # DjangoJSONEncoder truncates to milliseconds, cursors need exact values
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+class CursorPage:
+    """Page of results positioned by a cursor, exposes no total count or page numbers."""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """
+    Keyset paginator. `ordering` is a sequence like ('-created_at', '-id') whose
+    last field must be unique, so every page is a single indexed range scan
+    instead of an OFFSET over all the rows before it.
+    """
+
+    def __init__(self, queryset, per_page, ordering):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = [
+            (name.lstrip('-'), name.startswith('-')) for name in ordering
+        ]
+
+    def encode_cursor(self, obj, direction):
+        position = [getattr(obj, name) for name, _ in self.ordering]
+        payload = json.dumps({'d': direction, 'p': position}, cls=CursorEncoder)
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            payload = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            data = json.loads(payload)
+            direction, position = data['d'], data['p']
+            if direction not in ('n', 'p') or len(position) != len(self.ordering):
+                raise InvalidCursor
+            return direction, [
+                self.get_field(name).to_python(value)
+                for (name, _), value in zip(self.ordering, position)
+            ]
+        except (ValueError, KeyError, TypeError, ValidationError) as e:
+            raise InvalidCursor from e
+
+    def get_field(self, name):
+        annotation = self.queryset.query.annotations.get(name)
+        if annotation is not None:
+            return annotation.output_field
+        if name == 'pk':
+            return self.queryset.model._meta.pk
+        return self.queryset.model._meta.get_field(name)
+
+    def keyset_filter(self, position, reverse):
+        """Rows strictly after `position` in the ordering (before it if `reverse`)."""
+        condition = Q()
+        for index, (name, descending) in enumerate(self.ordering):
+            lookup = 'lt' if descending != reverse else 'gt'
+            branch = Q(**{f'{name}__{lookup}': position[index]})
+            for prev_index, (prev_name, _) in enumerate(self.ordering[:index]):
+                branch &= Q(**{prev_name: position[prev_index]})
+            condition |= branch
+        return condition
+
+    def order_by(self, reverse):
+        return [
+            f'-{name}' if descending != reverse else name
+            for name, descending in self.ordering
+        ]
+
+    def page(self, cursor=None):
+        direction, position = self.decode_cursor(cursor) if cursor else ('n', None)
+        reverse = direction == 'p'
+
+        queryset = self.queryset.order_by(*self.order_by(reverse))
+        if position is not None:
+            queryset = queryset.filter(self.keyset_filter(position, reverse))
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+
+        if reverse:
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, position is not None
+
+        return CursorPage(
+            rows,
+            next_cursor=self.encode_cursor(rows[-1], 'n') if rows and has_next else None,
+            previous_cursor=self.encode_cursor(rows[0], 'p') if rows and has_previous else None,
+        )
+
+
+class CursorPaginationMixin:
+    """
+    ListView mixin swapping Django's offset paginator for CursorPaginator.
+    Templates get `page_obj.next_cursor` / `page_obj.previous_cursor` and
+    `pagination_querystring` (the current GET params minus the cursor).
+    """
+    cursor_ordering = ('-created_at', '-id')
+    cursor_kwarg = 'cursor'
+
+    def get_cursor_ordering(self):
+        return self.cursor_ordering
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = CursorPaginator(queryset, page_size, self.get_cursor_ordering())
+        try:
+            page = paginator.page(self.request.GET.get(self.cursor_kwarg))
+        except InvalidCursor:
+            raise Http404("Invalid cursor")
+        return paginator, page, page.object_list, page.has_other_pages()
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        params = self.request.GET.copy()
+        params.pop(self.cursor_kwarg, None)
+        params.pop('page', None)
+        context['pagination_querystring'] = params.urlencode()
+        return context
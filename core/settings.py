@@ -43,6 +43,7 @@ INSTALLED_APPS = [
     'notifications',
     'orders',
     'products',
+    'taskqueue',
     'users',
     'website',
     'wishlist',
@@ -67,6 +68,15 @@ CRISPY_TEMPLATE_PACK = "bootstrap5"
 
 CART_SESSION_ID = 'cart'  # Key to store cart in session
 
+# Background tasks (taskqueue app), run by `manage.py run_tasks`. TASKS_EAGER runs
+# them inline instead, for development without a worker.
+TASKS_EAGER = getenv('TASKS_EAGER', default=False, cast=bool)
+TASKS_RETRY_DELAY = getenv('TASKS_RETRY_DELAY', default=30, cast=int)  # seconds, doubled per attempt
+
+# Seconds notifications wait before being written, so bursts (a run of chat
+# messages) become a single "5 New Messages" notification
+NOTIFICATION_COALESCE_WINDOW = getenv('NOTIFICATION_COALESCE_WINDOW', default=10, cast=int)
+
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -118,6 +128,17 @@ DATABASES = {
     }
 }
 
+# Cache
+# Point CACHE_BACKEND at a shared backend (e.g. Redis) in production so cached
+# data and invalidation versions are shared between worker processes.
+
+CACHES = {
+    'default': {
+        'BACKEND': getenv('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': getenv('CACHE_LOCATION', default=''),
+    }
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -190,6 +211,16 @@ ACCOUNT_SIGNUP_FIELDS = ["email*", "password1*", "password2*"]
 # Stripe settings
 STRIPE_PUBLIC_KEY = getenv("STRIPE_PUBLIC_KEY")
 STRIPE_SECRET_KEY = getenv("STRIPE_SECRET_KEY")
+STRIPE_WEBHOOK_SECRET = getenv("STRIPE_WEBHOOK_SECRET", default="")  # the webhook rejects every event while unset
+# Point at a local fake server (orders.fake_stripe) for load tests
+STRIPE_API_BASE = getenv("STRIPE_API_BASE", default="https://api.stripe.com")
+STRIPE_TIMEOUT = getenv("STRIPE_TIMEOUT", default=10, cast=int)
+STRIPE_MAX_RETRIES = getenv("STRIPE_MAX_RETRIES", default=2, cast=int)
+STRIPE_POOL_SIZE = getenv("STRIPE_POOL_SIZE", default=20, cast=int)
+# Minutes an unpaid Stripe order keeps its stock; Stripe accepts 30 to 1440
+STRIPE_CHECKOUT_TIMEOUT = getenv("STRIPE_CHECKOUT_TIMEOUT", default=60, cast=int)
+# Extra minutes the unpaid-order sweep waits for payment webhooks still in flight
+STRIPE_CHECKOUT_GRACE = getenv("STRIPE_CHECKOUT_GRACE", default=30, cast=int)
 
 # Email (Development)
 DEFAULT_FROM_EMAIL = getenv('DEFAULT_FROM_EMAIL')
@@ -0,0 +1,38 @@
+class StatusTrackingMixin:
+    """
+    Model mixin remembering the `status` an instance was loaded with (or last saved
+    with), so save hooks can tell a real status transition from a plain re-save.
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Deferred fields are not in __dict__, and must not be loaded just for this
+        instance._saved_status = instance.__dict__.get('status')
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # A deferred status, or one left out of update_fields, was not written,
+        # so the snapshot still holds
+        update_fields = kwargs.get('update_fields')
+        if 'status' in self.__dict__ and (update_fields is None or 'status' in update_fields):
+            self._saved_status = self.status
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        # Also how a deferred status is loaded when first read
+        if 'status' in self.__dict__ and (fields is None or 'status' in fields):
+            self._saved_status = self.status
+
+    @property
+    def saved_status(self):
+        """The status as it stands in the database (None for an unsaved instance)."""
+        return getattr(self, '_saved_status', None)
+
+    def status_changed(self):
+        """Whether `status` differs from the database, i.e. the save in progress is a transition."""
+        if 'status' not in self.__dict__:
+            # Deferred and never assigned
+            return False
+        return self.status != self.saved_status
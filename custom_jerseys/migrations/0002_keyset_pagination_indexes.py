@@ -0,0 +1,24 @@
+# Generated by Django 5.0 on 2026-10-18 18:28
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0001_initial'),
+        ('custom_jerseys', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customjerseyorder',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='jersey_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customjerseyorder',
+            index=models.Index(fields=['created_at', 'id'], name='jersey_created_idx'),
+        ),
+    ]
@@ -2,9 +2,10 @@ from django.db import models
 from users.models import CustomUser
 from chat.models import ChatRoom
 from products.models import Product
+from core.status_tracking import StatusTrackingMixin
 
 
-class CustomJerseyOrder(models.Model):
+class CustomJerseyOrder(StatusTrackingMixin, models.Model):
     STATUS_CHOICES = [
         ('P', 'Pending Approval'),
         ('A', 'Approved'),
@@ -32,5 +33,11 @@ class CustomJerseyOrder(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'created_at', 'id'], name='jersey_user_created_idx'),
+            models.Index(fields=['created_at', 'id'], name='jersey_created_idx'),
+        ]
+
     def __str__(self):
         return f"Custom Jersey Order #{self.order_number}"
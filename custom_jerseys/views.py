@@ -5,15 +5,16 @@ from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.urls import reverse_lazy, reverse
 from django.shortcuts import get_object_or_404, redirect
 from django.contrib import messages
-from django.core.mail import send_mail
 from django.conf import settings
 
 from chat.models import ChatRoom, Message
+from core.pagination import CursorPaginationMixin
+from taskqueue.tasks import send_email
 from .models import CustomJerseyOrder
 from .forms import CustomJerseyOrderForm, CustomJerseyStatusForm
 
 
-class CustomJerseyOrderListView(LoginRequiredMixin, ListView):
+class CustomJerseyOrderListView(LoginRequiredMixin, CursorPaginationMixin, ListView):
     model = CustomJerseyOrder
     template_name = 'custom_jerseys/order_list.html'
     context_object_name = 'orders'
@@ -84,7 +85,9 @@ class CustomJerseyStatusUpdateView(LoginRequiredMixin, UserPassesTestMixin, Upda
 
     def form_valid(self, form):
         order = form.save()
-        self.send_status_update_email(order)
+        # Re-submitting the form unchanged should not email the customer again
+        if form.has_changed():
+            self.send_status_update_email(order)
         messages.success(self.request, f"Order #{order.order_number} status updated to {order.get_status_display()}")
         return redirect('custom_jersey_detail', pk=order.pk)
 
@@ -96,10 +99,4 @@ Order Number: {order.order_number}
 New Status: {order.get_status_display()}
 
 Current Price: ${order.price}"""
-        send_mail(
-            subject,
-            message,
-            settings.DEFAULT_FROM_EMAIL,
-            [order.user.email],
-            fail_silently=False,
-        )
\ No newline at end of file
+        send_email.delay(subject, message, [order.user.email], settings.DEFAULT_FROM_EMAIL)
\ No newline at end of file
@@ -1,43 +1,66 @@
 # game/admin.py
 from django.contrib import admin
 from django.utils import timezone
-from django.db.models import Count, Sum
-from django.http import HttpResponse
-import csv
-from .models import TriviaQuestion, UserScore, LeaderboardPrize, UserDiscount
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from core.csv_export import EXPORT_CHUNK_SIZE, stream_csv
+from .models import (
+    TriviaQuestion, TriviaAnswer, UserScore, LeaderboardPrize, UserDiscount, Leaderboard, LeaderboardEntry
+)
+
+
+def count_answers(**filters):
+    # Correlated count per listed question, served by the (question, is_correct) index
+    answers = (
+        TriviaAnswer.objects.filter(question=OuterRef('pk'), **filters)
+        .order_by()
+        .values('question')
+        .annotate(count=Count('pk'))
+        .values('count')
+    )
+    return Coalesce(Subquery(answers, output_field=IntegerField()), 0)
 
 
 class TriviaQuestionAdmin(admin.ModelAdmin):
-    list_display = ('question', 'sport', 'difficulty', 'correct_answer', 'is_active', 'created_at')
+    list_display = ('question', 'sport', 'difficulty', 'correct_answer', 'times_answered', 'correct_rate',
+                    'is_active', 'created_at')
     list_filter = ('sport', 'difficulty', 'is_active', 'created_at')
     search_fields = ('question', 'explanation')
     list_editable = ('is_active',)
     actions = ['export_questions']
 
-    def export_questions(self, request, queryset):
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = 'attachment; filename="trivia_questions.csv"'
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            times_answered=count_answers(),
+            times_correct=count_answers(is_correct=True),
+        )
+
+    def times_answered(self, obj):
+        return obj.times_answered
+
+    times_answered.short_description = "Answered"
+    times_answered.admin_order_field = 'times_answered'
+
+    def correct_rate(self, obj):
+        return f"{(obj.times_correct / obj.times_answered * 100):.1f}%" if obj.times_answered else "N/A"
+
+    correct_rate.short_description = "Correct rate"
 
-        writer = csv.writer(response)
-        writer.writerow([
+    def export_questions(self, request, queryset):
+        sports = dict(TriviaQuestion.SPORT_CHOICES)
+        difficulties = dict(TriviaQuestion.DIFFICULTY_CHOICES)
+        rows = queryset.values_list(
+            'question', 'sport', 'difficulty', 'option1', 'option2',
+            'option3', 'option4', 'correct_answer', 'explanation',
+        ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+        return stream_csv('trivia_questions.csv', [
             'Question', 'Sport', 'Difficulty', 'Option 1', 'Option 2',
             'Option 3', 'Option 4', 'Correct Answer', 'Explanation'
-        ])
-
-        for question in queryset:
-            writer.writerow([
-                question.question,
-                question.get_sport_display(),
-                question.get_difficulty_display(),
-                question.option1,
-                question.option2,
-                question.option3,
-                question.option4,
-                question.correct_answer,
-                question.explanation,
-            ])
-
-        return response
+        ], (
+            (question, sports.get(sport, sport), difficulties.get(difficulty, difficulty), *rest)
+            for question, sport, difficulty, *rest in rows
+        ))
 
     export_questions.short_description = "Export selected questions to CSV"
 
@@ -57,59 +80,26 @@ class UserScoreAdmin(admin.ModelAdmin):
     actions = ['award_discounts', 'export_scores']
 
     def award_discounts(self, request, queryset):
-        from datetime import timedelta
-        from django.utils import timezone
-        import uuid
-
-        count = 0
-        for score in queryset:
-            # Check if user already has an active discount
-            existing = UserDiscount.objects.filter(
-                user=score.user,
-                expires_at__gte=timezone.now(),
-                is_used=False
-            ).exists()
-
-            if not existing:
-                discount_code = f"TRIVIA-{score.user.username[:3].upper()}-{uuid.uuid4().hex[:6].upper()}"
-                UserDiscount.objects.create(
-                    user=score.user,
-                    discount_code=discount_code,
-                    discount_percentage=50,
-                    expires_at=timezone.now() + timedelta(days=30)
-                )
-                count += 1
-
-        self.message_user(request, f"Successfully awarded discounts to {count} users.")
-
-    award_discounts.short_description = "Award 50% discount to selected users"
+        issued = UserDiscount.issue([score.user for score in queryset.select_related('user')])
+        self.message_user(request, f"Successfully awarded discounts to {len(issued)} users.")
+
+    award_discounts.short_description = "Award 50%% discount to selected users"
 
     def export_scores(self, request, queryset):
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = 'attachment; filename="user_scores.csv"'
+        rows = queryset.values_list(
+            'user__username', 'user__email', 'month', 'year', 'score', 'correct_answers', 'wrong_answers',
+        ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
 
-        writer = csv.writer(response)
-        writer.writerow([
+        def with_accuracy():
+            for row in rows:
+                correct, wrong = row[5], row[6]
+                total = correct + wrong
+                yield (*row, f"{(correct / total * 100):.1f}%" if total > 0 else "N/A")
+
+        return stream_csv('user_scores.csv', [
             'Username', 'Email', 'Month', 'Year', 'Score',
             'Correct Answers', 'Wrong Answers', 'Accuracy'
-        ])
-
-        for score in queryset:
-            total = score.correct_answers + score.wrong_answers
-            accuracy = f"{(score.correct_answers / total * 100):.1f}%" if total > 0 else "N/A"
-
-            writer.writerow([
-                score.user.username,
-                score.user.email,
-                score.month,
-                score.year,
-                score.score,
-                score.correct_answers,
-                score.wrong_answers,
-                accuracy,
-            ])
-
-        return response
+        ], with_accuracy())
 
     export_scores.short_description = "Export selected scores to CSV"
 
@@ -139,7 +129,31 @@ class UserDiscountAdmin(admin.ModelAdmin):
     is_valid.short_description = "Valid"
 
 
+class LeaderboardEntryInline(admin.TabularInline):
+    model = LeaderboardEntry
+    fields = ('position', 'user', 'score', 'correct_answers', 'wrong_answers', 'discount_awarded')
+    readonly_fields = fields
+    raw_id_fields = ('user',)
+    can_delete = False
+    extra = 0
+
+    def get_queryset(self, request):
+        # Only the podium and a little beyond, a closed month can have thousands of entries
+        return super().get_queryset(request).select_related('user').filter(position__lte=20)
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+class LeaderboardAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'is_active', 'has_discounts_awarded', 'closed_at')
+    list_filter = ('is_active', 'has_discounts_awarded', 'year')
+    readonly_fields = ('closed_at',)
+    inlines = [LeaderboardEntryInline]
+
+
 admin.site.register(TriviaQuestion, TriviaQuestionAdmin)
 admin.site.register(UserScore, UserScoreAdmin)
 admin.site.register(LeaderboardPrize, LeaderboardPrizeAdmin)
-admin.site.register(UserDiscount, UserDiscountAdmin)
\ No newline at end of file
+admin.site.register(UserDiscount, UserDiscountAdmin)
+admin.site.register(Leaderboard, LeaderboardAdmin)
@@ -0,0 +1,65 @@
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Leaderboard, LeaderboardEntry, UserDiscount
+from .ranking import MonthlyLeaderboard
+
+SNAPSHOT_BATCH_SIZE = 1000
+
+
+def previous_month(today=None):
+    today = today or timezone.localdate()
+    return (today.year - 1, 12) if today.month == 1 else (today.year, today.month - 1)
+
+
+def snapshot_entries(leaderboard):
+    """Copy the month's final standings into LeaderboardEntry rows, in batches."""
+    board = MonthlyLeaderboard(leaderboard.year, leaderboard.month)
+    scores = board.scores().order_by(*board.ordering).values_list(
+        'user_id', 'score', 'correct_answers', 'wrong_answers'
+    )
+    batch = []
+    for position, (user_id, score, correct, wrong) in enumerate(
+        scores.iterator(chunk_size=SNAPSHOT_BATCH_SIZE), start=1
+    ):
+        batch.append(LeaderboardEntry(
+            leaderboard=leaderboard, user_id=user_id, position=position, score=score,
+            correct_answers=correct, wrong_answers=wrong,
+        ))
+        if len(batch) == SNAPSHOT_BATCH_SIZE:
+            LeaderboardEntry.objects.bulk_create(batch)
+            batch = []
+    LeaderboardEntry.objects.bulk_create(batch)
+
+
+def award_top_entries(leaderboard, winners=5):
+    """Issue discounts to the top `winners` entries and mark who received one."""
+    top = list(leaderboard.entries.filter(position__lte=winners).select_related('user'))
+    issued = UserDiscount.issue([entry.user for entry in top])
+    awarded_user_ids = [discount.user_id for discount in issued]
+    leaderboard.entries.filter(user_id__in=awarded_user_ids).update(discount_awarded=True)
+    leaderboard.has_discounts_awarded = True
+    leaderboard.save(update_fields=['has_discounts_awarded'])
+    return issued
+
+
+@transaction.atomic
+def close_leaderboard(year, month, winners=5):
+    """
+    Close a month: snapshot the final standings, compute the month's stats and
+    reward the top `winners`.
+    Returns (leaderboard, issued discounts); closing an already closed month does nothing.
+    """
+    leaderboard, _ = Leaderboard.objects.select_for_update().get_or_create(year=year, month=month)
+    if leaderboard.closed_at is not None:
+        return leaderboard, []
+
+    leaderboard.entries.all().delete()
+    snapshot_entries(leaderboard)
+    issued = award_top_entries(leaderboard, winners)
+
+    leaderboard.compute_stats()
+    leaderboard.is_active = False
+    leaderboard.closed_at = timezone.now()
+    leaderboard.save()
+    return leaderboard, issued
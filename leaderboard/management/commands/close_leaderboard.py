@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from leaderboard.closeout import close_leaderboard, previous_month
+
+
+class Command(BaseCommand):
+    help = (
+        "Close a month of the trivia leaderboard: archive the final standings and issue "
+        "discounts to the winners. Defaults to last month, so it can run from cron early "
+        "on the 1st."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--year', type=int)
+        parser.add_argument('--month', type=int)
+        parser.add_argument('--winners', type=int, default=5, help="How many top players get a discount")
+
+    def handle(self, *args, **options):
+        year, month = previous_month()
+        year = options['year'] or year
+        month = options['month'] or month
+        if not 1 <= month <= 12:
+            raise CommandError("--month must be between 1 and 12")
+
+        leaderboard, issued = close_leaderboard(year, month, winners=options['winners'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Closed {leaderboard}: {leaderboard.entries.count()} entries, {len(issued)} discounts issued"
+        ))
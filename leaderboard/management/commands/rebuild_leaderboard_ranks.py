@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from leaderboard.models import RankTreeNode
+
+
+class Command(BaseCommand):
+    help = "Recompute the monthly rank trees from the players' scores, for one month or all of them"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--year', type=int)
+        parser.add_argument('--month', type=int)
+
+    def handle(self, *args, **options):
+        year, month = options['year'], options['month']
+        if bool(year) != bool(month):
+            raise CommandError("Give both --year and --month, or neither")
+        if month and not 1 <= month <= 12:
+            raise CommandError("--month must be between 1 and 12")
+
+        RankTreeNode.rebuild(year, month)
+        self.stdout.write(self.style.SUCCESS("Leaderboard ranks rebuilt"))
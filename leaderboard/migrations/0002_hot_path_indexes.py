@@ -0,0 +1,24 @@
+# Generated by Django 5.0 on 2026-10-18 18:38
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leaderboard', '0001_initial'),
+        ('orders', '0005_keyset_pagination_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='userdiscount',
+            index=models.Index(condition=models.Q(('is_used', False)), fields=['user', 'expires_at'], name='userdiscount_user_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userscore',
+            index=models.Index(fields=['year', 'month', '-score'], name='userscore_month_score_idx'),
+        ),
+    ]
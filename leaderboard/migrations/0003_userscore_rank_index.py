@@ -0,0 +1,23 @@
+# Generated by Django 5.0 on 2026-10-18 18:40
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leaderboard', '0002_hot_path_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='userscore',
+            name='userscore_month_score_idx',
+        ),
+        migrations.AddIndex(
+            model_name='userscore',
+            index=models.Index(fields=['year', 'month', '-score', 'id'], name='userscore_month_rank_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.0 on 2026-10-18 18:50
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leaderboard', '0004_trivia_answer'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='triviaanswer',
+            index=models.Index(fields=['user', 'answered_at'], name='triviaanswer_user_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='triviaanswer',
+            index=models.Index(fields=['question', 'is_correct'], name='triviaanswer_question_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.0 on 2026-10-18 18:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leaderboard', '0006_leaderboard_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='leaderboard',
+            name='accuracy',
+            field=models.FloatField(default=0, help_text='Percentage of all answers that were correct'),
+        ),
+        migrations.AddField(
+            model_name='leaderboard',
+            name='average_score',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='leaderboard',
+            name='participants',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='leaderboard',
+            name='score_histogram',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='leaderboard',
+            name='top_score',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
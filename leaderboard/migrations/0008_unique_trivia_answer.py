@@ -0,0 +1,38 @@
+# Generated by Django 5.0 on 2026-10-18 19:36
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def remove_duplicate_answers(apps, schema_editor):
+    # Concurrent submits could log the same question twice; keep the first answer
+    TriviaAnswer = apps.get_model('leaderboard', 'TriviaAnswer')
+    duplicates = (
+        TriviaAnswer.objects.values('user_id', 'question_id')
+        .annotate(answers=Count('id'), first_id=Min('id')).filter(answers__gt=1)
+    )
+    for duplicate in duplicates:
+        TriviaAnswer.objects.filter(
+            user_id=duplicate['user_id'], question_id=duplicate['question_id'],
+        ).exclude(pk=duplicate['first_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leaderboard', '0007_leaderboard_stats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_answers, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='triviaanswer',
+            name='triviaanswer_user_question_idx',
+        ),
+        migrations.AddConstraint(
+            model_name='triviaanswer',
+            constraint=models.UniqueConstraint(fields=('user', 'question'), name='triviaanswer_user_question_uniq'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.0 on 2026-10-18 20:14
+
+from django.db import migrations, models
+
+from leaderboard import rank_tree
+
+
+def build_rank_trees(apps, schema_editor):
+    UserScore = apps.get_model('leaderboard', 'UserScore')
+    RankTreeNode = apps.get_model('leaderboard', 'RankTreeNode')
+    months = {}
+    for year, month, score, pk in UserScore.objects.values_list('year', 'month', 'score', 'id'):
+        months.setdefault((year, month), []).append((score, pk))
+    RankTreeNode.objects.bulk_create([
+        RankTreeNode(year=year, month=month, tree=tree, node=node, players=players)
+        for (year, month), entries in months.items()
+        for (tree, node), players in rank_tree.build(entries).items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leaderboard', '0008_unique_trivia_answer'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RankTreeNode',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveSmallIntegerField()),
+                ('month', models.PositiveSmallIntegerField()),
+                ('tree', models.IntegerField()),
+                ('node', models.BigIntegerField()),
+                ('players', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='ranktreenode',
+            constraint=models.UniqueConstraint(fields=('year', 'month', 'tree', 'node'), name='ranktreenode_slot_uniq'),
+        ),
+        migrations.RunPython(build_rank_trees, migrations.RunPython.noop),
+    ]
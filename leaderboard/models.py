@@ -1,8 +1,15 @@
-from django.db import models
+import calendar
+import uuid
+from datetime import timedelta
+
+from django.db import IntegrityError, connection, models, transaction
+from django.db.models import F, Q
 from users.models import CustomUser
 from django.utils import timezone
 from products.models import Product
 
+from . import rank_tree
+
 
 class TriviaQuestion(models.Model):
     SPORT_CHOICES = [
@@ -41,6 +48,46 @@ class TriviaQuestion(models.Model):
         ordering = ['-created_at']
 
 
+class TriviaAnswer(models.Model):
+    """
+    Append-only log of answered questions, used for the daily play limit, to avoid
+    asking a question twice and for per-question difficulty stats. Rows are only ever
+    inserted, never updated. A question can be answered once per player: the unique
+    constraint, not a prior check, is what turns away a second submit.
+    """
+    DAILY_LIMIT = 1
+
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='trivia_answers')
+    question = models.ForeignKey(TriviaQuestion, on_delete=models.CASCADE, related_name='answers')
+    is_correct = models.BooleanField()
+    answered_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            # Also serves the "has this player answered it?" checks while picking a question
+            models.UniqueConstraint(fields=['user', 'question'], name='triviaanswer_user_question_uniq'),
+        ]
+        indexes = [
+            # Answers since midnight for the daily limit
+            models.Index(fields=['user', 'answered_at'], name='triviaanswer_user_time_idx'),
+            # Per-question stats, counted from the index alone
+            models.Index(fields=['question', 'is_correct'], name='triviaanswer_question_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} answered {self.question_id}"
+
+    @classmethod
+    def log(cls, *answers):
+        return cls.objects.bulk_create(answers, batch_size=1000)
+
+    @classmethod
+    def answered_today(cls, user):
+        # A range on the raw column uses the index, unlike answered_at__date=today
+        midnight = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+        return cls.objects.filter(user=user, answered_at__gte=midnight).count()
+
+
 class UserScore(models.Model):
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='game_scores')
     score = models.PositiveIntegerField(default=0)
@@ -53,17 +100,180 @@ class UserScore(models.Model):
     class Meta:
         unique_together = ('user', 'month', 'year')
         ordering = ['-year', '-month', '-score']
+        indexes = [
+            # Monthly leaderboard, highest score first
+            models.Index(fields=['year', 'month', '-score', 'id'], name='userscore_month_rank_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.month}/{self.year}: {self.score} pts"
 
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and not {'score', 'month', 'year'} & set(update_fields):
+            return super().save(*args, **kwargs)
+        with transaction.atomic():
+            # The stored position, read under the row lock: the instance's own copy
+            # may predate answers recorded since it was loaded
+            stored = None
+            if not self._state.adding and self.pk is not None:
+                stored = (
+                    type(self).objects.select_for_update().filter(pk=self.pk)
+                    .values_list('year', 'month', 'score').first()
+                )
+            super().save(*args, **kwargs)
+            RankTreeNode.move(self.pk, stored, (self.year, self.month, self.score))
+
     @classmethod
-    def get_current_leaderboard(cls):
+    def record_answer(cls, user, points, correct, year=None, month=None):
+        """
+        Add one answer to the user's monthly score and return the new total. The
+        increment is done in the database, so concurrent answers are never lost, and
+        the month's rank tree is moved in the same transaction.
+        """
         now = timezone.now()
-        return cls.objects.filter(
-            month=now.month,
-            year=now.year
-        ).order_by('-score')[:5]
+        year, month = year or now.year, month or now.month
+        correct, wrong = (1, 0) if correct else (0, 1)
+        with transaction.atomic():
+            if connection.vendor in ('sqlite', 'postgresql'):
+                table = cls._meta.db_table
+                with connection.cursor() as cursor:
+                    # The ORM's own encoding, so raw and ORM writes store last_played alike
+                    played = connection.ops.adapt_datetimefield_value(now)
+                    cursor.execute(
+                        f'INSERT INTO {table} (user_id, month, year, score, correct_answers, wrong_answers, last_played) '
+                        f'VALUES (%s, %s, %s, 0, 0, 0, %s) '
+                        f'ON CONFLICT (user_id, month, year) DO NOTHING '
+                        f'RETURNING id',
+                        [user.pk, month, year, played]
+                    )
+                    created = cursor.fetchone() is not None
+                    cursor.execute(
+                        f'UPDATE {table} SET '
+                        f'score = score + %s, '
+                        f'correct_answers = correct_answers + %s, '
+                        f'wrong_answers = wrong_answers + %s, '
+                        f'last_played = %s '
+                        f'WHERE user_id = %s AND month = %s AND year = %s '
+                        f'RETURNING score, id',
+                        [points, correct, wrong, played, user.pk, month, year]
+                    )
+                    score, pk = cursor.fetchone()
+                old = None if created else (year, month, score - points)
+            else:
+                # A new row enters the rank tree on save, at zero
+                cls.objects.get_or_create(user=user, month=month, year=year)
+                scores = cls.objects.filter(user=user, month=month, year=year)
+                scores.update(
+                    score=F('score') + points,
+                    correct_answers=F('correct_answers') + correct,
+                    wrong_answers=F('wrong_answers') + wrong,
+                    last_played=now,
+                )
+                score, pk = scores.values_list('score', 'id').get()
+                old = (year, month, score - points)
+            RankTreeNode.move(pk, old, (year, month, score))
+        return score
+
+    @classmethod
+    def get_current_leaderboard(cls):
+        from .ranking import MonthlyLeaderboard
+        return MonthlyLeaderboard().top(5)
+
+
+class RankTreeNode(models.Model):
+    """
+    One node of a month's rank trees (see rank_tree), holding how many players it
+    counts. Kept in step with UserScore in the same transaction as every score
+    change; rebuild() recomputes a month from its UserScore rows.
+    """
+    year = models.PositiveSmallIntegerField()
+    month = models.PositiveSmallIntegerField()
+    tree = models.IntegerField()
+    node = models.BigIntegerField()
+    players = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['year', 'month', 'tree', 'node'], name='ranktreenode_slot_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.month}/{self.year} tree {self.tree} node {self.node}: {self.players}"
+
+    @classmethod
+    def add(cls, year, month, changes):
+        """Add each {(tree, node): players} change, in one upsert where the backend has one."""
+        # Always the same order, so concurrent moves lock shared nodes alike
+        changes = sorted(changes.items())
+        if not changes:
+            return
+        if connection.vendor in ('sqlite', 'postgresql'):
+            table = cls._meta.db_table
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'INSERT INTO {table} (year, month, tree, node, players) '
+                    f'VALUES {", ".join(["(%s, %s, %s, %s, %s)"] * len(changes))} '
+                    f'ON CONFLICT (year, month, tree, node) DO UPDATE SET '
+                    f'players = {table}.players + excluded.players',
+                    [value for (tree, node), players in changes for value in (year, month, tree, node, players)]
+                )
+            return
+
+        for (tree, node), players in changes:
+            nodes = cls.objects.filter(year=year, month=month, tree=tree, node=node)
+            if not nodes.update(players=F('players') + players):
+                try:
+                    with transaction.atomic():
+                        cls.objects.create(year=year, month=month, tree=tree, node=node, players=players)
+                except IntegrityError:
+                    nodes.update(players=F('players') + players)
+
+    @classmethod
+    def move(cls, pk, old=None, new=None):
+        """Move a UserScore between (year, month, score) positions; None to enter or leave."""
+        if old == new:
+            return
+        if old is not None and new is not None and old[:2] == new[:2]:
+            cls.add(*new[:2], rank_tree.move(pk, old[2], new[2]))
+            return
+        if old is not None:
+            cls.add(*old[:2], rank_tree.move(pk, old_score=old[2]))
+        if new is not None:
+            cls.add(*new[:2], rank_tree.move(pk, new_score=new[2]))
+
+    @classmethod
+    def players_ahead(cls, year, month, score, pk):
+        """How many of the month's players rank above (score, pk), summed over O(log n) nodes."""
+        by_tree = {}
+        for tree, node in rank_tree.ahead_nodes(score, pk):
+            by_tree.setdefault(tree, []).append(node)
+        if not by_tree:
+            return 0
+        nodes = Q()
+        for tree, tree_nodes in by_tree.items():
+            nodes |= Q(tree=tree, node__in=tree_nodes)
+        total = cls.objects.filter(nodes, year=year, month=month).aggregate(players=models.Sum('players'))
+        return total['players'] or 0
+
+    @classmethod
+    def rebuild(cls, year=None, month=None):
+        """Recompute the rank trees from UserScore, for one month or every month."""
+        scores = UserScore.objects.all()
+        nodes = cls.objects.all()
+        if year and month:
+            scores = scores.filter(year=year, month=month)
+            nodes = nodes.filter(year=year, month=month)
+        with transaction.atomic():
+            months = {}
+            for row_year, row_month, score, pk in scores.values_list('year', 'month', 'score', 'id'):
+                months.setdefault((row_year, row_month), []).append((score, pk))
+            nodes.delete()
+            cls.objects.bulk_create([
+                cls(year=row_year, month=row_month, tree=tree, node=node, players=players)
+                for (row_year, row_month), entries in months.items()
+                for (tree, node), players in rank_tree.build(entries).items()
+            ], batch_size=1000)
 
 
 class LeaderboardPrize(models.Model):
@@ -108,8 +318,113 @@ class UserDiscount(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     expires_at = models.DateTimeField()
 
+    class Meta:
+        indexes = [
+            # Active discount lookups on the profile, game and checkout pages
+            models.Index(fields=['user', 'expires_at'], condition=Q(is_used=False), name='userdiscount_user_active_idx'),
+        ]
+
     def __str__(self):
         return f"{self.discount_code} - {self.discount_percentage}% for {self.user.username}"
 
     def is_valid(self):
-        return not self.is_used and timezone.now() < self.expires_at
\ No newline at end of file
+        return not self.is_used and timezone.now() < self.expires_at
+
+    @classmethod
+    def issue(cls, users, discount_percentage=50, valid_days=30):
+        """
+        Give each of `users` a discount unless they already hold an unused, unexpired
+        one. One query finds who is eligible and one bulk insert creates the codes.
+        """
+        now = timezone.now()
+        eligible = list(
+            CustomUser.objects.filter(pk__in=[user.pk for user in users])
+            .exclude(pk__in=cls.objects.filter(is_used=False, expires_at__gte=now).values('user_id'))
+            .only('pk', 'username')
+        )
+        return cls.objects.bulk_create([
+            cls(
+                user=user,
+                discount_code=f"TRIVIA-{user.username[:3].upper()}-{uuid.uuid4().hex[:6].upper()}",
+                discount_percentage=discount_percentage,
+                expires_at=now + timedelta(days=valid_days),
+            )
+            for user in eligible
+        ])
+
+
+class Leaderboard(models.Model):
+    """
+    A closed month of the trivia game, with its final standings in `entries` and the
+    month's stats computed once at close, so history pages never aggregate UserScore.
+    """
+    MONTH_CHOICES = [(number, calendar.month_name[number]) for number in range(1, 13)]
+    HISTOGRAM_BUCKET_SIZE = 10
+
+    month = models.PositiveSmallIntegerField(choices=MONTH_CHOICES)
+    year = models.PositiveSmallIntegerField()
+    is_active = models.BooleanField(default=True)
+    has_discounts_awarded = models.BooleanField(default=False)
+    closed_at = models.DateTimeField(null=True, blank=True)
+    participants = models.PositiveIntegerField(default=0)
+    top_score = models.PositiveIntegerField(default=0)
+    average_score = models.FloatField(default=0)
+    accuracy = models.FloatField(default=0, help_text="Percentage of all answers that were correct")
+    # [{"low": 0, "high": 9, "count": 12}, ...] in HISTOGRAM_BUCKET_SIZE point steps
+    score_histogram = models.JSONField(default=list, blank=True)
+
+    class Meta:
+        unique_together = ('month', 'year')
+        ordering = ['-year', '-month']
+
+    def __str__(self):
+        return f"{self.get_month_display()} {self.year}"
+
+    def compute_stats(self):
+        """Fill in the month's stats from its entries: one aggregate and one grouped query."""
+        totals = self.entries.aggregate(
+            participants=models.Count('pk'),
+            top_score=models.Max('score'),
+            average_score=models.Avg('score'),
+            correct=models.Sum('correct_answers'),
+            wrong=models.Sum('wrong_answers'),
+        )
+        answered = (totals['correct'] or 0) + (totals['wrong'] or 0)
+        self.participants = totals['participants']
+        self.top_score = totals['top_score'] or 0
+        self.average_score = round(totals['average_score'] or 0, 1)
+        self.accuracy = round(totals['correct'] / answered * 100, 1) if answered else 0
+
+        size = self.HISTOGRAM_BUCKET_SIZE
+        buckets = (
+            self.entries.order_by()
+            .annotate(bucket=F('score') / size)
+            .values('bucket')
+            .annotate(count=models.Count('pk'))
+            .order_by('bucket')
+        )
+        self.score_histogram = [
+            {'low': row['bucket'] * size, 'high': row['bucket'] * size + size - 1, 'count': row['count']}
+            for row in buckets
+        ]
+
+
+class LeaderboardEntry(models.Model):
+    leaderboard = models.ForeignKey(Leaderboard, on_delete=models.CASCADE, related_name='entries')
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='leaderboard_entries')
+    position = models.PositiveIntegerField()
+    score = models.PositiveIntegerField()
+    correct_answers = models.PositiveIntegerField(default=0)
+    wrong_answers = models.PositiveIntegerField(default=0)
+    discount_awarded = models.BooleanField(default=False)
+
+    class Meta:
+        unique_together = ('leaderboard', 'user')
+        ordering = ['position']
+        indexes = [
+            models.Index(fields=['leaderboard', 'position'], name='lbentry_board_position_idx'),
+        ]
+        verbose_name_plural = "Leaderboard entries"
+
+    def __str__(self):
+        return f"#{self.position} {self.user_id} in {self.leaderboard}"
@@ -0,0 +1,94 @@
+import random
+import uuid
+from array import array
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+VERSION_KEY = 'leaderboard:question_pool:version'
+POOL_KEY = 'leaderboard:question_pool:{version}'
+POOL_TIMEOUT = 60 * 60 * 24
+
+# Random candidates checked per pick; a player who has seen a small share of the
+# pool almost always gets a question from the first batch
+SAMPLE_SIZE = 8
+
+# (version, QuestionPool) for this process, rebuilt when the shared version changes
+_process_pool = None
+
+
+class QuestionPool:
+    """Ids of the active trivia questions, packed into an array so a random pick is O(1)."""
+
+    def __init__(self, ids):
+        self.ids = ids
+
+    def __len__(self):
+        return len(self.ids)
+
+    def sample(self, k):
+        return random.sample(self.ids, min(k, len(self.ids)))
+
+
+def get_question_pool():
+    global _process_pool
+    from .models import TriviaQuestion
+
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, uuid.uuid4().hex, None)
+        version = cache.get(VERSION_KEY)
+    if _process_pool is not None and _process_pool[0] == version:
+        return _process_pool[1]
+
+    key = POOL_KEY.format(version=version)
+    packed = cache.get(key)
+    if packed is None:
+        ids = TriviaQuestion.objects.filter(is_active=True).order_by('pk').values_list('pk', flat=True)
+        packed = array('q', ids.iterator(chunk_size=10000)).tobytes()
+        cache.set(key, packed, POOL_TIMEOUT)
+
+    ids = array('q')
+    ids.frombytes(packed)
+    pool = QuestionPool(ids)
+    _process_pool = (version, pool)
+    return pool
+
+
+def invalidate_question_pool():
+    def bump():
+        cache.set(VERSION_KEY, uuid.uuid4().hex, None)
+
+    bump()
+    transaction.on_commit(bump)
+
+
+def pick_question(user):
+    """
+    A uniformly random active question the user has not answered yet, or None.
+    Usually one query however large the question table is. Players who have seen
+    most of the pool miss with the first sample, and cost a read of their answered
+    ids plus a pass over the pool in memory instead.
+    """
+    from .models import TriviaAnswer, TriviaQuestion
+
+    pool = get_question_pool()
+    if not pool:
+        return None
+
+    unanswered = TriviaQuestion.objects.filter(is_active=True).exclude(
+        Exists(TriviaAnswer.objects.filter(user=user, question=OuterRef('pk')))
+    )
+    candidates = pool.sample(SAMPLE_SIZE)
+    found = {question.pk: question for question in unanswered.filter(pk__in=candidates).order_by()}
+    for question_id in candidates:
+        if question_id in found:
+            return found[question_id]
+
+    # The player has seen most of the pool: draw from exactly the ids they have not answered
+    answered = set(TriviaAnswer.objects.filter(user=user).values_list('question_id', flat=True))
+    remaining = [question_id for question_id in pool.ids if question_id not in answered]
+    if not remaining:
+        return None
+    return unanswered.filter(pk=random.choice(remaining)).first()
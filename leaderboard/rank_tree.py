@@ -0,0 +1,73 @@
+"""
+Fenwick (binary indexed) trees counting a month's players, so a position is a sum
+over O(log n) tree nodes instead of a count of everyone ranked above.
+
+Each month has one score tree, counting players per score, and one tie tree per
+score, counting the players on that score by UserScore id (ties go to whoever
+started playing first). A node is addressed as (tree, node): the score tree is
+SCORE_TREE, a tie tree is the score itself. The score tree is indexed highest
+score first, so the players ahead of a (score, id) are a prefix sum of the score
+tree plus a prefix sum of that score's tie tree.
+"""
+from collections import Counter
+
+SCORE_TREE = -1
+# UserScore.score is a PositiveIntegerField
+SCORE_SLOTS = 2 ** 31
+# Far beyond any UserScore id, and every node still fits a BigIntegerField
+ID_SLOTS = 2 ** 62
+
+
+def _updated(index, size):
+    """Nodes covering `index`, i.e. those a player at `index` is counted in."""
+    while index <= size:
+        yield index
+        index += index & -index
+
+
+def _summed(index):
+    """Nodes whose counts add up to the players at positions 1..index."""
+    while index > 0:
+        yield index
+        index -= index & -index
+
+
+def _score_index(score):
+    return SCORE_SLOTS - score
+
+
+def entry_nodes(score, pk):
+    """Every node counting the player with this score and UserScore id."""
+    return (
+        [(SCORE_TREE, node) for node in _updated(_score_index(score), SCORE_SLOTS)]
+        + [(score, node) for node in _updated(pk, ID_SLOTS)]
+    )
+
+
+def ahead_nodes(score, pk):
+    """The nodes to sum for the number of players ranked above (score, pk)."""
+    return (
+        [(SCORE_TREE, node) for node in _summed(_score_index(score) - 1)]
+        + [(score, node) for node in _summed(pk - 1)]
+    )
+
+
+def move(pk, old_score=None, new_score=None):
+    """
+    Node changes for a player going from `old_score` to `new_score`; None for a
+    player entering or leaving the month. Nodes on both paths cancel out.
+    """
+    changes = Counter()
+    if old_score is not None:
+        changes.subtract(entry_nodes(old_score, pk))
+    if new_score is not None:
+        changes.update(entry_nodes(new_score, pk))
+    return {slot: players for slot, players in changes.items() if players}
+
+
+def build(entries):
+    """Node counts for a whole month, from its (score, pk) pairs."""
+    counts = Counter()
+    for score, pk in entries:
+        counts.update(entry_nodes(score, pk))
+    return counts
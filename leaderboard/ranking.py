@@ -0,0 +1,82 @@
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import RankTreeNode, UserScore
+
+
+class MonthlyLeaderboard:
+    """
+    Rankings for one month of UserScore rows.
+
+    top() and neighbors() read only the rows they return, walking the (year, month,
+    -score, id) index. A position comes from the month's rank trees (RankTreeNode),
+    which every score change updates in its own transaction: a sum over O(log n)
+    nodes, so it costs the same at the bottom of the table as at the top.
+    Entries are ordered by score, ties going to whoever started playing first, and
+    carry a `position` attribute. Results are memoised on the instance, so build one
+    per request and share it.
+    """
+    ordering = ('-score', 'id')
+
+    def __init__(self, year=None, month=None):
+        now = timezone.now()
+        self.year = year or now.year
+        self.month = month or now.month
+        self._top = {}
+        self._entries = {}
+
+    def scores(self):
+        return UserScore.objects.filter(year=self.year, month=self.month)
+
+    def ahead_of(self, score, pk):
+        """Rows ranked above a (score, pk) position."""
+        # The leading score__gte bound lets the index seek instead of walking the month
+        return self.scores().filter(Q(score__gte=score), Q(score__gt=score) | Q(id__lt=pk))
+
+    def top(self, n=5):
+        if n not in self._top:
+            entries = list(self.scores().select_related('user').order_by(*self.ordering)[:n])
+            for position, entry in enumerate(entries, start=1):
+                entry.position = position
+            self._top[n] = entries
+        return self._top[n]
+
+    def entry(self, user):
+        """The user's score for the month annotated with its exact position, or None."""
+        if user.pk not in self._entries:
+            entry = self.scores().filter(user=user).first()
+            if entry is not None:
+                entry.position = RankTreeNode.players_ahead(self.year, self.month, entry.score, entry.pk) + 1
+            self._entries[user.pk] = entry
+        return self._entries[user.pk]
+
+    def rank(self, user):
+        entry = self.entry(user)
+        return entry.position if entry else None
+
+    def is_top(self, user, n=5):
+        position = self.rank(user)
+        return position is not None and position <= n
+
+    def neighbors(self, user, k=2):
+        """Up to `k` entries either side of the user (and the user), in ranking order."""
+        entry = self.entry(user)
+        if entry is None:
+            return []
+        above = self.ahead_of(entry.score, entry.pk).order_by('score', '-id').values('pk')[:k]
+        below = (
+            self.scores()
+            .filter(Q(score__lte=entry.score), Q(score__lt=entry.score) | Q(id__gt=entry.pk))
+            .order_by(*self.ordering)
+            .values('pk')[:k]
+        )
+        entries = list(
+            self.scores()
+            .filter(Q(pk__in=above) | Q(pk__in=below) | Q(pk=entry.pk))
+            .select_related('user')
+            .order_by(*self.ordering)
+        )
+        first = entry.position - next(index for index, row in enumerate(entries) if row.pk == entry.pk)
+        for position, row in enumerate(entries, start=first):
+            row.position = position
+        return entries
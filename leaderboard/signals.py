@@ -0,0 +1,16 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import RankTreeNode, TriviaQuestion, UserScore
+from .question_pool import invalidate_question_pool
+
+
+@receiver(post_save, sender=TriviaQuestion)
+@receiver(post_delete, sender=TriviaQuestion)
+def refresh_question_pool(sender, **kwargs):
+    invalidate_question_pool()
+
+
+@receiver(post_delete, sender=UserScore)
+def leave_rank_tree(sender, instance, **kwargs):
+    # Also sent for cascades, e.g. when the user is deleted
+    RankTreeNode.move(instance.pk, (instance.year, instance.month, instance.score))
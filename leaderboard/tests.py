@@ -1,3 +1,441 @@
-from django.test import TestCase
+import datetime
+import io
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from chat.models import ChatRoom
+from users.models import CustomUser, UserCounters
+from . import rank_tree
+from .closeout import close_leaderboard, previous_month
+from .models import (
+    Leaderboard, LeaderboardEntry, RankTreeNode, TriviaAnswer, TriviaQuestion, UserDiscount, UserScore,
+)
+from .question_pool import get_question_pool, pick_question
+from .ranking import MonthlyLeaderboard
+
+
+class MonthlyLeaderboardTests(TestCase):
+    def setUp(self):
+        now = timezone.now()
+        self.year, self.month = now.year, now.month
+        self.users = []
+        for index, score in enumerate([50, 40, 40, 30, 20, 10, 5]):
+            user = CustomUser.objects.create_user(
+                username=f'player{index}', email=f'player{index}@example.com', password='pass'
+            )
+            UserScore.objects.create(user=user, score=score, month=self.month, year=self.year)
+            self.users.append(user)
+        # Another month never leaks into the ranking
+        UserScore.objects.create(user=self.users[6], score=999, month=self.month, year=self.year - 1)
+        self.board = MonthlyLeaderboard(self.year, self.month)
+
+    def test_top_orders_by_score_then_first_to_play(self):
+        top = self.board.top(3)
+        self.assertEqual([entry.user for entry in top], self.users[:3])
+        self.assertEqual([entry.position for entry in top], [1, 2, 3])
+
+    def test_rank_is_exact_outside_the_top_five(self):
+        self.assertEqual(self.board.rank(self.users[2]), 3)
+        self.assertEqual(self.board.rank(self.users[6]), 7)
+        self.assertFalse(self.board.is_top(self.users[5]))
+        self.assertTrue(self.board.is_top(self.users[4]))
+
+    def test_rank_of_user_without_score(self):
+        outsider = CustomUser.objects.create_user(username='new', email='new@example.com', password='pass')
+        self.assertIsNone(self.board.rank(outsider))
+        self.assertEqual(self.board.neighbors(outsider), [])
+
+    def test_lookups_are_memoised(self):
+        with self.assertNumQueries(2):  # the user's row, then the sum of its rank tree nodes
+            self.board.rank(self.users[5])
+            self.board.is_top(self.users[5])
+        with self.assertNumQueries(1):
+            self.board.top(5)
+            self.board.top(5)
+
+    def test_rank_tree_counts_players_ahead(self):
+        entries = [(score, pk) for pk, score in enumerate([7, 0, 3, 7, 7, 12, 3, 0, 2 ** 31 - 1, 5], start=1)]
+        counts = rank_tree.build(entries)
+        for score, pk in entries:
+            nodes = rank_tree.ahead_nodes(score, pk)
+            # Bounded by the trees' depth, never by how many players rank above
+            self.assertLessEqual(len(nodes), 31 + 62)
+            self.assertEqual(
+                sum(counts[node] for node in nodes),
+                len([1 for other, other_pk in entries if (other, -other_pk) > (score, -pk)]),
+            )
+
+    def ranks(self):
+        board = MonthlyLeaderboard(self.year, self.month)
+        return [board.rank(user) for user in self.users]
+
+    def test_rank_follows_recorded_answers(self):
+        # Level on 40 with two earlier players, and behind them
+        UserScore.record_answer(self.users[6], 35, True, self.year, self.month)
+        self.assertEqual(self.ranks(), [1, 2, 3, 5, 6, 7, 4])
+        UserScore.record_answer(self.users[6], 1, True, self.year, self.month)
+        self.assertEqual(self.ranks(), [1, 3, 4, 5, 6, 7, 2])
+
+        newcomer = CustomUser.objects.create_user(username='new', email='new@example.com', password='pass')
+        UserScore.record_answer(newcomer, 0, False, self.year, self.month)
+        self.assertEqual(MonthlyLeaderboard(self.year, self.month).rank(newcomer), 8)
+
+    def test_rank_follows_saves_and_deletes(self):
+        # Loaded before the answer below, but the save moves from the stored score
+        stale = UserScore.objects.get(user=self.users[5], year=self.year)
+        UserScore.record_answer(self.users[5], 25, True, self.year, self.month)
+        stale.score = 60
+        stale.save()
+        self.assertEqual(self.ranks(), [2, 3, 4, 5, 6, 1, 7])
+
+        stale.month = self.month % 12 + 1
+        stale.save()
+        self.assertEqual(self.ranks(), [1, 2, 3, 4, 5, None, 6])
+
+        self.users.pop(0).delete()
+        self.assertEqual(self.ranks(), [1, 2, 3, 4, None, 5])
+
+    def test_rebuild_matches_incremental_trees(self):
+        UserScore.record_answer(self.users[6], 36, True, self.year, self.month)
+        UserScore.objects.filter(user=self.users[0]).delete()
+        nodes = lambda: set(RankTreeNode.objects.exclude(players=0).values_list(
+            'year', 'month', 'tree', 'node', 'players'
+        ))
+        incremental = nodes()
+        RankTreeNode.objects.update(players=0)
+        call_command('rebuild_leaderboard_ranks', stdout=io.StringIO())
+        self.assertEqual(nodes(), incremental)
+
+    def test_neighbors(self):
+        neighbors = self.board.neighbors(self.users[3], k=2)
+        self.assertEqual([entry.user for entry in neighbors], self.users[1:6])
+        self.assertEqual([entry.position for entry in neighbors], [2, 3, 4, 5, 6])
+
+        neighbors = self.board.neighbors(self.users[0], k=2)
+        self.assertEqual([entry.position for entry in neighbors], [1, 2, 3])
+
+    def test_submit_answer_reports_exact_position(self):
+        question = TriviaQuestion.objects.create(
+            question='Q?', sport='FB', difficulty='E', option1='a', option2='b',
+            option3='c', option4='d', correct_answer=1,
+        )
+        self.client.force_login(self.users[6])
+        response = self.client.post(
+            reverse('submit_answer'), {'question_id': question.pk, 'answer': 1},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest',
+        )
+        self.assertEqual(response.json()['leaderboard_position'], 7)
+        self.assertFalse(response.json()['in_top5'])
+        self.assertFalse(UserDiscount.objects.exists())
+
+    def test_game_home_shows_position_and_neighbors(self):
+        # The navbar links to the player's support chat room
+        staff = CustomUser.objects.create_user(
+            username='staff', email='staff@example.com', password='pass', is_staff=True
+        )
+        ChatRoom.objects.create(user=self.users[5], admin=staff)
+        self.client.force_login(self.users[5])
+        response = self.client.get(reverse('game_home'))
+        self.assertContains(response, '#6</strong> this month')
+        self.assertEqual([entry.position for entry in response.context['neighbors']], [4, 5, 6, 7])
+
+
+class ConcurrentScoreTests(TransactionTestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='fan', email='fan@example.com', password='pass')
+
+    def test_record_answer_returns_running_total(self):
+        self.assertEqual(UserScore.record_answer(self.user, 4, True), 4)
+        self.assertEqual(UserScore.record_answer(self.user, 0, False), 4)
+        self.assertEqual(UserScore.record_answer(self.user, 6, True), 10)
+        score = UserScore.objects.get(user=self.user)
+        self.assertEqual((score.correct_answers, score.wrong_answers), (2, 1))
+
+    def test_last_played_is_stored_like_orm_writes(self):
+        UserScore.record_answer(self.user, 2, True)
+        other = CustomUser.objects.create_user(username='other', email='other@example.com', password='pass')
+        now = timezone.now()
+        UserScore.objects.create(user=other, month=now.month, year=now.year)
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT CAST(last_played AS TEXT) FROM {UserScore._meta.db_table} ORDER BY user_id')
+            raw, orm = [row[0] for row in cursor.fetchall()]
+        # Same encoding: whatever follows the seconds (a UTC offset or nothing) matches
+        self.assertEqual(raw[19:].lstrip('.0123456789'), orm[19:].lstrip('.0123456789'))
+
+    def test_parallel_answers_are_all_counted(self):
+        threads, answers_per_thread = 8, 10
+        errors = []
+
+        def answer():
+            # The shared-cache in-memory test database rejects a contended statement
+            # immediately instead of waiting on the busy timeout like a database file
+            # does; the rejected statement changed nothing, so it is safe to repeat.
+            for _ in range(100):
+                try:
+                    return UserScore.record_answer(self.user, 2, True)
+                except OperationalError as e:
+                    if 'locked' not in str(e):
+                        raise
+                    time.sleep(0.001)
+            raise AssertionError("Answer never got through")
+
+        def play():
+            try:
+                for _ in range(answers_per_thread):
+                    answer()
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=play) for _ in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(errors, [])
+        score = UserScore.objects.get(user=self.user)
+        self.assertEqual(score.score, 2 * threads * answers_per_thread)
+        self.assertEqual(score.correct_answers, threads * answers_per_thread)
+
+
+class QuestionPoolTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='fan', email='fan@example.com', password='pass')
+        self.questions = [self.make_question() for _ in range(20)]
+
+    def make_question(self, **kwargs):
+        return TriviaQuestion.objects.create(
+            question='Q?', sport='FB', difficulty='E', option1='a', option2='b',
+            option3='c', option4='d', correct_answer=1, **kwargs
+        )
+
+    def test_pool_tracks_active_questions(self):
+        self.assertEqual(sorted(get_question_pool().ids), [question.pk for question in self.questions])
+        self.questions[0].is_active = False
+        self.questions[0].save()
+        self.assertNotIn(self.questions[0].pk, get_question_pool().ids)
+
+    def test_pick_costs_one_query_once_pool_is_loaded(self):
+        get_question_pool()
+        with self.assertNumQueries(1):
+            self.assertIsNotNone(pick_question(self.user))
+
+    def test_answered_questions_are_never_picked(self):
+        for question in self.questions[:-1]:
+            TriviaAnswer.objects.create(user=self.user, question=question, is_correct=True)
+        for _ in range(5):
+            self.assertEqual(pick_question(self.user), self.questions[-1])
+
+        TriviaAnswer.objects.create(user=self.user, question=self.questions[-1], is_correct=False)
+        self.assertIsNone(pick_question(self.user))
+
+    def test_fallback_draws_uniformly_from_unanswered_ids(self):
+        unanswered = [self.questions[5], self.questions[-1]]
+        answered = [question for question in self.questions if question not in unanswered]
+        TriviaAnswer.log(*[TriviaAnswer(user=self.user, question=question, is_correct=True) for question in answered])
+        get_question_pool()
+        # A first sample that misses, then every remaining id equally likely
+        with mock.patch('leaderboard.question_pool.QuestionPool.sample', return_value=[answered[0].pk]), \
+                mock.patch('leaderboard.question_pool.random.choice', side_effect=lambda ids: ids[0]) as choice:
+            # The missed sample, the player's answered ids, the drawn question
+            with self.assertNumQueries(3):
+                self.assertEqual(pick_question(self.user), self.questions[5])
+        choice.assert_called_once_with([question.pk for question in unanswered])
+
+
+class TriviaAnswerLogTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='fan', email='fan@example.com', password='pass')
+        self.question = TriviaQuestion.objects.create(
+            question='Q?', sport='FB', difficulty='M', option1='a', option2='b',
+            option3='c', option4='d', correct_answer=2,
+        )
+        self.client.force_login(self.user)
+
+    def answer(self, answer=2):
+        return self.client.post(
+            reverse('submit_answer'), {'question_id': self.question.pk, 'answer': answer},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest',
+        )
+
+    def test_answer_is_logged_once(self):
+        self.assertEqual(self.answer().json()['points_earned'], 4)
+        response = self.answer()
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'error': 'Daily limit reached, come back tomorrow'})
+        answer = TriviaAnswer.objects.get()
+        self.assertTrue(answer.is_correct)
+        self.assertEqual(UserScore.objects.get(user=self.user).score, 4)
+
+    def test_daily_limit_is_checked_under_the_players_lock(self):
+        other = TriviaQuestion.objects.create(
+            question='Q2?', sport='FB', difficulty='E', option1='a', option2='b',
+            option3='c', option4='d', correct_answer=1,
+        )
+        lock = UserCounters.lock
+
+        def lock_after_concurrent_answer(user):
+            # A submit for another question committed while this one waited for the lock
+            TriviaAnswer.log(TriviaAnswer(user=user, question=other, is_correct=True))
+            return lock(user)
+
+        with mock.patch.object(UserCounters, 'lock', side_effect=lock_after_concurrent_answer):
+            response = self.answer()
+        self.assertEqual(response.json(), {'error': 'Daily limit reached, come back tomorrow'})
+        self.assertEqual(list(TriviaAnswer.objects.values_list('question', flat=True)), [other.pk])
+        self.assertFalse(UserScore.objects.exists())
+
+    def test_racing_submit_is_refused_by_the_constraint(self):
+        self.assertEqual(self.answer().status_code, 200)
+        # A submit racing the first past the daily limit check
+        with mock.patch.object(TriviaAnswer, 'answered_today', return_value=0):
+            response = self.answer()
+        self.assertEqual((response.status_code, response.json()), (400, {'error': 'Question already answered'}))
+        self.assertEqual(TriviaAnswer.objects.count(), 1)
+        self.assertEqual(UserScore.objects.get(user=self.user).score, 4)
+
+    def test_daily_limit_counts_todays_answers_only(self):
+        TriviaAnswer.log(TriviaAnswer(
+            user=self.user, question=self.question, is_correct=True,
+            answered_at=timezone.now() - timedelta(days=1),
+        ))
+        self.assertEqual(TriviaAnswer.answered_today(self.user), 0)
+
+        other = TriviaQuestion.objects.create(
+            question='Q2?', sport='FB', difficulty='E', option1='a', option2='b',
+            option3='c', option4='d', correct_answer=1,
+        )
+        TriviaAnswer.log(TriviaAnswer(user=self.user, question=other, is_correct=False))
+        self.assertEqual(TriviaAnswer.answered_today(self.user), 1)
+        response = self.client.get(reverse('play_game'))
+        self.assertRedirects(response, reverse('game_home'), fetch_redirect_response=False)
+
+    def test_admin_lists_question_stats(self):
+        players = [
+            CustomUser.objects.create_user(username=f'p{index}', email=f'p{index}@example.com', password='pass')
+            for index in range(4)
+        ]
+        TriviaAnswer.log(*[
+            TriviaAnswer(user=player, question=self.question, is_correct=index % 2 == 0)
+            for index, player in enumerate(players)
+        ])
+        self.user.is_staff = self.user.is_superuser = True
+        self.user.save()
+        response = self.client.get(reverse('admin:leaderboard_triviaquestion_changelist'))
+        self.assertContains(response, '50.0%')
+
+
+class CloseLeaderboardTests(TestCase):
+    def setUp(self):
+        self.year, self.month = 2026, 3
+        self.users = []
+        for index in range(7):
+            user = CustomUser.objects.create_user(
+                username=f'player{index}', email=f'player{index}@example.com', password='pass'
+            )
+            UserScore.objects.create(
+                user=user, score=100 - index * 10, correct_answers=10 - index, wrong_answers=index,
+                month=self.month, year=self.year,
+            )
+            self.users.append(user)
+        # Holding an unused discount already rules a winner out
+        UserDiscount.objects.create(
+            user=self.users[1], discount_code='EXISTING', discount_percentage=50,
+            expires_at=timezone.now() + timedelta(days=5),
+        )
+
+    def test_close_snapshots_standings_and_rewards_top_five(self):
+        leaderboard, issued = close_leaderboard(self.year, self.month)
+
+        self.assertFalse(leaderboard.is_active)
+        self.assertTrue(leaderboard.has_discounts_awarded)
+        entries = list(leaderboard.entries.all())
+        self.assertEqual([entry.user for entry in entries], self.users)
+        self.assertEqual([entry.position for entry in entries], list(range(1, 8)))
+        self.assertEqual(
+            sorted(discount.user_id for discount in issued),
+            [self.users[index].pk for index in (0, 2, 3, 4)],
+        )
+        self.assertEqual(
+            [entry.discount_awarded for entry in entries],
+            [True, False, True, True, True, False, False],
+        )
+
+    def test_close_stores_month_stats(self):
+        leaderboard, _ = close_leaderboard(self.year, self.month)
+        self.assertEqual(leaderboard.participants, 7)
+        self.assertEqual(leaderboard.top_score, 100)
+        self.assertEqual(leaderboard.average_score, 70.0)
+        self.assertEqual(leaderboard.accuracy, round(49 / 70 * 100, 1))
+        self.assertEqual(leaderboard.score_histogram[0], {'low': 40, 'high': 49, 'count': 1})
+        self.assertEqual(leaderboard.score_histogram[-1], {'low': 100, 'high': 109, 'count': 1})
+
+    def test_history_pages_read_only_the_archive(self):
+        close_leaderboard(self.year, self.month)
+        staff = CustomUser.objects.create_user(
+            username='staff', email='staff@example.com', password='pass', is_staff=True
+        )
+        ChatRoom.objects.create(user=self.users[6], admin=staff)
+        self.client.force_login(self.users[6])
+
+        response = self.client.get(reverse('leaderboard_history'))
+        self.assertContains(response, 'March 2026')
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('leaderboard_month', args=[self.year, self.month]))
+        self.assertEqual(response.context['user_entry'].position, 7)
+        self.assertContains(response, '70.0 pts')
+        self.assertFalse([query for query in ctx.captured_queries if UserScore._meta.db_table in query['sql']])
+        self.assertEqual(self.client.get(reverse('leaderboard_month', args=[2020, 1])).status_code, 404)
+
+    def test_closing_twice_issues_nothing_new(self):
+        close_leaderboard(self.year, self.month)
+        _, issued = close_leaderboard(self.year, self.month)
+        self.assertEqual(issued, [])
+        self.assertEqual(UserDiscount.objects.count(), 5)
+        self.assertEqual(LeaderboardEntry.objects.count(), 7)
+
+    def test_issue_is_set_based(self):
+        with self.assertNumQueries(2):
+            issued = UserDiscount.issue(self.users[:3])
+        self.assertEqual(len(issued), 2)
+
+    def test_command_defaults_to_previous_month(self):
+        self.assertEqual(previous_month(datetime.date(2026, 1, 15)), (2025, 12))
+        self.assertEqual(previous_month(datetime.date(2026, 4, 1)), (2026, 3))
+        call_command('close_leaderboard', year=self.year, month=self.month, stdout=io.StringIO())
+        self.assertTrue(Leaderboard.objects.get(year=self.year, month=self.month).closed_at)
+
+
+class ScoreExportTests(TestCase):
+    def test_export_streams_rows_in_one_query(self):
+        admin_user = CustomUser.objects.create_superuser(username='boss', email='boss@example.com', password='pass')
+        scores = []
+        for index in range(3):
+            user = CustomUser.objects.create_user(
+                username=f'player{index}', email=f'player{index}@example.com', password='pass'
+            )
+            scores.append(UserScore.objects.create(
+                user=user, score=10, correct_answers=3, wrong_answers=1, month=5, year=2026
+            ))
+        self.client.force_login(admin_user)
+        response = self.client.post(reverse('admin:leaderboard_userscore_changelist'), {
+            'action': 'export_scores', '_selected_action': [score.pk for score in scores],
+        })
+
+        self.assertTrue(response.streaming)
+        with self.assertNumQueries(1):
+            lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'Username,Email,Month,Year,Score,Correct Answers,Wrong Answers,Accuracy')
+        self.assertIn('player0,player0@example.com,5,2026,10,3,1,75.0%', lines)
+        self.assertEqual(len(lines), 4)
@@ -7,4 +7,6 @@ urlpatterns = [
     path('play/', views.play_game, name='play_game'),
     path('submit-answer/', views.submit_answer, name='submit_answer'),
     path('game/add/', views.create_game_question, name='create_game_question'),
+    path('history/', views.leaderboard_history, name='leaderboard_history'),
+    path('history/<int:year>/<int:month>/', views.leaderboard_month, name='leaderboard_month'),
 ]
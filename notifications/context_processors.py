@@ -1,8 +1,20 @@
+from core.lazy_context import lazy_context
+from users.models import UserCounters
 from .models import Notification
 
 
 def notifications(request):
-    if request.user.is_authenticated:
-        notifications = Notification.objects.filter(user=request.user, is_read=False).order_by('-created_at')
-        return {'notifications': notifications}
-    return {}
+    def unread_notifications():
+        if request.user.is_authenticated:
+            return Notification.objects.filter(user=request.user, is_read=False).order_by('-created_at')
+        return Notification.objects.none()
+
+    def unread_count():
+        if request.user.is_authenticated:
+            return UserCounters.for_request(request).unread_notifications
+        return 0
+
+    return {
+        'notifications': lazy_context(request, 'unread_notifications', unread_notifications),
+        'unread_notifications_count': lazy_context(request, 'unread_notifications_count', unread_count),
+    }
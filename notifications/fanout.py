@@ -0,0 +1,143 @@
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from taskqueue.models import Task
+from taskqueue.runner import enqueue
+from users.models import CustomUser, UserCounters
+from .models import FanoutMetrics, Notification, PendingNotification
+
+FLUSH_BATCH_SIZE = 1000
+BROADCAST_CHUNK_SIZE = 1000
+
+# How a coalesced burst of grouped notifications reads, per notification type
+GROUP_SUMMARIES = {
+    'chat': ("{count} New Messages", "You have {count} new messages in your chat with admin."),
+}
+
+METRICS = ('events', 'flushes', 'flush_ms', 'written', 'coalesced', 'broadcast_written', 'broadcast_ms')
+
+
+def record_metrics(**amounts):
+    FanoutMetrics.add(**amounts)
+
+
+def fanout_metrics():
+    """Running totals of the fan-out, as recorded by whichever process ran it, with write rates."""
+    metrics = FanoutMetrics.objects.filter(pk=FanoutMetrics.ROW_ID).values(*METRICS).first()
+    metrics = metrics or dict.fromkeys(METRICS, 0)
+    metrics['written_per_second'] = (
+        round(metrics['written'] * 1000 / metrics['flush_ms'], 1) if metrics['flush_ms'] else None
+    )
+    metrics['broadcast_per_second'] = (
+        round(metrics['broadcast_written'] * 1000 / metrics['broadcast_ms'], 1) if metrics['broadcast_ms'] else None
+    )
+    return metrics
+
+
+def schedule_flush():
+    from .tasks import flush_notifications
+    # A single queued flush per window is enough, later events are written with it
+    if not Task.objects.filter(name=flush_notifications.task_name, status='Q').exists():
+        window = timedelta(seconds=settings.NOTIFICATION_COALESCE_WINDOW)
+        enqueue(flush_notifications.task_name, run_at=timezone.now() + window)
+
+
+def notify(user_id, notification_type, title, message, related_url='', group=''):
+    """
+    Queue a notification for `user_id`. Within NOTIFICATION_COALESCE_WINDOW,
+    notifications sharing a `group` for the same user are written as one summary
+    and exact repeats are written once.
+    """
+    PendingNotification.objects.create(
+        user_id=user_id, notification_type=notification_type, title=title, message=message,
+        related_url=related_url, group_key=group,
+    )
+    schedule_flush()
+
+
+def coalesce(events):
+    latest = events[-1]
+    notification = Notification(
+        user_id=latest.user_id, notification_type=latest.notification_type, title=latest.title,
+        message=latest.message, related_url=latest.related_url, created_at=latest.created_at,
+    )
+    if len(events) > 1 and latest.group_key and latest.notification_type in GROUP_SUMMARIES:
+        title, message = GROUP_SUMMARIES[latest.notification_type]
+        notification.title = title.format(count=len(events))
+        notification.message = message.format(count=len(events))
+    return notification
+
+
+def flush_pending(limit=FLUSH_BATCH_SIZE):
+    """
+    Write up to `limit` pending notifications, oldest first, with one bulk_create.
+    Returns the number of notifications written.
+    """
+    began = time.monotonic()
+    with transaction.atomic():
+        pending = list(
+            PendingNotification.objects.select_for_update(skip_locked=True).order_by('created_at', 'id')[:limit]
+        )
+        groups = {}
+        for event in pending:
+            # Grouped events are summarised, identical ungrouped ones written once
+            key = (event.user_id, event.group_key) if event.group_key else (
+                event.user_id, event.notification_type, event.title, event.message, event.related_url
+            )
+            groups.setdefault(key, []).append(event)
+        notifications = Notification.objects.bulk_create([coalesce(events) for events in groups.values()])
+        UserCounters.increment_many(
+            'unread_notifications', Counter(notification.user_id for notification in notifications)
+        )
+        PendingNotification.objects.filter(pk__in=[event.pk for event in pending]).delete()
+
+    if len(pending) == limit:
+        schedule_flush()
+    # Events are counted as they are flushed, so notify() does not contend on the metrics row
+    record_metrics(
+        events=len(pending), flushes=1, flush_ms=round((time.monotonic() - began) * 1000),
+        written=len(notifications), coalesced=len(pending) - len(notifications),
+    )
+    return len(notifications)
+
+
+def broadcast(notification_type, title, message, related_url='', users=None, chunk_size=BROADCAST_CHUNK_SIZE):
+    """
+    Send the same notification (an offer, a system announcement) to every active
+    user, or to `users`, one bulk insert per `chunk_size` users.
+    Returns the number of notifications written.
+    """
+    began = time.monotonic()
+    if users is None:
+        users = CustomUser.objects.filter(is_active=True)
+    written, last_id = 0, 0
+    while True:
+        # Keyset pages of ids rather than one open cursor, since each page is written straight away
+        user_ids = list(users.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:chunk_size])
+        if not user_ids:
+            break
+        written += write_broadcast_chunk(user_ids, notification_type, title, message, related_url)
+        if len(user_ids) < chunk_size:
+            break
+        last_id = user_ids[-1]
+    record_metrics(broadcast_written=written, broadcast_ms=round((time.monotonic() - began) * 1000))
+    return written
+
+
+@transaction.atomic
+def write_broadcast_chunk(user_ids, notification_type, title, message, related_url):
+    now = timezone.now()
+    Notification.objects.bulk_create([
+        Notification(
+            user_id=user_id, notification_type=notification_type, title=title, message=message,
+            related_url=related_url, created_at=now,
+        )
+        for user_id in user_ids
+    ])
+    UserCounters.increment_many('unread_notifications', dict.fromkeys(user_ids, 1))
+    return len(user_ids)
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from notifications.fanout import broadcast
+from notifications.models import Notification
+from notifications.tasks import broadcast_notification
+
+
+class Command(BaseCommand):
+    help = "Send an offer or system notification to every active user, in chunked bulk inserts."
+
+    def add_arguments(self, parser):
+        parser.add_argument('title')
+        parser.add_argument('message')
+        parser.add_argument('--type', default='system', help="offer or system")
+        parser.add_argument('--url', default='', help="Where the notification links to")
+        parser.add_argument('--queue', action='store_true', help="Leave the writing to the run_tasks worker")
+
+    def handle(self, *args, **options):
+        if options['type'] not in dict(Notification.NOTIFICATION_TYPES):
+            raise CommandError(f"Unknown notification type {options['type']!r}")
+        if options['queue']:
+            broadcast_notification.delay(options['type'], options['title'], options['message'], options['url'])
+            self.stdout.write(self.style.SUCCESS("Broadcast queued"))
+            return
+        written = broadcast(options['type'], options['title'], options['message'], options['url'])
+        self.stdout.write(self.style.SUCCESS(f"Sent {written} notifications"))
@@ -0,0 +1,30 @@
+# Generated by Django 5.0 on 2026-10-18 19:16
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0003_hot_path_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingNotification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('notification_type', models.CharField(choices=[('order', 'Order Update'), ('chat', 'New Message'), ('offer', 'Special Offer'), ('jersey', 'Custom Jersey Update'), ('system', 'System Notification')], max_length=20)),
+                ('title', models.CharField(max_length=100)),
+                ('message', models.TextField()),
+                ('related_url', models.CharField(blank=True, max_length=200)),
+                ('group_key', models.CharField(blank=True, max_length=100)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.0 on 2026-10-18 19:43
+
+from django.db import migrations, models
+
+
+def create_metrics_row(apps, schema_editor):
+    FanoutMetrics = apps.get_model('notifications', 'FanoutMetrics')
+    FanoutMetrics.objects.get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0004_pending_notifications'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FanoutMetrics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('events', models.PositiveBigIntegerField(default=0)),
+                ('flushes', models.PositiveBigIntegerField(default=0)),
+                ('flush_ms', models.PositiveBigIntegerField(default=0)),
+                ('written', models.PositiveBigIntegerField(default=0)),
+                ('coalesced', models.PositiveBigIntegerField(default=0)),
+                ('broadcast_written', models.PositiveBigIntegerField(default=0)),
+                ('broadcast_ms', models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'Fan-out metrics',
+            },
+        ),
+        migrations.RunPython(create_metrics_row, migrations.RunPython.noop),
+    ]
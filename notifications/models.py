@@ -1,5 +1,6 @@
 from django.db import models
-from users.models import CustomUser
+from django.db.models import F, Q
+from users.models import CustomUser, UserCounters
 from django.urls import reverse
 from django.utils import timezone
 
@@ -25,13 +26,71 @@ class Notification(models.Model):
         ordering = ['-created_at']
         verbose_name = 'Notification'
         verbose_name_plural = 'Notifications'
+        indexes = [
+            models.Index(fields=['user', 'created_at', 'id'], name='notification_user_created_idx'),
+            # Unread dropdown in the navbar
+            models.Index(fields=['user', 'created_at'], condition=Q(is_read=False), name='notification_user_unread_idx'),
+        ]
 
     def __str__(self):
         return f"{self.get_notification_type_display()} for {self.user.email}"
 
     def mark_as_read(self):
+        # Conditional update so concurrent clicks only decrement the counter once
+        if Notification.objects.filter(pk=self.pk, is_read=False).update(is_read=True):
+            UserCounters.adjust(self.user_id, unread_notifications=-1)
         self.is_read = True
-        self.save()
 
     def get_absolute_url(self):
         return self.related_url or reverse('notifications')
+
+
+class PendingNotification(models.Model):
+    """
+    A notification waiting to be written by notifications.fanout.flush_pending(),
+    which coalesces events sharing a `group_key` for the same user into one
+    notification and inserts the lot with a single bulk_create.
+    """
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='+')
+    notification_type = models.CharField(max_length=20, choices=Notification.NOTIFICATION_TYPES)
+    title = models.CharField(max_length=100)
+    message = models.TextField()
+    related_url = models.CharField(max_length=200, blank=True)
+    group_key = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.title} for {self.user_id}"
+
+
+class FanoutMetrics(models.Model):
+    """
+    Running totals of the notification fan-out, a single row bumped with F()
+    updates. It lives in the database, not the cache, because the writes happen in
+    the run_tasks worker while the metrics endpoint is served by the web process.
+    """
+    events = models.PositiveBigIntegerField(default=0)
+    flushes = models.PositiveBigIntegerField(default=0)
+    flush_ms = models.PositiveBigIntegerField(default=0)
+    written = models.PositiveBigIntegerField(default=0)
+    coalesced = models.PositiveBigIntegerField(default=0)
+    broadcast_written = models.PositiveBigIntegerField(default=0)
+    broadcast_ms = models.PositiveBigIntegerField(default=0)
+
+    ROW_ID = 1
+
+    class Meta:
+        verbose_name_plural = "Fan-out metrics"
+
+    def __str__(self):
+        return "Notification fan-out metrics"
+
+    @classmethod
+    def add(cls, **amounts):
+        """Add `amounts` (e.g. flushes=1, written=40) to the totals with a single UPDATE."""
+        changes = {name: F(name) + amount for name, amount in amounts.items() if amount}
+        if not changes:
+            return
+        if not cls.objects.filter(pk=cls.ROW_ID).update(**changes):
+            cls.objects.get_or_create(pk=cls.ROW_ID)
+            cls.objects.filter(pk=cls.ROW_ID).update(**changes)
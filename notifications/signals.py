@@ -1,34 +1,36 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.urls import reverse
 from orders.models import Order
 from chat.models import Message
 from custom_jerseys.models import CustomJerseyOrder
 from notifications.models import Notification
+from notifications.fanout import notify
+from users.models import UserCounters
 
 
 @receiver(post_save, sender=Order)
 def create_order_notification(sender, instance, created, **kwargs):
     if created:
-        Notification.objects.create(
-            user=instance.user,
+        notify(
+            user_id=instance.user_id,
             notification_type='order',
             title=f"Order #{instance.order_number} Placed",
             message=f"Your order #{instance.order_number} has been received and is being processed.",
             related_url=reverse('order_detail', args=[instance.pk])
         )
-    else:
+    elif instance.status_changed():
         if instance.status == 'S':
-            Notification.objects.create(
-                user=instance.user,
+            notify(
+                user_id=instance.user_id,
                 notification_type='order',
                 title=f"Order #{instance.order_number} Shipped",
                 message=f"Your order #{instance.order_number} has been shipped.",
                 related_url=reverse('order_detail', args=[instance.pk])
             )
         elif instance.status == 'D':
-            Notification.objects.create(
-                user=instance.user,
+            notify(
+                user_id=instance.user_id,
                 notification_type='order',
                 title=f"Order #{instance.order_number} Delivered",
                 message=f"Your order #{instance.order_number} has been delivered.",
@@ -39,39 +41,52 @@ def create_order_notification(sender, instance, created, **kwargs):
 @receiver(post_save, sender=Message)
 def create_message_notification(sender, instance, created, **kwargs):
     if created and instance.sender != instance.chat_room.user:
-        Notification.objects.create(
-            user=instance.chat_room.user,
+        notify(
+            user_id=instance.chat_room.user_id,
             notification_type='chat',
             title="New Message Received",
             message=f"You have a new message in your chat with admin.",
-            related_url=reverse('chat_room_detail', args=[instance.chat_room.pk])
+            related_url=reverse('chat_room_detail', args=[instance.chat_room.pk]),
+            group=f'chat:{instance.chat_room_id}',
         )
 
 
 @receiver(post_save, sender=CustomJerseyOrder)
 def create_jersey_notification(sender, instance, created, **kwargs):
     if created:
-        Notification.objects.create(
-            user=instance.user,
+        notify(
+            user_id=instance.user_id,
             notification_type='jersey',
             title="Custom Jersey Order Submitted",
             message=f"Your custom jersey order #{instance.order_number} has been received.",
             related_url=reverse('custom_jersey_detail', args=[instance.pk])
         )
-    else:
+    elif instance.status_changed():
         if instance.status == 'A':
-            Notification.objects.create(
-                user=instance.user,
+            notify(
+                user_id=instance.user_id,
                 notification_type='jersey',
                 title=f"Custom Jersey Approved",
                 message=f"Your custom jersey order #{instance.order_number} has been approved.",
                 related_url=reverse('custom_jersey_detail', args=[instance.pk])
             )
         elif instance.status == 'S':
-            Notification.objects.create(
-                user=instance.user,
+            notify(
+                user_id=instance.user_id,
                 notification_type='jersey',
                 title=f"Custom Jersey Shipped",
                 message=f"Your custom jersey order #{instance.order_number} has been shipped.",
                 related_url=reverse('custom_jersey_detail', args=[instance.pk])
             )
+
+
+@receiver(post_save, sender=Notification)
+def count_unread_notification(sender, instance, created, **kwargs):
+    if created and not instance.is_read:
+        UserCounters.adjust(instance.user_id, unread_notifications=1)
+
+
+@receiver(post_delete, sender=Notification)
+def release_unread_notification(sender, instance, **kwargs):
+    if not instance.is_read:
+        UserCounters.adjust(instance.user_id, unread_notifications=-1)
@@ -0,0 +1,13 @@
+from taskqueue.runner import task
+
+from .fanout import broadcast, flush_pending
+
+
+@task
+def flush_notifications():
+    flush_pending()
+
+
+@task
+def broadcast_notification(notification_type, title, message, related_url=''):
+    broadcast(notification_type, title, message, related_url)
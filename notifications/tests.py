@@ -1,3 +1,244 @@
+from django.core import mail
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
 
-# Create your tests here.
+from chat.models import ChatRoom, Message
+from custom_jerseys.models import CustomJerseyOrder
+from orders.models import Order
+from users.models import CustomUser, UserCounters
+from taskqueue.models import Task
+from taskqueue.runner import claim, run
+from .fanout import broadcast, fanout_metrics, flush_pending, notify
+from .models import Notification, PendingNotification
+
+
+class UserCountersTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='fan', email='fan@example.com', password='pass')
+        self.staff = CustomUser.objects.create_user(
+            username='staff', email='staff@example.com', password='pass', is_staff=True
+        )
+
+    def counters(self, user=None):
+        return UserCounters.get_for(user or self.user)
+
+    def notify(self, **kwargs):
+        return Notification.objects.create(
+            user=self.user, notification_type='system', title='Hi', message='Hello', **kwargs
+        )
+
+    def test_notifications_adjust_unread_count(self):
+        first = self.notify()
+        self.notify()
+        self.notify(is_read=True)
+        self.assertEqual(self.counters().unread_notifications, 2)
+
+        first.mark_as_read()
+        first.mark_as_read()
+        self.assertEqual(self.counters().unread_notifications, 1)
+
+        self.client.force_login(self.user)
+        self.client.get(reverse('notifications_read_all'))
+        self.assertEqual(self.counters().unread_notifications, 0)
+
+    def test_deleting_unread_notification_releases_count(self):
+        self.notify().delete()
+        self.assertEqual(self.counters().unread_notifications, 0)
+
+    def test_unread_count_endpoint_reads_counter_row(self):
+        self.notify()
+        self.client.force_login(self.user)
+        self.client.get(reverse('notifications_unread_count'))
+        with self.assertNumQueries(3):  # session, user, counters
+            response = self.client.get(reverse('notifications_unread_count'))
+        self.assertEqual(response.json(), {'count': 1})
+
+    def test_messages_count_for_recipient_until_room_is_opened(self):
+        room = ChatRoom.objects.create(user=self.user, admin=self.staff)
+        Message.objects.create(chat_room=room, sender=self.user, content='Hello')
+        Message.objects.create(chat_room=room, sender=self.user, content='Anyone?')
+        self.assertEqual(self.counters(self.staff).unread_messages, 2)
+        self.assertEqual(self.counters().unread_messages, 0)
+
+        self.client.force_login(self.staff)
+        self.client.get(reverse('chat_room_detail', args=[room.pk]))
+        self.assertEqual(self.counters(self.staff).unread_messages, 0)
+
+    def test_dashboard_counts_unread_messages_site_wide(self):
+        other_admin = CustomUser.objects.create_user(
+            username='support', email='support@example.com', password='pass', is_staff=True
+        )
+        Message.objects.create(chat_room=ChatRoom.objects.create(user=self.user, admin=self.staff),
+                               sender=self.user, content='Hello')
+        other_room = ChatRoom.objects.create(user=self.user, admin=other_admin)
+        Message.objects.create(chat_room=other_room, sender=self.user, content='Anyone?')
+        Message.objects.create(chat_room=other_room, sender=self.staff, content='Mine')
+
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('admin_dashboard'))
+        self.assertEqual(response.context['unread_messages'], 2)
+        self.assertEqual(self.counters(self.staff).unread_messages, 1)
+
+    def test_recount_matches_source_tables(self):
+        self.notify()
+        UserCounters.objects.filter(user=self.user).update(unread_notifications=7)
+        UserCounters.recount([self.user.pk])
+        self.assertEqual(self.counters().unread_notifications, 1)
+
+    def test_deleting_user_with_counted_rows(self):
+        self.notify()
+        user_id = self.user.pk
+        self.user.delete()
+        self.assertFalse(UserCounters.objects.filter(user_id=user_id).exists())
+
+
+class FanoutTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='fan', email='fan@example.com', password='pass')
+        self.staff = CustomUser.objects.create_user(
+            username='staff', email='staff@example.com', password='pass', is_staff=True
+        )
+
+    def test_chat_burst_is_coalesced(self):
+        room = ChatRoom.objects.create(user=self.user, admin=self.staff)
+        for content in ['Hi', 'Your kit shipped', 'Anything else?']:
+            Message.objects.create(chat_room=room, sender=self.staff, content=content)
+        self.assertEqual(PendingNotification.objects.count(), 3)
+        # One flush is queued for the whole burst
+        self.assertEqual(Task.objects.filter(name='notifications.tasks.flush_notifications').count(), 1)
+
+        self.assertEqual(flush_pending(), 1)
+        notification = Notification.objects.get()
+        self.assertEqual((notification.user, notification.title), (self.user, "3 New Messages"))
+        self.assertEqual(UserCounters.get_for(self.user).unread_notifications, 1)
+        self.assertFalse(PendingNotification.objects.exists())
+
+    def test_repeats_are_written_once(self):
+        for _ in range(2):
+            notify(self.user.pk, 'order', "Order #1 Shipped", "Your order #1 has been shipped.")
+        notify(self.user.pk, 'order', "Order #1 Delivered", "Your order #1 has been delivered.")
+        notify(self.staff.pk, 'order', "Order #2 Shipped", "Your order #2 has been shipped.")
+
+        with self.assertNumQueries(9):
+            # savepoint, select, bulk insert, counters (insert + one update per count), delete, release, metrics
+            self.assertEqual(flush_pending(), 3)
+        self.assertEqual(
+            sorted(Notification.objects.values_list('user__username', 'title')),
+            [('fan', 'Order #1 Delivered'), ('fan', 'Order #1 Shipped'), ('staff', 'Order #2 Shipped')],
+        )
+        self.assertEqual(UserCounters.get_for(self.user).unread_notifications, 2)
+
+        # Stored in the database, so the web process sees what the worker recorded
+        cache.clear()
+        metrics = fanout_metrics()
+        self.assertEqual((metrics['events'], metrics['written'], metrics['coalesced']), (4, 3, 1))
+
+    def test_broadcast_in_chunks(self):
+        CustomUser.objects.bulk_create([
+            CustomUser(username=f'user{i}', email=f'user{i}@example.com') for i in range(5)
+        ])
+        UserCounters.adjust(self.user.pk, unread_notifications=2)
+        with self.assertNumQueries(19):
+            # Per chunk of 3 users: page of ids, savepoint, bulk insert, counter rows, update, release;
+            # then the metrics update
+            written = broadcast('offer', "Kit sale", "20% off all kits", chunk_size=3)
+        self.assertEqual(written, 7)
+        self.assertEqual(Notification.objects.filter(notification_type='offer').count(), 7)
+        self.assertEqual(UserCounters.get_for(self.user).unread_notifications, 3)
+        self.assertEqual(fanout_metrics()['broadcast_written'], 7)
+
+    def test_metrics_are_staff_only(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(reverse('notifications_metrics')).status_code, 302)
+        self.client.force_login(self.staff)
+        self.assertEqual(self.client.get(reverse('notifications_metrics')).json()['events'], 0)
+
+
+class StatusTransitionTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='fan', email='fan@example.com', password='pass')
+        self.staff = CustomUser.objects.create_user(
+            username='staff', email='staff@example.com', password='pass', is_staff=True
+        )
+        self.room = ChatRoom.objects.create(user=self.user, admin=self.staff)
+        self.order = Order.objects.create(
+            user=self.user, payment_method='COD', shipping_address='1 Stadium Road', order_total=100
+        )
+
+    def titles(self):
+        return list(PendingNotification.objects.order_by('id').values_list('title', flat=True))
+
+    def test_order_notifies_only_on_transitions(self):
+        order = Order.objects.get(pk=self.order.pk)
+        order.status = 'S'
+        order.save()
+        order.save()
+        order.mark_as_paid()
+        Order.objects.get(pk=order.pk).save()
+
+        order.status = 'D'
+        order.save()
+        self.assertEqual(self.titles(), [
+            f"Order #{order.order_number} Placed",
+            f"Order #{order.order_number} Shipped",
+            f"Order #{order.order_number} Delivered",
+        ])
+
+    def test_deferred_status_is_not_a_transition(self):
+        Order.objects.filter(pk=self.order.pk).update(status='S')
+        order = Order.objects.only('pk', 'user', 'order_number', 'shipping_address').get(pk=self.order.pk)
+        order.shipping_address = '2 Stadium Road'
+        order.save()
+        self.assertEqual(len(self.titles()), 1)
+
+    def test_deferred_status_loaded_after_save_is_not_a_transition(self):
+        Order.objects.filter(pk=self.order.pk).update(status='S')
+        order = Order.objects.only('pk', 'user', 'order_number', 'shipping_address').get(pk=self.order.pk)
+        order.shipping_address = '2 Stadium Road'
+        order.save(update_fields=['shipping_address'])
+        # Reading the status loads it from the database
+        self.assertEqual(order.status, 'S')
+        self.assertFalse(order.status_changed())
+        order.save()
+        self.assertEqual(len(self.titles()), 1)
+
+        order.status = 'D'
+        order.save()
+        self.assertEqual(self.titles()[-1], f"Order #{order.order_number} Delivered")
+
+    def test_status_form_sets_delivered_at_in_one_save(self):
+        self.client.force_login(self.staff)
+        url = reverse('order_status_update', args=[self.order.pk])
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(url, {'status': 'D'})
+        self.assertEqual(len([q for q in queries if q['sql'].startswith('UPDATE "orders_order"')]), 1)
+        self.order.refresh_from_db()
+        self.assertIsNotNone(self.order.delivered_at)
+        delivered_at = self.order.delivered_at
+
+        self.client.post(url, {'status': 'D'})
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.delivered_at, delivered_at)
+        self.assertEqual(self.titles().count(f"Order #{self.order.order_number} Delivered"), 1)
+
+    def test_jersey_status_email_only_when_changed(self):
+        jersey = CustomJerseyOrder.objects.create(
+            chat_room=self.room, user=self.user, order_number='CJ-1', name_on_jersey='FAN',
+            jersey_number=10, size='M', primary_color='Red', price=50,
+        )
+        self.client.force_login(self.staff)
+        url = reverse('custom_jersey_status_update', args=[jersey.pk])
+        self.client.post(url, {'status': 'A', 'price': '50.00'})
+        self.client.post(url, {'status': 'A', 'price': '50.00'})
+
+        for task in claim(100):
+            run(task)
+        self.assertEqual(len(mail.outbox), 1)
+        flush_pending()
+        self.assertEqual(
+            list(Notification.objects.filter(notification_type='jersey').order_by('id').values_list('title', flat=True)),
+            ["Custom Jersey Order Submitted", "Custom Jersey Approved"],
+        )
@@ -1,5 +1,5 @@
 from django.urls import path
-from .views import NotificationListView, mark_as_read, mark_all_as_read, unread_notifications_count
+from .views import NotificationListView, mark_as_read, mark_all_as_read, unread_notifications_count, notification_metrics
 
 
 urlpatterns = [
@@ -7,4 +7,5 @@ urlpatterns = [
     path('<int:pk>/read/', mark_as_read, name='notification_read'),
     path('read-all/', mark_all_as_read, name='notifications_read_all'),
     path('unread-count/', unread_notifications_count, name='notifications_unread_count'),
+    path('metrics/', notification_metrics, name='notifications_metrics'),
 ]
\ No newline at end of file
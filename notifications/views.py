@@ -1,12 +1,16 @@
 from django.views.generic import ListView
 from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect
+from django.contrib.auth.decorators import user_passes_test
 from django.contrib.auth.mixins import LoginRequiredMixin
 
+from core.pagination import CursorPaginationMixin
+from users.models import UserCounters
+from .fanout import fanout_metrics
 from .models import Notification
 
 
-class NotificationListView(LoginRequiredMixin, ListView):
+class NotificationListView(LoginRequiredMixin, CursorPaginationMixin, ListView):
     model = Notification
     template_name = 'notifications/list.html'
     context_object_name = 'notifications'
@@ -23,12 +27,18 @@ def mark_as_read(request, pk):
 
 
 def mark_all_as_read(request):
-    Notification.objects.filter(user=request.user, is_read=False).update(is_read=True)
+    read = Notification.objects.filter(user=request.user, is_read=False).update(is_read=True)
+    UserCounters.adjust(request.user.pk, unread_notifications=-read)
     return redirect('notifications')
 
 
 def unread_notifications_count(request):
     if request.user.is_authenticated:
-        count = Notification.objects.filter(user=request.user, is_read=False).count()
+        count = UserCounters.for_request(request).unread_notifications
         return JsonResponse({'count': count})
     return JsonResponse({'count': 0})
+
+
+@user_passes_test(lambda u: u.is_staff)
+def notification_metrics(request):
+    return JsonResponse(fanout_metrics())
@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Order, OrderItem
+from core.csv_export import EXPORT_CHUNK_SIZE, stream_csv
+from .models import Order, OrderItem, PaymentEvent
 
 
 class OrderItemInline(admin.TabularInline):
@@ -9,12 +10,29 @@ class OrderItemInline(admin.TabularInline):
 
 class OrderAdmin(admin.ModelAdmin):
     list_display = ('user', 'created_at', 'status')
-    list_filter = ('status',)
+    list_filter = ('status', 'needs_refund')
     search_fields = ('user__username', 'user__email')
     inlines = [OrderItemInline]
-    actions = ['mark_as_paid', 'mark_as_shipped', 'mark_as_delivered', 'mark_as_cancelled']
+    actions = ['mark_as_paid', 'mark_as_shipped', 'mark_as_delivered', 'mark_as_cancelled', 'export_orders']
     date_hierarchy = 'created_at'
 
+    def export_orders(self, request, queryset):
+        statuses = dict(Order.STATUS_CHOICES)
+        rows = queryset.values_list(
+            'order_number', 'user__email', 'status', 'payment_method', 'order_total',
+            'tax', 'shipping_cost', 'is_paid', 'paid_at', 'created_at',
+        ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+        return stream_csv('orders.csv', [
+            'Order Number', 'Email', 'Status', 'Payment Method', 'Order Total',
+            'Tax', 'Shipping Cost', 'Paid', 'Paid At', 'Created At'
+        ], (
+            (number, email, statuses.get(status, status), *rest)
+            for number, email, status, *rest in rows
+        ))
+
+    export_orders.short_description = "Export selected orders to CSV"
+
 
 class OrderItemAdmin(admin.ModelAdmin):
     list_display = ('order', 'product', 'quantity', 'price')
@@ -24,5 +42,13 @@ class OrderItemAdmin(admin.ModelAdmin):
     actions = ['mark_as_cancelled']
 
 
+class PaymentEventAdmin(admin.ModelAdmin):
+    list_display = ('stripe_event_id', 'event_type', 'received_at', 'processed_at', 'attempts')
+    list_filter = ('event_type',)
+    search_fields = ('stripe_event_id',)
+    readonly_fields = ('stripe_event_id', 'event_type', 'payload', 'received_at', 'processed_at', 'attempts', 'last_error')
+
+
 admin.site.register(Order, OrderAdmin)
-admin.site.register(OrderItem, OrderItemAdmin)
\ No newline at end of file
+admin.site.register(OrderItem, OrderItemAdmin)
+admin.site.register(PaymentEvent, PaymentEventAdmin)
\ No newline at end of file
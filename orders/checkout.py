@@ -0,0 +1,139 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from leaderboard.models import UserDiscount
+from products.models import Product
+from .models import Order, OrderItem
+
+
+class CheckoutError(Exception):
+    pass
+
+
+class InsufficientStock(CheckoutError):
+    def __init__(self, shortages):
+        # [(product, requested quantity, quantity still available)]
+        self.shortages = shortages
+        super().__init__("Not enough stock: " + '; '.join(
+            f"only {available} of {product.name} left, {requested} requested"
+            if available else f"{product.name} is out of stock"
+            for product, requested, available in shortages
+        ))
+
+
+def reserve_stock(lines):
+    """
+    Take each line's quantity off its product's stock with a conditional
+    UPDATE ... SET stock = stock - n WHERE stock >= n, so two checkouts can never
+    both get the last unit. Products are updated in id order to keep lock order stable.
+    Raises InsufficientStock listing every line that could not be reserved.
+    """
+    shortages = []
+    for line in sorted(lines, key=lambda line: line.product.pk):
+        reserved = Product.objects.filter(pk=line.product.pk, stock__gte=line.quantity).update(
+            stock=F('stock') - line.quantity
+        )
+        if not reserved:
+            available = Product.objects.filter(pk=line.product.pk).values_list('stock', flat=True).first()
+            shortages.append((line.product, line.quantity, available or 0))
+    if shortages:
+        raise InsufficientStock(shortages)
+
+
+def release_stock(order):
+    """
+    Put the stock `order` reserved back on its products, one
+    UPDATE ... SET stock = stock + n per item, in the same product order as reserve_stock.
+    """
+    items = OrderItem.objects.filter(order=order).order_by('product_id').values_list('product_id', 'quantity')
+    for product_id, quantity in items:
+        Product.objects.filter(pk=product_id).update(stock=F('stock') + quantity)
+
+
+@transaction.atomic
+def change_status(order):
+    """
+    Save a status change made to `order`, moving its stock with it: cancelling puts
+    the reserved stock back, reopening a cancelled order reserves it again (raising
+    InsufficientStock when it is gone). The guarded UPDATEs make two concurrent
+    changes move the stock only once.
+    """
+    if order.status_changed() and order.status == 'C':
+        if Order.objects.filter(pk=order.pk).exclude(status='C').update(status='C'):
+            release_stock(order)
+    elif order.status_changed() and order.saved_status == 'C':
+        if Order.objects.filter(pk=order.pk, status='C').update(status=order.status):
+            reserve_stock(order.items.select_related('product'))
+    order.save()
+    return order
+
+
+def expire_unpaid_orders(order_ids=None):
+    """
+    Cancel the pending Stripe orders left unpaid since their last checkout session
+    was opened, and put their stock back. With `order_ids` (the orders of
+    checkout.session.expired events, whose sessions can no longer be paid) that is
+    after STRIPE_CHECKOUT_TIMEOUT minutes. The sweep of every order waits a further
+    STRIPE_CHECKOUT_GRACE minutes for a payment webhook still on its way.
+    Returns the number of orders cancelled.
+    """
+    wait = settings.STRIPE_CHECKOUT_TIMEOUT + (settings.STRIPE_CHECKOUT_GRACE if order_ids is None else 0)
+    deadline = timezone.now() - timedelta(minutes=wait)
+    stale = Order.objects.filter(payment_method='STRIPE', status='P', is_paid=False, updated_at__lt=deadline)
+    if order_ids is not None:
+        stale = stale.filter(pk__in=order_ids)
+    cancelled = 0
+    for order_id in list(stale.values_list('pk', flat=True)):
+        with transaction.atomic():
+            # Conditional, so a payment or another worker that got there first wins
+            if stale.filter(pk=order_id).update(status='C', updated_at=timezone.now()):
+                release_stock(order_id)
+                cancelled += 1
+    return cancelled
+
+
+def accept_late_payment(order_id, paid_at):
+    """
+    Apply a payment for an order that was cancelled meanwhile (its checkout ran out,
+    or staff cancelled it while the customer was paying): reserve its stock again and
+    reopen it as paid. When the stock has been sold since, the order stays cancelled,
+    marked paid and flagged for a refund. Returns whether the payment was applied.
+    """
+    cancelled = Order.objects.filter(pk=order_id, status='C', is_paid=False)
+    try:
+        with transaction.atomic():
+            if not cancelled.update(status='P', is_paid=True, paid_at=paid_at, updated_at=paid_at):
+                return False
+            reserve_stock(OrderItem.objects.filter(order_id=order_id).select_related('product'))
+        return True
+    except InsufficientStock:
+        return bool(cancelled.update(is_paid=True, paid_at=paid_at, needs_refund=True, updated_at=paid_at))
+
+
+@transaction.atomic
+def place_order(order, lines, discount=None):
+    """
+    Turn cart lines into a saved order in one transaction: reserve the stock, save
+    the order once, insert all its items in one bulk insert and use up `discount`.
+    Nothing is written when any of it fails.
+    """
+    lines = list(lines)
+    if not lines:
+        raise CheckoutError("Your cart is empty")
+    reserve_stock(lines)
+    order.save()
+    OrderItem.objects.bulk_create([
+        OrderItem(order=order, product=line.product, price=line.price, quantity=line.quantity)
+        for line in lines
+    ])
+    if discount is not None:
+        used = UserDiscount.objects.filter(pk=discount.pk, is_used=False).update(
+            is_used=True, used_at=timezone.now(), order=order
+        )
+        if not used:
+            raise CheckoutError("This discount code has already been used")
+    return order
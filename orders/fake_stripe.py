@@ -0,0 +1,139 @@
+import hashlib
+import hmac
+import json
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl
+
+
+class FakeStripeHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    session_path = re.compile(r'^/v1/checkout/sessions/(?P<id>[\w-]+)$')
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.send_header('Request-Id', f'req_{uuid.uuid4().hex[:14]}')
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def handle_call(self):
+        server = self.server
+        with server.lock:
+            server.calls += 1
+        if server.latency:
+            time.sleep(server.latency)
+        if not self.headers.get('Authorization', '').startswith('Bearer '):
+            self.send_json(401, {'error': {'type': 'invalid_request_error', 'message': 'No API key provided.'}})
+            return False
+        return True
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        params = dict(parse_qsl(self.rfile.read(length).decode()))
+        if not self.handle_call():
+            return
+        if self.path != '/v1/checkout/sessions':
+            self.send_json(404, {'error': {'type': 'invalid_request_error', 'message': 'Unknown path'}})
+            return
+        session_id = f'cs_test_{uuid.uuid4().hex}'
+        session = {
+            'id': session_id,
+            'object': 'checkout.session',
+            'url': f'{self.server.api_base}/pay/{session_id}',
+            'mode': params.get('mode'),
+            'status': 'open',
+            'payment_status': 'unpaid',
+            'success_url': params.get('success_url'),
+            'cancel_url': params.get('cancel_url'),
+            'metadata': {
+                key[len('metadata['):-1]: value for key, value in params.items() if key.startswith('metadata[')
+            },
+            'amount_total': sum(
+                int(value) * int(params.get(key.replace('[price_data][unit_amount]', '[quantity]'), 1))
+                for key, value in params.items() if key.endswith('[price_data][unit_amount]')
+            ),
+        }
+        with self.server.lock:
+            self.server.sessions[session_id] = session
+        self.send_json(200, session)
+
+    def do_GET(self):
+        if not self.handle_call():
+            return
+        match = self.session_path.match(self.path.split('?')[0])
+        session = self.server.sessions.get(match['id']) if match else None
+        if session is None:
+            self.send_json(404, {'error': {'type': 'invalid_request_error', 'message': 'No such checkout.session'}})
+            return
+        self.send_json(200, session)
+
+
+class FakeStripeHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients that gave up waiting (timeout tests) close the connection mid-response
+        pass
+
+
+class FakeStripeServer:
+    """
+    An in-process stand-in for the Stripe API's checkout session endpoints, for
+    tests and load benchmarks. `latency` (seconds) delays every response to mimic
+    the real round trip. Use as a context manager and pass `api_base` to StripeGateway.
+    """
+
+    def __init__(self, latency=0):
+        self.httpd = FakeStripeHTTPServer(('127.0.0.1', 0), FakeStripeHandler)
+        self.httpd.latency = latency
+        self.httpd.calls = 0
+        self.httpd.sessions = {}
+        self.httpd.lock = threading.Lock()
+        self.httpd.api_base = self.api_base = f'http://127.0.0.1:{self.httpd.server_port}'
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def sessions(self):
+        return self.httpd.sessions
+
+    @property
+    def calls(self):
+        return self.httpd.calls
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def complete(self, session_id, paid=True):
+        """
+        Finish a session as Stripe does once the customer pays, and return the
+        checkout.session.completed event Stripe would send to the webhook.
+        """
+        session = self.sessions[session_id]
+        session.update(status='complete', payment_status='paid' if paid else 'unpaid')
+        return {
+            'id': f'evt_{uuid.uuid4().hex}',
+            'object': 'event',
+            'type': 'checkout.session.completed',
+            'data': {'object': dict(session)},
+        }
+
+
+def sign_payload(payload, secret, timestamp=None):
+    """A Stripe-Signature header for `payload` (the raw request body) signed with `secret`."""
+    timestamp = int(timestamp or time.time())
+    signature = hmac.new(secret.encode(), f'{timestamp}.{payload}'.encode(), hashlib.sha256).hexdigest()
+    return f't={timestamp},v1={signature}'
@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from orders.checkout import expire_unpaid_orders
+from orders.webhooks import PROCESS_BATCH_SIZE, process_payment_events
+
+
+class Command(BaseCommand):
+    help = (
+        "Apply the Stripe webhook events queued by the payment webhook, marking the "
+        "orders they pay for as paid, and cancel Stripe orders left unpaid past "
+        "STRIPE_CHECKOUT_TIMEOUT plus STRIPE_CHECKOUT_GRACE. Drains the backlog and "
+        "exits unless --watch is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=PROCESS_BATCH_SIZE)
+        parser.add_argument('--watch', action='store_true', help="Keep polling for new events")
+        parser.add_argument('--interval', type=float, default=2.0, help="Seconds between polls with --watch")
+
+    def handle(self, *args, **options):
+        total_events = total_paid = total_expired = 0
+        while True:
+            events, paid = process_payment_events(options['batch_size'])
+            total_events += events
+            total_paid += paid
+            if events:
+                continue
+            # Backstop for expiry events that never arrived
+            total_expired += expire_unpaid_orders()
+            if not options['watch']:
+                break
+            time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Processed {total_events} events, {total_paid} orders marked paid, "
+            f"{total_expired} unpaid orders cancelled"
+        ))
@@ -0,0 +1,19 @@
+# Generated by Django 5.0 on 2026-10-18 19:31
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0006_payment_events'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('is_paid', False), ('payment_method', 'STRIPE'), ('status', 'P')), fields=['updated_at'], name='order_unpaid_stripe_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0 on 2026-10-18 20:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0007_unpaid_stripe_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='needs_refund',
+            field=models.BooleanField(default=False),
+        ),
+    ]
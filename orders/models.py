@@ -3,9 +3,10 @@ from django.db import models
 from django.utils import timezone
 from users.models import CustomUser
 from products.models import Product
+from core.status_tracking import StatusTrackingMixin
 
 
-class Order(models.Model):
+class Order(StatusTrackingMixin, models.Model):
     STATUS_CHOICES = [
         ('P', 'Pending'),
         ('PR', 'Processing'),
@@ -30,6 +31,8 @@ class Order(models.Model):
     shipping_cost = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     is_paid = models.BooleanField(default=False)
     paid_at = models.DateTimeField(null=True, blank=True)
+    # Paid after it was cancelled, with its stock already sold again
+    needs_refund = models.BooleanField(default=False)
     delivered_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -55,13 +58,21 @@ class Order(models.Model):
     def mark_as_paid(self):
         self.is_paid = True
         self.paid_at = timezone.now()
-        self.save()
+        self.save(update_fields=['is_paid', 'paid_at', 'updated_at'])
 
     def can_be_cancelled(self):
         return self.status in ['P', 'PR']
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination of the order lists
+            models.Index(fields=['user', 'created_at', 'id'], name='order_user_created_idx'),
+            models.Index(fields=['created_at', 'id'], name='order_created_idx'),
+            # The sweep for unpaid Stripe orders whose stock reservation ran out
+            models.Index(fields=['updated_at'], name='order_unpaid_stripe_idx',
+                         condition=models.Q(payment_method='STRIPE', status='P', is_paid=False)),
+        ]
 
 
 class OrderItem(models.Model):
@@ -80,3 +91,29 @@ class OrderItem(models.Model):
     def get_price_float(self):
         """Helper method to get price as float for JSON responses"""
         return float(self.price)
+
+
+class PaymentEvent(models.Model):
+    """
+    A Stripe webhook event, stored as soon as it arrives and applied later by
+    `manage.py process_payment_events`. The unique event id makes Stripe's
+    redeliveries no-ops.
+    """
+    stripe_event_id = models.CharField(max_length=255, unique=True)
+    event_type = models.CharField(max_length=100)
+    payload = models.JSONField()
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ['received_at', 'id']
+        indexes = [
+            # The worker only ever reads the backlog of unprocessed events
+            models.Index(fields=['received_at', 'id'], condition=models.Q(processed_at__isnull=True),
+                         name='paymentevent_pending_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.event_type} ({self.stripe_event_id})"
@@ -0,0 +1,77 @@
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+import stripe
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+
+class StripeGateway:
+    """
+    Stripe calls made through one pooled HTTP session, with timeouts and retries
+    from settings (STRIPE_TIMEOUT, STRIPE_MAX_RETRIES). The `a`-prefixed methods are
+    for async views: they run the call on the gateway's own thread pool, so a slow
+    Stripe round trip holds neither the event loop nor a WSGI worker. That pool and
+    the HTTP connection pool are both STRIPE_POOL_SIZE wide, which is what bounds
+    concurrent Stripe calls (the loop's default executor would cap them at a few
+    threads per CPU).
+    """
+
+    def __init__(self, api_key=None, api_base=None, timeout=None, max_retries=None, pool_size=None):
+        pool_size = pool_size or settings.STRIPE_POOL_SIZE
+        self.executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix='stripe')
+        self.session = requests.Session()
+        self.session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+        self.session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+        self.client = stripe.StripeClient(
+            api_key or settings.STRIPE_SECRET_KEY,
+            base_addresses={'api': api_base or settings.STRIPE_API_BASE},
+            max_network_retries=settings.STRIPE_MAX_RETRIES if max_retries is None else max_retries,
+            http_client=stripe.RequestsClient(timeout=timeout or settings.STRIPE_TIMEOUT, session=self.session),
+        )
+
+    def create_checkout_session(self, **params):
+        return self.client.checkout.sessions.create(params=params)
+
+    def retrieve_checkout_session(self, session_id):
+        return self.client.checkout.sessions.retrieve(session_id)
+
+    async def run_in_pool(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+
+    async def acreate_checkout_session(self, **params):
+        return await self.run_in_pool(self.create_checkout_session, **params)
+
+    async def aretrieve_checkout_session(self, session_id):
+        return await self.run_in_pool(self.retrieve_checkout_session, session_id)
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+        self.session.close()
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway():
+    """The process-wide gateway, so every request reuses the same connection pool."""
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                _gateway = StripeGateway()
+    return _gateway
+
+
+def reset_gateway():
+    """Drop the shared gateway, e.g. after changing the Stripe settings in tests."""
+    global _gateway
+    with _gateway_lock:
+        if _gateway is not None:
+            _gateway.close()
+        _gateway = None
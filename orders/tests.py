@@ -1,3 +1,381 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
 
-# Create your tests here.
+import stripe
+from django.db import OperationalError, connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.conf import settings
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+
+from cart.utils import CartLine
+from chat.models import ChatRoom
+from leaderboard.models import UserDiscount
+from products.models import Category, Product
+from users.models import CustomUser
+from .checkout import CheckoutError, InsufficientStock, expire_unpaid_orders, place_order
+from .fake_stripe import FakeStripeServer, sign_payload
+from .models import Order, OrderItem, PaymentEvent
+from .payments import StripeGateway, reset_gateway
+from .webhooks import process_payment_events, receive_event
+
+
+def line(product, quantity):
+    return CartLine(product, quantity, product.price, product.price * quantity)
+
+
+def new_order(user):
+    return Order(user=user, payment_method='COD', shipping_address='1 Stadium Road', order_total=0)
+
+
+class PlaceOrderTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Football')
+        cls.jersey = Product.objects.create(
+            name='Home Jersey', category=category, sku='J-1', price=1500, stock=5, description='Kit',
+        )
+        cls.boots = Product.objects.create(
+            name='Boots', category=category, sku='B-1', price=3000, stock=1, description='Boots',
+        )
+        cls.user = CustomUser.objects.create_user(username='fan', email='fan@example.com', password='pass')
+        cls.staff = CustomUser.objects.create_user(
+            username='staff', email='staff@example.com', password='pass', is_staff=True
+        )
+        ChatRoom.objects.create(user=cls.user, admin=cls.staff)
+
+    def test_reserves_stock_and_bulk_creates_items(self):
+        with CaptureQueriesContext(connection) as queries:
+            order = place_order(new_order(self.user), [line(self.jersey, 2), line(self.boots, 1)])
+        writes = [
+            q['sql'].split(' (')[0] for q in queries
+            if q['sql'].startswith(('INSERT INTO "orders', 'UPDATE "orders'))
+        ]
+        self.assertEqual(writes, ['INSERT INTO "orders_order"', 'INSERT INTO "orders_orderitem"'])
+        self.assertEqual(
+            sorted(order.items.values_list('product__sku', 'quantity')), [('B-1', 1), ('J-1', 2)]
+        )
+        self.assertEqual(
+            dict(Product.objects.values_list('sku', 'stock')), {'J-1': 3, 'B-1': 0}
+        )
+
+    def test_insufficient_stock_writes_nothing(self):
+        with self.assertRaises(InsufficientStock) as raised:
+            place_order(new_order(self.user), [line(self.jersey, 2), line(self.boots, 3)])
+        self.assertEqual(raised.exception.shortages, [(self.boots, 3, 1)])
+        self.assertIn("only 1 of Boots left", str(raised.exception))
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(dict(Product.objects.values_list('sku', 'stock')), {'J-1': 5, 'B-1': 1})
+
+    def test_discount_is_used_by_the_order(self):
+        discount, = UserDiscount.issue([self.user])
+        order = place_order(new_order(self.user), [line(self.jersey, 1)], discount=discount)
+        discount.refresh_from_db()
+        self.assertEqual((discount.is_used, discount.order_id), (True, order.pk))
+
+        with self.assertRaises(CheckoutError):
+            place_order(new_order(self.user), [line(self.jersey, 1)], discount=discount)
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(Product.objects.get(pk=self.jersey.pk).stock, 4)
+
+    def test_checkout_view_reports_shortage(self):
+        self.client.force_login(self.user)
+        self.client.post(reverse('cart_add', args=[self.boots.pk]), {'quantity': 2})
+        response = self.client.post(reverse('order_create'), {
+            'payment_method': 'COD', 'shipping_address': '1 Stadium Road',
+        }, follow=True)
+        self.assertRedirects(response, reverse('cart_detail'))
+        self.assertContains(response, "only 1 of Boots left, 2 requested")
+        self.assertFalse(OrderItem.objects.exists())
+
+    def test_checkout_view_places_order(self):
+        self.client.force_login(self.user)
+        self.client.post(reverse('cart_add', args=[self.jersey.pk]), {'quantity': 2})
+        self.client.post(reverse('order_create'), {
+            'payment_method': 'COD', 'shipping_address': '1 Stadium Road',
+        })
+        order = Order.objects.get()
+        self.assertEqual((order.status, order.order_total), ('P', Decimal('3000.00')))
+        self.assertEqual(Product.objects.get(pk=self.jersey.pk).stock, 3)
+
+    def test_cancelling_releases_stock_once(self):
+        order = place_order(new_order(self.user), [line(self.jersey, 2), line(self.boots, 1)])
+        self.client.force_login(self.staff)
+        url = reverse('order_status_update', args=[order.pk])
+        self.client.post(url, {'status': 'C'})
+        self.client.post(url, {'status': 'C'})
+        self.assertEqual(Order.objects.get().status, 'C')
+        self.assertEqual(dict(Product.objects.values_list('sku', 'stock')), {'J-1': 5, 'B-1': 1})
+
+        # Reopening takes the stock again, and is refused once it has been sold
+        self.client.post(url, {'status': 'P'})
+        self.assertEqual(dict(Product.objects.values_list('sku', 'stock')), {'J-1': 3, 'B-1': 0})
+        self.client.post(url, {'status': 'C'})
+        place_order(new_order(self.user), [line(self.boots, 1)])
+        response = self.client.post(url, {'status': 'PR'})
+        self.assertContains(response, "Boots is out of stock")
+        self.assertEqual(Order.objects.get(pk=order.pk).status, 'C')
+        self.assertEqual(dict(Product.objects.values_list('sku', 'stock')), {'J-1': 5, 'B-1': 0})
+
+
+class ConcurrentCheckoutTests(TransactionTestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Football')
+        self.product = Product.objects.create(
+            name='Signed Ball', category=category, sku='BALL-1', price=9000, stock=1, description='Last one',
+        )
+        self.users = [
+            CustomUser.objects.create_user(username=f'fan{i}', email=f'fan{i}@example.com', password='pass')
+            for i in range(8)
+        ]
+
+    def test_last_unit_is_sold_once(self):
+        placed, refused, errors = [], [], []
+        start = threading.Barrier(len(self.users))
+
+        def checkout(user):
+            # As in ConcurrentScoreTests, the in-memory test database refuses contended
+            # statements outright; the refused transaction was rolled back, so retry it.
+            for _ in range(200):
+                try:
+                    return place_order(new_order(user), [line(self.product, 1)])
+                except OperationalError as e:
+                    if 'locked' not in str(e):
+                        raise
+                    time.sleep(0.001)
+            raise AssertionError("Checkout never got through")
+
+        def buy(user):
+            try:
+                start.wait()
+                placed.append(checkout(user))
+            except InsufficientStock:
+                refused.append(user)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=buy, args=[user]) for user in self.users]
+        began = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - began
+
+        self.assertEqual(errors, [])
+        self.assertEqual((len(placed), len(refused)), (1, len(self.users) - 1))
+        self.assertEqual(Product.objects.get(pk=self.product.pk).stock, 0)
+        self.assertEqual(OrderItem.objects.count(), 1)
+        self.assertLess(elapsed, 10)
+
+
+class StripeGatewayTests(TestCase):
+    def test_concurrent_sessions_share_the_pool(self):
+        # Four times what the event loop's default executor would run at once
+        default_threads = min(32, (os.cpu_count() or 1) + 4)
+        calls, latency = 4 * default_threads, 1.0
+        with FakeStripeServer(latency=latency) as server:
+            gateway = StripeGateway(api_key='sk_test', api_base=server.api_base, pool_size=calls)
+
+            async def open_sessions():
+                return await asyncio.gather(*[
+                    gateway.acreate_checkout_session(mode='payment', metadata={'order_id': i})
+                    for i in range(calls)
+                ])
+
+            began = time.perf_counter()
+            sessions = asyncio.run(open_sessions())
+            elapsed = time.perf_counter() - began
+            gateway.close()
+
+        self.assertEqual(sorted(int(s.metadata['order_id']) for s in sessions), list(range(calls)))
+        # All in flight at once: about one round trip, where the default executor needs four
+        self.assertLess(elapsed, 3 * latency)
+
+    def test_timeout(self):
+        with FakeStripeServer(latency=2) as server:
+            gateway = StripeGateway(api_key='sk_test', api_base=server.api_base, timeout=1, max_retries=0)
+            with self.assertRaises(stripe.APIConnectionError):
+                gateway.create_checkout_session(mode='payment')
+            gateway.close()
+
+
+class StripeCheckoutTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Football')
+        cls.jersey = Product.objects.create(
+            name='Home Jersey', category=category, sku='J-1', price=1500, stock=5, description='Kit',
+        )
+        cls.user = CustomUser.objects.create_user(username='fan', email='fan@example.com', password='pass')
+        staff = CustomUser.objects.create_user(
+            username='staff', email='staff@example.com', password='pass', is_staff=True
+        )
+        ChatRoom.objects.create(user=cls.user, admin=staff)
+
+    def setUp(self):
+        self.server = FakeStripeServer().__enter__()
+        self.addCleanup(self.server.__exit__)
+        settings_override = override_settings(
+            STRIPE_API_BASE=self.server.api_base, STRIPE_WEBHOOK_SECRET='whsec_test'
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        reset_gateway()
+        self.addCleanup(reset_gateway)
+        self.client.force_login(self.user)
+
+    def checkout(self):
+        self.client.post(reverse('cart_add', args=[self.jersey.pk]), {'quantity': 2})
+        response = self.client.post(reverse('order_create'), {
+            'payment_method': 'STRIPE', 'shipping_address': '1 Stadium Road',
+        })
+        order = Order.objects.get()
+        self.assertRedirects(response, reverse('order_pay', args=[order.pk]), fetch_redirect_response=False)
+        response = self.client.get(response.url)
+        session, = self.server.sessions.values()
+        self.assertEqual(response.url, session['url'])
+        self.assertEqual(session['metadata'], {'order_id': str(order.pk)})
+        self.assertEqual(session['amount_total'], 300000)
+        return order, session
+
+    def send_webhook(self, event, secret='whsec_test'):
+        payload = json.dumps(event)
+        return self.client.post(
+            reverse('stripe_webhook'), payload, content_type='application/json',
+            HTTP_STRIPE_SIGNATURE=sign_payload(payload, secret),
+        )
+
+    def test_webhook_marks_order_paid(self):
+        order, session = self.checkout()
+        response = self.client.get(reverse('payment_success'), {'order': order.pk})
+        self.assertContains(response, "Confirming Payment")
+        self.assertEqual(len(self.client.get(reverse('cart_detail')).context['cart']), 0)
+
+        event = self.server.complete(session['id'])
+        self.assertEqual(self.send_webhook(event).status_code, 200)
+        # Stripe retries deliveries it thinks failed
+        self.assertEqual(self.send_webhook(event).status_code, 200)
+        self.assertEqual(PaymentEvent.objects.count(), 1)
+        order.refresh_from_db()
+        self.assertFalse(order.is_paid)
+
+        call_command('process_payment_events', stdout=StringIO())
+        order.refresh_from_db()
+        self.assertTrue(order.is_paid)
+        self.assertContains(self.client.get(reverse('payment_success'), {'order': order.pk}), "Payment Successful")
+
+    def test_webhook_rejects_bad_signature(self):
+        order, session = self.checkout()
+        response = self.send_webhook(self.server.complete(session['id']), secret='whsec_other')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(PaymentEvent.objects.exists())
+
+    def test_webhook_refuses_when_secret_is_unset(self):
+        order, session = self.checkout()
+        with override_settings(STRIPE_WEBHOOK_SECRET=''), self.assertLogs('orders.views', 'ERROR'):
+            response = self.send_webhook(self.server.complete(session['id']), secret='')
+        self.assertEqual(response.status_code, 500)
+        self.assertFalse(PaymentEvent.objects.exists())
+
+    def test_expired_checkout_releases_stock(self):
+        order, session = self.checkout()
+        self.assertEqual(Product.objects.get(pk=self.jersey.pk).stock, 3)
+        Order.objects.filter(pk=order.pk).update(updated_at=timezone.now() - timedelta(minutes=61))
+        event = {**self.server.complete(session['id'], paid=False), 'type': 'checkout.session.expired'}
+        self.assertEqual(self.send_webhook(event).status_code, 200)
+        self.assertEqual(process_payment_events(), (1, 0))
+
+        self.assertEqual(Order.objects.get().status, 'C')
+        self.assertEqual(Product.objects.get(pk=self.jersey.pk).stock, 5)
+        # Cancelled orders can no longer be paid
+        self.assertEqual(self.client.get(reverse('order_pay', args=[order.pk])).status_code, 404)
+
+    def test_unpaid_orders_are_cancelled_after_the_timeout(self):
+        order, session = self.checkout()
+        cod_order = place_order(new_order(self.user), [line(self.jersey, 1)])
+        call_command('process_payment_events', stdout=StringIO())
+        self.assertEqual(Order.objects.get(pk=order.pk).status, 'P')
+
+        # Past the session's expiry the sweep still waits out the grace period
+        Order.objects.update(updated_at=timezone.now() - timedelta(minutes=61))
+        call_command('process_payment_events', stdout=StringIO())
+        self.assertEqual(Order.objects.get(pk=order.pk).status, 'P')
+
+        # Only unpaid Stripe orders are cancelled once the window has passed
+        Order.objects.update(updated_at=timezone.now() - timedelta(minutes=91))
+        paid = place_order(Order(
+            user=self.user, payment_method='STRIPE', shipping_address='1 Stadium Road', order_total=0,
+        ), [line(self.jersey, 1)])
+        Order.objects.filter(pk=paid.pk).update(is_paid=True, updated_at=timezone.now() - timedelta(minutes=91))
+        out = StringIO()
+        call_command('process_payment_events', stdout=out)
+        self.assertIn("1 unpaid orders cancelled", out.getvalue())
+        self.assertEqual(
+            dict(Order.objects.values_list('pk', 'status')), {order.pk: 'C', cod_order.pk: 'P', paid.pk: 'P'}
+        )
+        self.assertEqual(Product.objects.get(pk=self.jersey.pk).stock, 3)
+
+    def expire(self, order):
+        Order.objects.filter(pk=order.pk).update(updated_at=timezone.now() - timedelta(minutes=91))
+        self.assertEqual(expire_unpaid_orders(), 1)
+        self.assertEqual(Product.objects.get(pk=self.jersey.pk).stock, 5)
+
+    def test_payment_after_expiry_reopens_the_order(self):
+        order, session = self.checkout()
+        self.expire(order)
+        self.assertEqual(self.send_webhook(self.server.complete(session['id'])).status_code, 200)
+        self.assertEqual(process_payment_events(), (1, 1))
+
+        order.refresh_from_db()
+        self.assertEqual((order.status, order.is_paid, order.needs_refund), ('P', True, False))
+        self.assertEqual(Product.objects.get(pk=self.jersey.pk).stock, 3)
+
+    def test_payment_after_expiry_and_resale_is_flagged_for_refund(self):
+        order, session = self.checkout()
+        self.expire(order)
+        place_order(new_order(self.user), [line(self.jersey, 4)])
+        self.assertEqual(self.send_webhook(self.server.complete(session['id'])).status_code, 200)
+        self.assertEqual(process_payment_events(), (1, 1))
+
+        order.refresh_from_db()
+        self.assertEqual((order.status, order.is_paid, order.needs_refund), ('C', True, True))
+        self.assertEqual(Product.objects.get(pk=self.jersey.pk).stock, 1)
+
+    def test_events_are_applied_once_in_batches(self):
+        order, session = self.checkout()
+        unpaid = {**self.server.complete(session['id'], paid=False), 'id': 'evt_unpaid'}
+        paid = {**self.server.complete(session['id']), 'id': 'evt_paid'}
+        replay = {**paid, 'id': 'evt_replay'}
+        broken = {'id': 'evt_broken', 'type': 'checkout.session.completed', 'data': {}}
+        for event in [unpaid, paid, replay, broken]:
+            receive_event(event)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(process_payment_events(), (4, 1))
+        order_updates = [q for q in queries if q['sql'].startswith('UPDATE "orders_order"')]
+        self.assertEqual(len(order_updates), 1)
+        self.assertEqual(process_payment_events(), (1, 0))
+
+        order.refresh_from_db()
+        self.assertTrue(order.is_paid)
+        self.assertEqual(
+            dict(PaymentEvent.objects.filter(processed_at__isnull=True).values_list('stripe_event_id', 'attempts')),
+            {'evt_broken': 2},
+        )
+
+    def test_pay_requires_login(self):
+        self.client.logout()
+        response = self.client.get(reverse('order_pay', args=[1]))
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(settings.LOGIN_URL, response.url)
@@ -1,6 +1,7 @@
 from django.urls import path
 from .views import (
-    OrderListView, OrderDetailView, OrderCreateView, OrderStatusUpdateView, PaymentSuccessView, PaymentCancelledView
+    OrderListView, OrderDetailView, OrderCreateView, OrderStatusUpdateView, PaymentCancelledView,
+    stripe_checkout, payment_success, stripe_webhook,
 )
 
 urlpatterns = [
@@ -9,6 +10,9 @@ urlpatterns = [
     path('create/', OrderCreateView.as_view(), name='order_create'),
     path('<int:pk>/update-status/', OrderStatusUpdateView.as_view(), name='order_status_update'),
 
-    path('payment/success/', PaymentSuccessView.as_view(), name='payment_success'),
+    path('<int:pk>/pay/', stripe_checkout, name='order_pay'),
+
+    path('payment/success/', payment_success, name='payment_success'),
     path('payment/cancelled/', PaymentCancelledView.as_view(), name='payment_cancelled'),
+    path('payment/webhook/', stripe_webhook, name='stripe_webhook'),
 ]
@@ -1,25 +1,35 @@
-from datetime import datetime
+import logging
+from datetime import timedelta
+from functools import wraps
 from django.utils import timezone
 from decimal import Decimal
 import stripe
+from django.contrib.auth.decorators import login_required
+from django.contrib.auth.views import redirect_to_login
+from django.http import HttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, TemplateView
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.urls import reverse_lazy
-from django.shortcuts import get_object_or_404, redirect, render
+from django.shortcuts import aget_object_or_404, get_object_or_404, redirect, render
 from django.urls import reverse
 from django.contrib import messages
-from django.core.mail import send_mail
 from django.conf import settings
-from .models import Order, OrderItem
+from .checkout import CheckoutError, InsufficientStock, change_status, place_order
+from .models import Order
+from .payments import get_gateway
+from .webhooks import receive_event
 from .forms import OrderForm, OrderStatusForm
 from cart.utils import SessionCart
 from website.models import SiteConfiguration
 from leaderboard.models import UserDiscount
+from core.pagination import CursorPaginationMixin
 
-stripe.api_key = settings.STRIPE_SECRET_KEY
+logger = logging.getLogger(__name__)
 
 
-class OrderListView(LoginRequiredMixin, ListView):
+class OrderListView(LoginRequiredMixin, CursorPaginationMixin, ListView):
     model = Order
     template_name = 'orders/order_list.html'
     context_object_name = 'orders'
@@ -51,10 +61,14 @@ class OrderStatusUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView)
         return self.request.user.is_staff
 
     def form_valid(self, form):
-        order = form.save()
-        if order.status == 'D' and not order.delivered_at:
-            order.delivered_at = datetime.now()
-            order.save()
+        order = form.save(commit=False)
+        if order.status_changed() and order.status == 'D' and not order.delivered_at:
+            order.delivered_at = timezone.now()
+        try:
+            change_status(order)
+        except InsufficientStock as e:
+            form.add_error('status', str(e))
+            return self.form_invalid(form)
         messages.success(self.request, f"Order #{order.order_number} status updated to {order.get_status_display()}")
         return redirect('order_detail', pk=order.pk)
 
@@ -64,18 +78,23 @@ class OrderCreateView(LoginRequiredMixin, CreateView):
     form_class = OrderForm
     template_name = 'orders/order_create.html'
     success_url = reverse_lazy('order_list')
-    try:
-        site_config_obj = SiteConfiguration.objects.first()
-    except Exception as e:
-        site_config_obj = None
-    shipping_cost = site_config_obj.shipping_cost if site_config_obj else 0.0
-    tax_cost = site_config_obj.tax_percentage if site_config_obj else 0.0
+
+    # Read per request so configuration changes apply without a restart
+    @property
+    def shipping_cost(self):
+        site_config = SiteConfiguration.get_cached()
+        return site_config.shipping_cost if site_config else Decimal('0.00')
+
+    @property
+    def tax_cost(self):
+        site_config = SiteConfiguration.get_cached()
+        return site_config.tax_percentage if site_config else Decimal('0.00')
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        cart = SessionCart(self.request)
+        cart = SessionCart.for_request(self.request)
         context['cart'] = cart
-        context['cart_items'] = list(cart.__iter__())
+        context['cart_items'] = list(cart)
         context['stripe_public_key'] = settings.STRIPE_PUBLIC_KEY
         context['stripe_amount'] = int(cart.get_total_price() + self.shipping_cost)
         context['shipping_cost'] = self.shipping_cost
@@ -88,13 +107,14 @@ class OrderCreateView(LoginRequiredMixin, CreateView):
             expires_at__gte=now
         ).first()
 
-        cart = SessionCart(self.request)
+        cart = SessionCart.for_request(self.request)
         if len(cart) == 0:
             messages.error(self.request, "Your cart is empty")
             return redirect('cart_detail')
 
         order = form.save(commit=False)
         order.user = self.request.user
+        discount = None
         if (
                 has_discount
                 and not has_discount.is_used
@@ -105,108 +125,124 @@ class OrderCreateView(LoginRequiredMixin, CreateView):
             discount_amount = - - (total_price * discount_percentage / Decimal('100'))
 
             order.order_total = max(discount_amount, Decimal('0.00'))  # ensures non-negative
-            has_discount.is_used=True
-            has_discount.save()
+            discount = has_discount
         else:
             order.order_total = cart.get_total_price()
         order.shipping_cost = self.shipping_cost
         order.tax = self.tax_cost
-        order.save()
-
-        # Create order items
-        for item in cart:
-            OrderItem.objects.create(
-                order=order,
-                product=item['product'],
-                price=item['price'],
-                quantity=item['quantity']
-            )
+        order.status = 'P'
+
+        try:
+            place_order(order, cart, discount=discount)
+        except CheckoutError as e:
+            messages.error(self.request, str(e))
+            return redirect('cart_detail')
+
         if order.payment_method == 'STRIPE':
-            return self.stripe_checkout(cart, order)
+            return redirect('order_pay', pk=order.pk)
         else:
-            order.status = 'P'
-            order.save()
-            # create cart session
             cart.clear()
             messages.success(self.request, "Order created successfully")
             return redirect('order_detail', pk=order.pk)
 
-    def stripe_checkout(self, cart, order):
-        # Redirect to Stripe checkout session
-        stripe.api_key = settings.STRIPE_SECRET_KEY
-
-        line_items = [
-            {
-                'price_data': {
-                    'currency': 'BDT',
-                    'product_data': {
-                        'name': item['product'].name,
-                    },
-                    'unit_amount': int(item['price'] * 100),  # Stripe uses cents
-                },
-                'quantity': item['quantity'],
-            } for item in cart
-        ]
 
-        # Add shipping cost as a separate line item
-        line_items.append({
+def async_login_required(view):
+    """login_required for async views, which Django's decorator does not support yet."""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        user = await request.auser()
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+@async_login_required
+async def stripe_checkout(request, pk):
+    """Open a Stripe checkout session for an unpaid order and send the customer to it."""
+    user = await request.auser()
+    order = await aget_object_or_404(Order.objects.exclude(status='C'), pk=pk, user=user, is_paid=False)
+    # Each new session restarts the window expire_unpaid_orders allows for payment
+    now = timezone.now()
+    await Order.objects.filter(pk=order.pk).aupdate(updated_at=now)
+
+    line_items = [
+        {
             'price_data': {
                 'currency': 'BDT',
                 'product_data': {
-                    'name': 'Shipping Cost',
+                    'name': item.product.name,
                 },
-                'unit_amount': int(self.shipping_cost * 100),
+                'unit_amount': int(item.price * 100),  # Stripe uses cents
+            },
+            'quantity': item.quantity,
+        } async for item in order.items.select_related('product')
+    ]
+
+    # Add shipping cost as a separate line item
+    line_items.append({
+        'price_data': {
+            'currency': 'BDT',
+            'product_data': {
+                'name': 'Shipping Cost',
             },
-            'quantity': 1,
-        })
+            'unit_amount': int(order.shipping_cost * 100),
+        },
+        'quantity': 1,
+    })
 
-        checkout_session = stripe.checkout.Session.create(
+    try:
+        checkout_session = await get_gateway().acreate_checkout_session(
             payment_method_types=['card'],
             line_items=line_items,
             mode='payment',
-            success_url=self.request.build_absolute_uri(
-                reverse_lazy('payment_success')) + f'?session_id={{CHECKOUT_SESSION_ID}}',
-            cancel_url=self.request.build_absolute_uri(reverse_lazy('payment_cancelled')),
-            metadata={'order_id': order.id}
+            success_url=request.build_absolute_uri(
+                reverse('payment_success')) + f'?order={order.pk}',
+            cancel_url=request.build_absolute_uri(reverse('payment_cancelled')),
+            metadata={'order_id': order.id},
+            expires_at=int((now + timedelta(minutes=settings.STRIPE_CHECKOUT_TIMEOUT)).timestamp()),
         )
+    except stripe.StripeError as e:
+        messages.error(request, e.user_message or "We could not reach the payment provider, please try again.")
+        return redirect('order_detail', pk=order.pk)
 
-        return redirect(checkout_session.url)
-
-
-class PaymentSuccessView(LoginRequiredMixin, TemplateView):
-    template_name = 'orders/payment_success.html'
-
-    def get(self, request, *args, **kwargs):
-        session_id = request.GET.get('session_id')
-        if session_id:
-            try:
-                # Retrieve the Stripe session
-                session = stripe.checkout.Session.retrieve(session_id)
-
-                # Get the order from metadata
-                order = Order.objects.get(
-                    id=session.metadata.order_id,
-                    user=request.user
-                )
-
-                # Mark as paid
-                order.mark_as_paid()
-
-                # Clear the cart
-                SessionCart(request).clear()
-
-                # Clear the session order ID
-                if 'current_order_id' in request.session:
-                    del request.session['current_order_id']
+    return redirect(checkout_session.url)
 
-                return render(request, self.template_name, {'order': order})
 
-            except Exception as e:
-                messages.error(request, str(e))
-                return redirect('order_list')
-        messages.success(self.request, "Your order is not valid!")
+@csrf_exempt
+@require_POST
+def stripe_webhook(request):
+    """Stripe's webhook: verify the signature and queue the event for process_payment_events."""
+    if not settings.STRIPE_WEBHOOK_SECRET:
+        # An empty key would accept any payload signed with an empty key
+        logger.error("STRIPE_WEBHOOK_SECRET is not set, rejecting Stripe webhook")
+        return HttpResponse(status=500)
+    try:
+        event = stripe.Webhook.construct_event(
+            request.body, request.headers.get('Stripe-Signature', ''), settings.STRIPE_WEBHOOK_SECRET
+        )
+    except (ValueError, stripe.SignatureVerificationError):
+        return HttpResponse(status=400)
+    receive_event(event.to_dict())
+    return HttpResponse(status=200)
+
+
+@login_required
+def payment_success(request):
+    """
+    Where Stripe sends the customer back. The payment itself is confirmed by the
+    webhook, so this only shows the order as it stands.
+    """
+    try:
+        order = Order.objects.get(pk=request.GET.get('order'), user=request.user)
+    except (Order.DoesNotExist, ValueError):
+        messages.success(request, "Your order is not valid!")
         return redirect('order_list')
 
+    SessionCart.for_request(request).clear()
+    request.session.pop('current_order_id', None)
+    return render(request, 'orders/payment_success.html', {'order': order})
+
 
 class PaymentCancelledView(LoginRequiredMixin, TemplateView):
     template_name = 'orders/payment_cancelled.html'
@@ -0,0 +1,81 @@
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .checkout import accept_late_payment, expire_unpaid_orders
+from .models import Order, PaymentEvent
+
+# Card payments arrive paid with checkout.session.completed; delayed methods
+# (bank debits) complete unpaid and are paid by async_payment_succeeded later.
+PAID_EVENT_TYPES = {'checkout.session.completed', 'checkout.session.async_payment_succeeded'}
+# A session nobody paid within its expires_at; the order's stock goes back
+EXPIRED_EVENT_TYPES = {'checkout.session.expired'}
+PROCESS_BATCH_SIZE = 100
+MAX_ATTEMPTS = 5
+
+
+def receive_event(event):
+    """Store a verified Stripe event for the worker. Redelivered events are ignored."""
+    PaymentEvent.objects.bulk_create([
+        PaymentEvent(stripe_event_id=event['id'], event_type=event['type'], payload=event),
+    ], ignore_conflicts=True)
+
+
+def paid_order_id(event):
+    """The id of the order `event` pays for, or None when it does not confirm a payment."""
+    if event.event_type not in PAID_EVENT_TYPES:
+        return None
+    session = event.payload['data']['object']
+    if session.get('payment_status') != 'paid':
+        return None
+    return int(session['metadata']['order_id'])
+
+
+def expired_order_id(event):
+    """The id of the order whose checkout session `event` reports expired, or None."""
+    if event.event_type not in EXPIRED_EVENT_TYPES:
+        return None
+    return int(event.payload['data']['object']['metadata']['order_id'])
+
+
+@transaction.atomic
+def process_payment_events(batch_size=PROCESS_BATCH_SIZE):
+    """
+    Apply the oldest pending events: every order they pay for is marked paid by a
+    single UPDATE, and the events are marked processed by another. Orders that are
+    already paid are left alone, so replaying an event changes nothing. Payments for
+    orders cancelled meanwhile go through accept_late_payment, and orders of expired
+    sessions are cancelled and their stock released by expire_unpaid_orders.
+    Returns (events handled, orders marked paid).
+    """
+    events = list(
+        PaymentEvent.objects.select_for_update(skip_locked=True)
+        .filter(processed_at__isnull=True, attempts__lt=MAX_ATTEMPTS)[:batch_size]
+    )
+    order_ids, expired_ids, done, failed = set(), set(), [], []
+    for event in events:
+        try:
+            order_id = paid_order_id(event)
+            expired_id = expired_order_id(event)
+        except (KeyError, TypeError, ValueError) as e:
+            failed.append((event, f"{type(e).__name__}: {e}"))
+            continue
+        if order_id is not None:
+            order_ids.add(order_id)
+        if expired_id is not None:
+            expired_ids.add(expired_id)
+        done.append(event.pk)
+
+    now = timezone.now()
+    unpaid = Order.objects.filter(pk__in=order_ids, is_paid=False)
+    late = list(unpaid.filter(status='C').values_list('pk', flat=True))
+    paid = unpaid.exclude(status='C').update(is_paid=True, paid_at=now, updated_at=now)
+    for order_id in late:
+        paid += accept_late_payment(order_id, now)
+    if expired_ids:
+        expire_unpaid_orders(expired_ids)
+    PaymentEvent.objects.filter(pk__in=done).update(processed_at=now, attempts=F('attempts') + 1)
+    for event, error in failed:
+        # Malformed events are rare; after MAX_ATTEMPTS they stay for a human to look at
+        PaymentEvent.objects.filter(pk=event.pk).update(attempts=F('attempts') + 1, last_error=error)
+    return len(events), paid
@@ -1,7 +1,29 @@
 from django.contrib import admin
+from core.csv_export import EXPORT_CHUNK_SIZE, stream_csv
 from .models import Product, Category, ProductImage
 
 
-admin.site.register(Product)
+class ProductAdmin(admin.ModelAdmin):
+    list_display = ('name', 'sku', 'category', 'price', 'discount_price', 'stock', 'is_active')
+    list_filter = ('is_active', 'is_featured', 'category')
+    search_fields = ('name', 'sku')
+    list_select_related = ('category',)
+    actions = ['export_products']
+
+    def export_products(self, request, queryset):
+        rows = queryset.values_list(
+            'name', 'sku', 'category__name', 'price', 'discount_price', 'stock',
+            'brand', 'size', 'color', 'is_active', 'created_at',
+        ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+        return stream_csv('products.csv', [
+            'Name', 'SKU', 'Category', 'Price', 'Discount Price', 'Stock',
+            'Brand', 'Size', 'Color', 'Active', 'Created At'
+        ], rows)
+
+    export_products.short_description = "Export selected products to CSV"
+
+
+admin.site.register(Product, ProductAdmin)
 admin.site.register(Category)
-admin.site.register(ProductImage)
\ No newline at end of file
+admin.site.register(ProductImage)
@@ -0,0 +1,100 @@
+import uuid
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db import transaction
+
+VERSION_KEY = 'products:category_tree:version'
+TREE_KEY = 'products:category_tree:{version}'
+TREE_TIMEOUT = 60 * 60 * 24
+
+# (version, CategoryTree) for this process, rebuilt when the shared version changes
+_process_tree = None
+
+
+class CategoryTree:
+    """
+    The whole category tree loaded in one query, in MPTT (tree_id, lft) order.
+    Answers menu, breadcrumb and descendant lookups without touching the database.
+    """
+
+    def __init__(self, categories):
+        self.categories = categories
+        self.active = [category for category in categories if category.is_active]
+        self.by_id = {category.pk: category for category in categories}
+        self.by_slug = {category.slug: category for category in categories}
+        self.children_map = defaultdict(list)
+        for category in categories:
+            category.total_product_count = category.active_product_count
+            if category.parent_id:
+                self.children_map[category.parent_id].append(category)
+        # Children come after their parent in tree order, so a reverse pass rolls counts up
+        for category in reversed(categories):
+            parent = self.by_id.get(category.parent_id)
+            if parent is not None:
+                parent.total_product_count += category.total_product_count
+        self._descendant_ids = {}
+
+    def get(self, slug):
+        return self.by_slug.get(slug)
+
+    def roots(self):
+        return [category for category in self.active if category.parent_id is None]
+
+    def children(self, category):
+        return [child for child in self.children_map[category.pk] if child.is_active]
+
+    def ancestors(self, category, include_self=False):
+        chain = [category] if include_self else []
+        parent = self.by_id.get(category.parent_id)
+        while parent is not None:
+            chain.append(parent)
+            parent = self.by_id.get(parent.parent_id)
+        chain.reverse()
+        return chain
+
+    def full_path(self, category):
+        return '/'.join(node.slug for node in self.ancestors(category, include_self=True))
+
+    def descendant_ids(self, category, include_self=True):
+        key = (category.pk, include_self)
+        if key not in self._descendant_ids:
+            node = self.by_id.get(category.pk, category)
+            self._descendant_ids[key] = frozenset(
+                other.pk for other in self.categories
+                if other.tree_id == node.tree_id
+                and node.lft <= other.lft and other.rght <= node.rght
+                and (include_self or other.pk != node.pk)
+            )
+        return self._descendant_ids[key]
+
+
+def get_category_tree():
+    global _process_tree
+    from .models import Category
+
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, uuid.uuid4().hex, None)
+        version = cache.get(VERSION_KEY)
+    if _process_tree is not None and _process_tree[0] == version:
+        return _process_tree[1]
+
+    key = TREE_KEY.format(version=version)
+    categories = cache.get(key)
+    if categories is None:
+        categories = list(Category.objects.order_by('tree_id', 'lft'))
+        cache.set(key, categories, TREE_TIMEOUT)
+
+    tree = CategoryTree(categories)
+    _process_tree = (version, tree)
+    return tree
+
+
+def invalidate_category_tree():
+    def bump():
+        cache.set(VERSION_KEY, uuid.uuid4().hex, None)
+
+    bump()
+    # Bump again once committed so a reader that cached the tree mid-transaction is discarded
+    transaction.on_commit(bump)
@@ -1,10 +1,9 @@
-from .models import Category
-from django.shortcuts import redirect
+from core.lazy_context import lazy_context
+from .category_tree import get_category_tree
 
 
 def get_menu_categories(request):
-    categories = Category.objects.filter(is_active=True)
     context = {
-        'menu_categories': categories,
+        'menu_categories': lazy_context(request, 'menu_categories', lambda: get_category_tree().active),
     }
     return context
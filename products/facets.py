@@ -0,0 +1,95 @@
+from django.db.models import Count, Q
+from django.db.models.functions import Coalesce
+
+from .models import Product
+
+FACET_FIELDS = ('brand', 'size', 'color')
+
+# (key, label, lower bound inclusive, upper bound exclusive)
+PRICE_BUCKETS = [
+    ('0-500', 'Under ৳500', None, 500),
+    ('500-1000', '৳500 - ৳1,000', 500, 1000),
+    ('1000-2500', '৳1,000 - ৳2,500', 1000, 2500),
+    ('2500-5000', '৳2,500 - ৳5,000', 2500, 5000),
+    ('5000+', '৳5,000 & above', 5000, None),
+]
+PRICE_BUCKET_KEYS = [bucket[0] for bucket in PRICE_BUCKETS]
+
+
+def get_selected_facets(params):
+    """Read the facet selection out of the request's GET parameters."""
+    return {
+        'brand': params.getlist('brand'),
+        'size': params.getlist('size'),
+        'color': params.getlist('color'),
+        'price': [key for key in params.getlist('price') if key in PRICE_BUCKET_KEYS],
+        'in_stock': params.get('in_stock') == '1',
+    }
+
+
+def price_bucket_q(key):
+    _, _, low, high = PRICE_BUCKETS[PRICE_BUCKET_KEYS.index(key)]
+    q = Q()
+    if low is not None:
+        q &= Q(effective_price__gte=low)
+    if high is not None:
+        q &= Q(effective_price__lt=high)
+    return q
+
+
+def apply_facets(queryset, selected, exclude=None):
+    """
+    Narrow `queryset` by the selected facets, skipping the `exclude` facet so its
+    own counts still show the alternatives the shopper could switch to.
+    """
+    queryset = queryset.annotate(effective_price=Coalesce('discount_price', 'price'))
+    for field in FACET_FIELDS:
+        if field != exclude and selected[field]:
+            queryset = queryset.filter(**{f'{field}__in': selected[field]})
+    if exclude != 'price' and selected['price']:
+        price_q = Q()
+        for key in selected['price']:
+            price_q |= price_bucket_q(key)
+        queryset = queryset.filter(price_q)
+    if exclude != 'in_stock' and selected['in_stock']:
+        queryset = queryset.filter(stock__gt=0)
+    return queryset
+
+
+def compute_facets(queryset, selected):
+    """Facet counts for `queryset`, one aggregate query per facet."""
+    size_labels = dict(Product.SIZE_CHOICES)
+    facets = {}
+
+    for field in FACET_FIELDS:
+        rows = (
+            apply_facets(queryset, selected, exclude=field)
+            .exclude(**{field: ''})
+            .order_by()
+            .values(field)
+            .annotate(count=Count('pk'))
+            .order_by(field)
+        )
+        facets[field] = [{
+            'value': row[field],
+            'label': size_labels.get(row[field], row[field]) if field == 'size' else row[field],
+            'count': row['count'],
+            'selected': row[field] in selected[field],
+        } for row in rows]
+
+    price_counts = apply_facets(queryset, selected, exclude='price').order_by().aggregate(**{
+        f'bucket_{index}': Count('pk', filter=price_bucket_q(key))
+        for index, key in enumerate(PRICE_BUCKET_KEYS)
+    })
+    facets['price'] = [{
+        'value': key,
+        'label': label,
+        'count': price_counts[f'bucket_{index}'],
+        'selected': key in selected['price'],
+    } for index, (key, label, _, _) in enumerate(PRICE_BUCKETS)]
+
+    in_stock = apply_facets(queryset, selected, exclude='in_stock').order_by().aggregate(
+        count=Count('pk', filter=Q(stock__gt=0))
+    )
+    facets['in_stock'] = {'count': in_stock['count'], 'selected': selected['in_stock']}
+    return facets
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from products.category_tree import invalidate_category_tree
+from products.models import Category
+
+
+class Command(BaseCommand):
+    help = "Recompute each category's active product count"
+
+    def handle(self, *args, **options):
+        Category.recount_active_products()
+        invalidate_category_tree()
+        self.stdout.write(self.style.SUCCESS("Category product counts recomputed"))
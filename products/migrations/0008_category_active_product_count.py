@@ -0,0 +1,28 @@
+# Generated by Django 5.0 on 2026-10-18 18:30
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def populate_counts(apps, schema_editor):
+    Category = apps.get_model('products', 'Category')
+    for category in Category.objects.annotate(
+        count=Count('products', filter=Q(products__is_active=True))
+    ).filter(count__gt=0):
+        Category.objects.filter(pk=category.pk).update(active_product_count=category.count)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0007_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='active_product_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_counts, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import Q
 from mptt.models import MPTTModel, TreeForeignKey
 from django.utils.text import slugify
 from django.urls import reverse
@@ -11,6 +12,8 @@ class Category(MPTTModel):
     description = models.TextField(blank=True)
     image = models.ImageField(upload_to='categories/', blank=True)
     is_active = models.BooleanField(default=True)
+    # Active products filed directly under this category, kept in sync by products.signals
+    active_product_count = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -31,11 +34,45 @@ class Category(MPTTModel):
                 counter += 1
         super().save(*args, **kwargs)
 
+    def _do_update(self, base_qs, using, pk_val, values, update_fields, forced_update):
+        # Saving an existing category (admin edits, MPTT moves) would write back the
+        # count it was loaded with and undo the signal handlers' F() updates since, so
+        # only those updates and recount_active_products ever write it
+        values = [value for value in values if value[0].attname != 'active_product_count']
+        return super()._do_update(base_qs, using, pk_val, values, update_fields, forced_update)
+
     def get_absolute_url(self):
         return reverse('category_detail', kwargs={'slug': self.slug})
 
+    @classmethod
+    def recount_active_products(cls):
+        """Recompute active_product_count from scratch, e.g. after bulk product updates."""
+        counts = dict(
+            Product.objects.filter(is_active=True)
+            .order_by()
+            .values_list('category_id')
+            .annotate(count=models.Count('pk'))
+        )
+        for category in cls.objects.only('pk', 'active_product_count'):
+            count = counts.get(category.pk, 0)
+            if category.active_product_count != count:
+                cls.objects.filter(pk=category.pk).update(active_product_count=count)
+
     def get_full_path(self):
-        return '/'.join([cat.slug for cat in self.get_ancestors(include_self=True)])
+        from .category_tree import get_category_tree
+        return get_category_tree().full_path(self)
+
+
+class ProductQuerySet(models.QuerySet):
+    def for_cards(self):
+        """Load category and ordered images up front for product card listings."""
+        return self.select_related('category').prefetch_related(
+            models.Prefetch(
+                'images',
+                queryset=ProductImage.objects.order_by('-is_default', 'id'),
+                to_attr='card_images',
+            )
+        )
 
 
 class Product(models.Model):
@@ -63,9 +100,34 @@ class Product(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ProductQuerySet.as_manager()
+
+    class Meta:
+        # `is_active=True` compiles to a bare `WHERE is_active`, which SQLite will not
+        # match against a leading boolean column, so the storefront indexes are partial
+        # indexes over active products instead.
+        indexes = [
+            # Facet counts group active products by these columns
+            models.Index(fields=['brand'], condition=Q(is_active=True), name='product_live_brand_idx'),
+            models.Index(fields=['size'], condition=Q(is_active=True), name='product_live_size_idx'),
+            models.Index(fields=['color'], condition=Q(is_active=True), name='product_live_color_idx'),
+            # Keyset pagination of the product list for each sort option
+            models.Index(fields=['created_at', 'id'], condition=Q(is_active=True), name='product_live_created_idx'),
+            models.Index(fields=['price', 'id'], condition=Q(is_active=True), name='product_live_price_idx'),
+            # Category pages filter by the category's descendant ids
+            models.Index(fields=['category', 'is_active'], name='product_category_active_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
+    @property
+    def primary_image(self):
+        # Uses the images prefetched by ProductQuerySet.for_cards() when available
+        if hasattr(self, 'card_images'):
+            return self.card_images[0] if self.card_images else None
+        return self.images.order_by('-is_default', 'id').first()
+
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.name)
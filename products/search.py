@@ -0,0 +1,129 @@
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import BooleanField, FloatField, Q
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+FTS_TABLE = 'products_product_fts'
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(query):
+    return TOKEN_RE.findall(query.lower())
+
+
+class BaseSearchBackend:
+    """Search backend interface used by the product listing."""
+
+    def search(self, queryset, query):
+        """Filter `queryset` to products matching `query`, annotated with `search_rank`."""
+        raise NotImplementedError
+
+    def index_product(self, product):
+        pass
+
+    def remove_product(self, product_id):
+        pass
+
+    def rebuild(self):
+        pass
+
+
+class BasicSearchBackend(BaseSearchBackend):
+    """Fallback for databases without a full-text index."""
+
+    def search(self, queryset, query):
+        return queryset.filter(
+            Q(name__icontains=query) |
+            Q(description__icontains=query) |
+            Q(sku__icontains=query)
+        ).annotate(search_rank=RawSQL('0', [], output_field=FloatField()))
+
+
+class SQLiteSearchBackend(BaseSearchBackend):
+    """SQLite FTS5 index kept in sync by products.signals."""
+
+    def match_expression(self, query):
+        # Every token is a quoted prefix term, which also neutralises FTS5 syntax
+        return ' '.join(f'"{token}"*' for token in tokenize(query))
+
+    def search(self, queryset, query):
+        match = self.match_expression(query)
+        if not match:
+            return queryset.none()
+        table = queryset.model._meta.db_table
+        return queryset.filter(
+            pk__in=RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [match])
+        ).annotate(search_rank=RawSQL(
+            # bm25() is lower for better matches, negate it so higher ranks first
+            f'SELECT -bm25({FTS_TABLE}, 10.0, 1.0, 5.0) FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s AND rowid = "{table}"."id"',
+            [match],
+            output_field=FloatField(),
+        ))
+
+    def index_product(self, product):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [product.pk])
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, name, description, sku) VALUES (%s, %s, %s, %s)',
+                [product.pk, product.name, product.description, product.sku]
+            )
+
+    def remove_product(self, product_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [product_id])
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, name, description, sku) '
+                f'SELECT id, name, description, sku FROM products_product'
+            )
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """PostgreSQL full-text search backed by the GIN expression index from migration 0005."""
+
+    # Must match the indexed expression exactly so the planner can use the index
+    document = (
+        "to_tsvector('simple', coalesce(\"products_product\".\"name\", '') || ' ' || "
+        "coalesce(\"products_product\".\"sku\", '') || ' ' || "
+        "coalesce(\"products_product\".\"description\", ''))"
+    )
+
+    def search(self, queryset, query):
+        tokens = tokenize(query)
+        if not tokens:
+            return queryset.none()
+        ts_query = ' & '.join(f'{token}:*' for token in tokens)
+        return queryset.filter(RawSQL(
+            f"{self.document} @@ to_tsquery('simple', %s)", [ts_query], output_field=BooleanField()
+        )).annotate(search_rank=RawSQL(
+            f"ts_rank({self.document}, to_tsquery('simple', %s))", [ts_query], output_field=FloatField()
+        ))
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute('REINDEX INDEX products_product_search_gin')
+
+
+BACKENDS = {
+    'sqlite': SQLiteSearchBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+
+def get_search_backend():
+    backend_path = getattr(settings, 'PRODUCT_SEARCH_BACKEND', None)
+    if backend_path:
+        return import_string(backend_path)()
+    return BACKENDS.get(connection.vendor, BasicSearchBackend)()
+
+
+def search_products(queryset, query):
+    return get_search_backend().search(queryset, query)
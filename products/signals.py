@@ -0,0 +1,58 @@
+from django.db.models import F
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+from mptt.signals import node_moved
+from .models import Category, Product
+from .search import get_search_backend
+from .category_tree import invalidate_category_tree
+
+
+def counted_category_id(product):
+    return product.category_id if product.is_active else None
+
+
+def adjust_active_product_count(category_id, delta):
+    if category_id is not None:
+        Category.objects.filter(pk=category_id).update(
+            active_product_count=F('active_product_count') + delta
+        )
+
+
+@receiver(post_init, sender=Product)
+def remember_counted_category(sender, instance, **kwargs):
+    instance._counted_category_id = counted_category_id(instance)
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, **kwargs):
+    get_search_backend().index_product(instance)
+
+
+@receiver(post_save, sender=Product)
+def update_active_product_count(sender, instance, created, **kwargs):
+    old = None if created else instance._counted_category_id
+    new = counted_category_id(instance)
+    if old != new:
+        adjust_active_product_count(old, -1)
+        adjust_active_product_count(new, 1)
+        instance._counted_category_id = new
+        invalidate_category_tree()
+
+
+@receiver(post_delete, sender=Product)
+def remove_product_from_index(sender, instance, **kwargs):
+    get_search_backend().remove_product(instance.pk)
+
+
+@receiver(post_delete, sender=Product)
+def release_active_product_count(sender, instance, **kwargs):
+    if instance._counted_category_id is not None:
+        adjust_active_product_count(instance._counted_category_id, -1)
+        invalidate_category_tree()
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(node_moved, sender=Category)
+def category_tree_changed(sender, instance, **kwargs):
+    invalidate_category_tree()
@@ -1,3 +1,256 @@
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
 
-# Create your tests here.
+from users.models import CustomUser
+from .category_tree import get_category_tree
+from .models import Category, Product, ProductImage
+
+
+class ProductCardQueryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Football')
+
+    def create_products(self, count):
+        for i in range(Product.objects.count(), Product.objects.count() + count):
+            product = Product.objects.create(
+                name=f'Jersey {i}',
+                category=self.category,
+                sku=f'SKU-{i}',
+                price=100,
+                description='Home kit',
+            )
+            ProductImage.objects.create(product=product, image=f'products/{i}.jpg')
+            ProductImage.objects.create(product=product, image=f'products/{i}-default.jpg', is_default=True)
+
+    def count_queries(self, url):
+        self.client.get(url)  # warm the category tree cache
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_product_list_query_count_is_constant(self):
+        url = reverse('product_list')
+        self.create_products(2)
+        small_page = self.count_queries(url)
+        self.create_products(10)
+        full_page = self.count_queries(url)
+        self.assertEqual(small_page, full_page)
+
+    def test_category_detail_query_count_is_constant(self):
+        url = reverse('category_detail', kwargs={'slug': self.category.slug})
+        self.create_products(2)
+        small_page = self.count_queries(url)
+        self.create_products(10)
+        full_page = self.count_queries(url)
+        self.assertEqual(small_page, full_page)
+
+    def test_primary_image_prefers_default(self):
+        self.create_products(1)
+        product = Product.objects.for_cards().get()
+        self.assertTrue(product.primary_image.is_default)
+        with self.assertNumQueries(0):
+            product.primary_image
+
+
+class ProductSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Football')
+        cls.boots = Product.objects.create(
+            name='Predator Boots', category=category, sku='FB-100', price=100,
+            description='Firm ground football boots',
+        )
+        cls.ball = Product.objects.create(
+            name='Match Ball', category=category, sku='FB-200', price=50,
+            description='Official size 5 ball, pairs well with boots',
+        )
+
+    def search(self, query):
+        response = self.client.get(reverse('product_list'), {'q': query})
+        return list(response.context['products'])
+
+    def test_prefix_match_ranks_name_hits_first(self):
+        self.assertEqual(self.search('boo'), [self.boots, self.ball])
+
+    def test_index_follows_updates_and_deletes(self):
+        self.ball.name = 'Training Cone'
+        self.ball.description = 'Marker'
+        self.ball.save()
+        self.assertEqual(self.search('ball'), [])
+        self.boots.delete()
+        self.assertEqual(self.search('predator'), [])
+
+
+class ProductFacetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Football')
+        for sku, brand, size, price, stock in [
+            ('A-1', 'Adidas', 'M', 400, 5),
+            ('A-2', 'Adidas', 'L', 1200, 0),
+            ('N-1', 'Nike', 'M', 800, 3),
+        ]:
+            Product.objects.create(
+                name=sku, category=category, sku=sku, price=price,
+                stock=stock, brand=brand, size=size, description='Kit',
+            )
+
+    def test_facet_counts_ignore_own_selection(self):
+        response = self.client.get(reverse('product_list'), {'brand': 'Adidas', 'in_stock': '1'})
+        facets = response.context['facets']
+        self.assertEqual(len(response.context['products']), 1)
+        self.assertEqual(
+            [(o['value'], o['count'], o['selected']) for o in facets['brand']],
+            [('Adidas', 1, True), ('Nike', 1, False)]
+        )
+        self.assertEqual([(o['value'], o['count']) for o in facets['size']], [('M', 1)])
+        self.assertEqual(facets['in_stock']['count'], 1)
+
+    def test_price_buckets_use_discount_price(self):
+        Product.objects.filter(sku='A-2').update(discount_price=450)
+        response = self.client.get(reverse('product_list'), {'price': '0-500'})
+        facets = response.context['facets']
+        self.assertEqual(len(response.context['products']), 2)
+        self.assertEqual(facets['price'][0]['count'], 2)
+        self.assertEqual(facets['price'][1]['count'], 1)
+
+
+class ProductCursorPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Football')
+        for i in range(30):
+            # Repeated prices force the id tie-breaker to keep pages disjoint
+            Product.objects.create(
+                name=f'Ball {i}', category=category, sku=f'B-{i}',
+                price=100 + i % 3, description='Ball',
+            )
+
+    def walk(self, params):
+        url = reverse('product_list')
+        seen, cursor = [], None
+        while True:
+            query = dict(params, **({'cursor': cursor} if cursor else {}))
+            response = self.client.get(url, query)
+            page = response.context['page_obj']
+            seen.extend(product.pk for product in page)
+            if not page.has_next():
+                return seen, page
+            cursor = page.next_cursor
+
+    def test_pages_cover_every_product_once_in_order(self):
+        seen, _ = self.walk({'sort_by': 'price_asc'})
+        expected = list(Product.objects.order_by('price', 'id').values_list('pk', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_previous_cursor_returns_preceding_page(self):
+        first = self.client.get(reverse('product_list')).context['page_obj']
+        second = self.client.get(reverse('product_list'), {'cursor': first.next_cursor}).context['page_obj']
+        back = self.client.get(reverse('product_list'), {'cursor': second.previous_cursor}).context['page_obj']
+        self.assertEqual(list(back), list(first))
+        self.assertFalse(back.has_previous())
+
+    def test_no_count_query(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse('product_list'))
+        # Paginator.count issues SELECT COUNT(*) AS "__count"
+        self.assertFalse([q for q in ctx.captured_queries if '"__count"' in q['sql']])
+
+    def test_invalid_cursor_is_404(self):
+        response = self.client.get(reverse('product_list'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+
+class CategoryTreeTests(TestCase):
+    def setUp(self):
+        self.sports = Category.objects.create(name='Sports')
+        self.football = Category.objects.create(name='Football', parent=self.sports)
+        self.boots = Category.objects.create(name='Boots', parent=self.football)
+        self.hidden = Category.objects.create(name='Hidden', parent=self.sports, is_active=False)
+
+    def test_tree_is_served_from_memory(self):
+        get_category_tree()
+        with self.assertNumQueries(0):
+            tree = get_category_tree()
+            self.assertEqual(tree.ancestors(self.boots), [self.sports, self.football])
+            self.assertEqual(self.boots.get_full_path(), 'sports/football/boots')
+            self.assertEqual(
+                tree.descendant_ids(self.sports),
+                {self.sports.pk, self.football.pk, self.boots.pk, self.hidden.pk}
+            )
+            self.assertEqual(tree.children(self.sports), [self.football])
+
+    def test_save_and_move_invalidate_tree(self):
+        self.assertEqual(get_category_tree().get('boots').parent_id, self.football.pk)
+        self.boots.move_to(self.sports)
+        self.assertEqual(get_category_tree().get('boots').parent_id, self.sports.pk)
+        self.football.is_active = False
+        self.football.save()
+        self.assertNotIn(self.football, get_category_tree().active)
+
+    def test_active_product_counts_follow_product_changes(self):
+        product = Product.objects.create(
+            name='Speed Boots', category=self.boots, sku='BT-1', price=100, description='Boots',
+        )
+        Product.objects.create(
+            name='Retro Shirt', category=self.football, sku='SH-1', price=80, description='Shirt',
+        )
+        tree = get_category_tree()
+        self.assertEqual(tree.get('boots').active_product_count, 1)
+        self.assertEqual(tree.get('sports').total_product_count, 2)
+
+        product.category = self.football
+        product.save()
+        product = Product.objects.get(pk=product.pk)
+        product.is_active = False
+        product.save()
+        self.assertEqual(get_category_tree().get('football').active_product_count, 1)
+        self.assertEqual(get_category_tree().get('boots').active_product_count, 0)
+
+        Product.objects.get(sku='SH-1').delete()
+        self.assertEqual(get_category_tree().get('sports').total_product_count, 0)
+
+    def test_saving_a_category_keeps_counts_made_since_it_was_loaded(self):
+        boots = Category.objects.get(pk=self.boots.pk)
+        Product.objects.create(name='Speed Boots', category=self.boots, sku='BT-1', price=100, description='Boots')
+        boots.description = 'Football boots'
+        boots.save()
+        boots.move_to(self.sports)
+        boots.refresh_from_db()
+        self.assertEqual((boots.description, boots.parent_id), ('Football boots', self.sports.pk))
+        self.assertEqual(boots.active_product_count, 1)
+
+    def test_category_page_filters_by_descendants(self):
+        Product.objects.create(
+            name='Speed Boots', category=self.boots, sku='BT-1', price=100, description='Boots',
+        )
+        response = self.client.get(reverse('product_list_by_category', args=['football']))
+        self.assertEqual([p.sku for p in response.context['products']], ['BT-1'])
+        response = self.client.get(reverse('product_list_by_category', args=['missing']))
+        self.assertEqual(response.status_code, 404)
+
+
+class ProductExportTests(TestCase):
+    def test_admin_export_streams_csv(self):
+        category = Category.objects.create(name='Football')
+        products = [
+            Product.objects.create(
+                name=f'Jersey {i}', category=category, sku=f'SKU-{i}', price=100, description='Kit',
+            )
+            for i in range(3)
+        ]
+        admin_user = CustomUser.objects.create_superuser(username='boss', email='boss@example.com', password='pass')
+        self.client.force_login(admin_user)
+        response = self.client.post(reverse('admin:products_product_changelist'), {
+            'action': 'export_products', '_selected_action': [product.pk for product in products],
+        })
+
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertTrue(lines[0].startswith('Name,SKU,Category,Price'))
+        self.assertEqual(len(lines), 4)
+        self.assertTrue(any(line.startswith('Jersey 1,SKU-1,Football,100.00') for line in lines))
@@ -2,14 +2,18 @@ from django.views.generic import ListView, DetailView, CreateView, UpdateView, D
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse_lazy
+from django.http import Http404
 from django.contrib import messages
-from django.db.models import Q
 from django.urls import reverse
 from .models import Category, Product, ProductImage
 from .forms import ProductForm, ProductImageFormSet, CategoryForm
+from .search import search_products
+from .category_tree import get_category_tree
+from .facets import get_selected_facets, apply_facets, compute_facets
+from core.pagination import CursorPaginationMixin
 
 
-class ProductListView(ListView):
+class ProductListView(CursorPaginationMixin, ListView):
     """# Product List View"""
     model = Product
     template_name = 'products/product_list.html'
@@ -17,41 +21,50 @@ class ProductListView(ListView):
     paginate_by = 12
 
     def get_queryset(self):
-        queryset = super().get_queryset().filter(is_active=True)
+        queryset = super().get_queryset().for_cards().filter(is_active=True)
 
         # Filter by category
         category_slug = self.kwargs.get('category_slug')
         if category_slug:
-            category = get_object_or_404(Category, slug=category_slug)
-            descendants = category.get_descendants(include_self=True)
-            queryset = queryset.filter(category__in=descendants)
+            tree = get_category_tree()
+            category = tree.get(category_slug)
+            if category is None:
+                raise Http404("No category found matching the query")
+            queryset = queryset.filter(category_id__in=tree.descendant_ids(category))
 
         # Search functionality
         search_query = self.request.GET.get('q')
         if search_query:
-            queryset = queryset.filter(
-                Q(name__icontains=search_query) |
-                Q(description__icontains=search_query) |
-                Q(sku__icontains=search_query)
-            )
+            queryset = search_products(queryset, search_query)
+
+        # Faceted filtering, counts are computed against the unfaceted result set
+        self.facet_base_queryset = queryset
+        self.selected_facets = get_selected_facets(self.request.GET)
+        queryset = apply_facets(queryset, self.selected_facets)
 
-        # Sorting
+        # Sorting, the trailing id keeps the keyset pagination order unique
         sort_by = self.request.GET.get('sort_by', 'created_at')
-        if sort_by == 'price_asc':
-            queryset = queryset.order_by('price')
+        if search_query and 'sort_by' not in self.request.GET:
+            self.sort_ordering = ('-search_rank', '-id')
+        elif sort_by == 'price_asc':
+            self.sort_ordering = ('price', 'id')
         elif sort_by == 'price_desc':
-            queryset = queryset.order_by('-price')
+            self.sort_ordering = ('-price', '-id')
         elif sort_by == 'name':
-            queryset = queryset.order_by('name')
+            self.sort_ordering = ('name', 'id')
         else:
-            queryset = queryset.order_by('-created_at')
+            self.sort_ordering = ('-created_at', '-id')
 
-        return queryset
+        return queryset.order_by(*self.sort_ordering)
+
+    def get_cursor_ordering(self):
+        return self.sort_ordering
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['categories'] = Category.objects.filter(is_active=True)
+        context['categories'] = get_category_tree().active
         context['current_category'] = self.kwargs.get('category_slug')
+        context['facets'] = compute_facets(self.facet_base_queryset, self.selected_facets)
         return context
 
 
@@ -66,7 +79,7 @@ class ProductDetailView(DetailView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         product = self.object
-        context['related_products'] = Product.objects.filter(
+        context['related_products'] = Product.objects.for_cards().filter(
             category=product.category,
             is_active=True
         ).exclude(pk=self.object.pk)[:4]
@@ -76,7 +89,7 @@ class ProductDetailView(DetailView):
             {'name': product.category.name, 'url': product.category.get_absolute_url()},
             {'name': product.name, 'url': product.get_absolute_url()}
         ]
-        context['categories'] = Category.objects.filter(is_active=True)
+        context['categories'] = get_category_tree().active
         context['current_category'] = product.category.slug
         return context
 
@@ -168,7 +181,7 @@ class CategoryListView(ListView):
     context_object_name = 'categories'
 
     def get_queryset(self):
-        return Category.objects.filter(parent__isnull=True, is_active=True)
+        return get_category_tree().roots()
 
 
 class CategoryDetailView(DetailView):
@@ -178,22 +191,28 @@ class CategoryDetailView(DetailView):
     slug_field = 'slug'
     slug_url_kwarg = 'slug'
 
+    def get_object(self, queryset=None):
+        category = get_category_tree().get(self.kwargs.get(self.slug_url_kwarg))
+        if category is None:
+            raise Http404("No category found matching the query")
+        return category
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         category = self.object
-        context['products'] = Product.objects.filter(
+        context['products'] = Product.objects.for_cards().filter(
             category=category,
             is_active=True
         )[:12]
         context['breadcrumbs'] = self.get_breadcrumbs(category)
-        context['subcategories'] = self.object.get_children().filter(is_active=True)
+        context['subcategories'] = get_category_tree().children(category)
         return context
 
     def get_breadcrumbs(self, category):
         return [{
             'name': ancestor.name,
             'url': ancestor.get_absolute_url()
-        } for ancestor in category.get_ancestors(include_self=True)]
+        } for ancestor in get_category_tree().ancestors(category, include_self=True)]
 
 
 class CategoryCreateView(LoginRequiredMixin, UserPassesTestMixin, CreateView):
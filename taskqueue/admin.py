@@ -0,0 +1,22 @@
+from django.contrib import admin
+from django.utils import timezone
+
+from .models import Task
+
+
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ('name', 'status', 'attempts', 'max_attempts', 'run_at', 'finished_at')
+    list_filter = ('status', 'name')
+    search_fields = ('name',)
+    readonly_fields = ('created_at', 'started_at', 'finished_at', 'last_error')
+    date_hierarchy = 'created_at'
+    actions = ['requeue']
+
+    def requeue(self, request, queryset):
+        count = queryset.exclude(status='R').update(status='Q', attempts=0, run_at=timezone.now())
+        self.message_user(request, f"{count} tasks queued again")
+
+    requeue.short_description = "Queue selected tasks again"
+
+
+admin.site.register(Task, TaskAdmin)
@@ -0,0 +1,46 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from taskqueue.runner import claim, run, run_in_thread
+
+
+class Command(BaseCommand):
+    help = (
+        "Run queued background tasks (emails, notifications, ...) on a pool of threads, "
+        "retrying failures with exponential backoff. Polls forever unless --once is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help="Tasks run at the same time")
+        parser.add_argument('--batch-size', type=int, default=20)
+        parser.add_argument('--interval', type=float, default=1.0, help="Seconds between polls when idle")
+        parser.add_argument('--stale-after', type=int, default=600,
+                            help="Seconds after which a running task is assumed lost and run again")
+        parser.add_argument('--once', action='store_true', help="Exit once no task is due")
+
+    def handle(self, *args, **options):
+        stale_after = timedelta(seconds=options['stale_after'])
+        succeeded = failed = 0
+        # A single worker runs tasks in this thread, without a pool
+        pool = ThreadPoolExecutor(max_workers=options['workers']) if options['workers'] > 1 else None
+        try:
+            while True:
+                tasks = claim(options['batch_size'], stale_after)
+                if not tasks:
+                    if options['once']:
+                        break
+                    time.sleep(options['interval'])
+                    continue
+                results = pool.map(run_in_thread, tasks) if pool else map(run, tasks)
+                for ok in results:
+                    if ok:
+                        succeeded += 1
+                    else:
+                        failed += 1
+        finally:
+            if pool:
+                pool.shutdown()
+        self.stdout.write(self.style.SUCCESS(f"Ran {succeeded + failed} tasks, {failed} failed"))
@@ -0,0 +1,98 @@
+import logging
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+
+MAX_RETRY_DELAY = 60 * 60
+
+
+def task(func=None, *, max_attempts=3):
+    """
+    Register `func` as a background task. `func.delay(*args, **kwargs)` queues a
+    call for the run_tasks worker instead of running it; arguments must be JSON
+    serialisable, so pass ids rather than model instances.
+    """
+    def register(func):
+        name = f'{func.__module__}.{func.__name__}'
+        _registry[name] = func
+        func.task_name = name
+        func.delay = lambda *args, **kwargs: enqueue(name, args, kwargs, max_attempts=max_attempts)
+        return func
+    return register(func) if func is not None else register
+
+
+def get_task(name):
+    return _registry[name]
+
+
+def enqueue(name, args=(), kwargs=None, max_attempts=3, run_at=None):
+    """
+    Queue a call to the task `name`. The row is written in the caller's transaction,
+    so a rolled back request never leaves work behind. With settings.TASKS_EAGER the
+    task runs right away instead (development without a worker).
+    """
+    if settings.TASKS_EAGER:
+        get_task(name)(*args, **(kwargs or {}))
+        return None
+    return Task.objects.create(
+        name=name, args=list(args), kwargs=kwargs or {}, max_attempts=max_attempts,
+        run_at=run_at or timezone.now(),
+    )
+
+
+def retry_delay(attempts):
+    """Exponential backoff: TASKS_RETRY_DELAY seconds, doubled after each failed attempt."""
+    return timedelta(seconds=min(settings.TASKS_RETRY_DELAY * 2 ** (attempts - 1), MAX_RETRY_DELAY))
+
+
+@transaction.atomic
+def claim(batch_size, stale_after=None):
+    """
+    Mark up to `batch_size` due tasks as running and return them. Tasks left running
+    for longer than `stale_after` (their worker died) are picked up again.
+    """
+    now = timezone.now()
+    due = Q(status='Q', run_at__lte=now)
+    if stale_after:
+        due |= Q(status='R', started_at__lt=now - stale_after)
+    ids = list(
+        Task.objects.select_for_update(skip_locked=True).filter(due)
+        .order_by('run_at', 'id').values_list('pk', flat=True)[:batch_size]
+    )
+    Task.objects.filter(pk__in=ids).update(status='R', started_at=now, attempts=F('attempts') + 1)
+    return list(Task.objects.filter(pk__in=ids).order_by('run_at', 'id'))
+
+
+def run(task):
+    """Run a claimed task and record the outcome, scheduling a retry if it failed."""
+    try:
+        get_task(task.name)(*task.args, **task.kwargs)
+    except Exception as e:
+        logger.exception("Task %s (%s) failed", task.pk, task.name)
+        error = ''.join(traceback.format_exception(e))
+        if task.attempts < task.max_attempts:
+            Task.objects.filter(pk=task.pk).update(
+                status='Q', run_at=timezone.now() + retry_delay(task.attempts), last_error=error
+            )
+        else:
+            Task.objects.filter(pk=task.pk).update(status='F', finished_at=timezone.now(), last_error=error)
+        return False
+    Task.objects.filter(pk=task.pk).update(status='D', finished_at=timezone.now())
+    return True
+
+
+def run_in_thread(task):
+    try:
+        return run(task)
+    finally:
+        close_old_connections()
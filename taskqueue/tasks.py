@@ -0,0 +1,12 @@
+from django.conf import settings
+from django.core.mail import send_mail
+
+from .runner import task
+
+
+@task(max_attempts=5)
+def send_email(subject, message, recipient_list, from_email=None, html_message=None):
+    send_mail(
+        subject, message, from_email or settings.DEFAULT_FROM_EMAIL, recipient_list,
+        fail_silently=False, html_message=html_message,
+    )
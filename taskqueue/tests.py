@@ -0,0 +1,121 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core import mail
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from chat.models import ChatRoom, Message
+from notifications.models import Notification
+from users.models import CustomUser
+from .models import Task
+from .runner import claim, retry_delay, run, task
+
+calls = []
+
+
+@task
+def record(value):
+    calls.append(value)
+
+
+@task(max_attempts=2)
+def explode():
+    raise RuntimeError("boom")
+
+
+def run_tasks():
+    call_command('run_tasks', '--once', '--workers', '1', stdout=StringIO())
+
+
+class TaskQueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_delay_queues_until_the_worker_runs(self):
+        record.delay('hello')
+        self.assertEqual(calls, [])
+        self.assertEqual(Task.objects.get().name, 'taskqueue.tests.record')
+
+        run_tasks()
+        self.assertEqual(calls, ['hello'])
+        self.assertEqual(Task.objects.get().status, 'D')
+
+    @override_settings(TASKS_EAGER=True)
+    def test_eager_mode_runs_inline(self):
+        record.delay('now')
+        self.assertEqual(calls, ['now'])
+        self.assertFalse(Task.objects.exists())
+
+    @override_settings(TASKS_RETRY_DELAY=30)
+    def test_failures_back_off_then_give_up(self):
+        explode.delay()
+        with self.assertLogs('taskqueue.runner', 'ERROR'):
+            run_tasks()
+        failed = Task.objects.get()
+        self.assertEqual((failed.status, failed.attempts), ('Q', 1))
+        self.assertIn("RuntimeError: boom", failed.last_error)
+        self.assertGreater(failed.run_at, timezone.now() + timedelta(seconds=25))
+        self.assertEqual(retry_delay(3), timedelta(seconds=120))
+
+        # Not due yet
+        run_tasks()
+        self.assertEqual(Task.objects.get().attempts, 1)
+
+        Task.objects.update(run_at=timezone.now())
+        with self.assertLogs('taskqueue.runner', 'ERROR'):
+            run_tasks()
+        failed = Task.objects.get()
+        self.assertEqual((failed.status, failed.attempts), ('F', 2))
+
+    def test_stale_running_tasks_are_reclaimed(self):
+        record.delay('lost')
+        claimed, = claim(10)
+        self.assertEqual(claim(10, stale_after=timedelta(minutes=10)), [])
+
+        Task.objects.update(started_at=timezone.now() - timedelta(minutes=11))
+        reclaimed, = claim(10, stale_after=timedelta(minutes=10))
+        self.assertEqual((reclaimed.pk, reclaimed.attempts), (claimed.pk, 2))
+        self.assertTrue(run(reclaimed))
+        self.assertEqual(calls, ['lost'])
+
+
+class SideEffectTaskTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='fan', email='fan@example.com', password='pass')
+        self.staff = CustomUser.objects.create_user(
+            username='staff', email='staff@example.com', password='pass', is_staff=True
+        )
+
+    @override_settings(NOTIFICATION_COALESCE_WINDOW=0)
+    def test_notifications_are_created_by_the_worker(self):
+        room = ChatRoom.objects.create(user=self.user, admin=self.staff)
+        Message.objects.create(chat_room=room, sender=self.staff, content='Hello')
+        self.assertFalse(Notification.objects.exists())
+
+        run_tasks()
+        notification = Notification.objects.get()
+        self.assertEqual((notification.user, notification.notification_type), (self.user, 'chat'))
+
+    def test_registration_email_is_sent_by_the_worker(self):
+        self.client.post(reverse('register'), {
+            'username': 'newfan', 'email': 'newfan@example.com',
+            'password1': 'S3cure-pass-word', 'password2': 'S3cure-pass-word',
+        })
+        self.assertTrue(CustomUser.objects.filter(email='newfan@example.com', is_active=False).exists())
+        self.assertEqual(mail.outbox, [])
+
+        run_tasks()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['newfan@example.com'])
+        self.assertIn('/activate/', mail.outbox[0].body)
+
+    def test_contact_email_is_queued(self):
+        self.client.post(reverse('contact'), {
+            'name': 'Fan', 'email': 'fan@example.com', 'subject': 'Kits', 'message': 'When?',
+        })
+        self.assertEqual(mail.outbox, [])
+        run_tasks()
+        self.assertEqual(mail.outbox[0].subject, 'Kits')
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from users.models import UserCounters
+
+
+class Command(BaseCommand):
+    help = "Recompute every user's unread notification, wishlist and message counters"
+
+    def handle(self, *args, **options):
+        UserCounters.recount()
+        self.stdout.write(self.style.SUCCESS("User counters recomputed"))
@@ -0,0 +1,51 @@
+# Generated by Django 5.0 on 2026-10-18 18:36
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Q
+
+
+def populate_counters(apps, schema_editor):
+    CustomUser = apps.get_model('users', 'CustomUser')
+    UserCounters = apps.get_model('users', 'UserCounters')
+    Notification = apps.get_model('notifications', 'Notification')
+    WishlistItem = apps.get_model('wishlist', 'WishlistItem')
+    Message = apps.get_model('chat', 'Message')
+
+    UserCounters.objects.bulk_create([
+        UserCounters(
+            user_id=user_id,
+            unread_notifications=Notification.objects.filter(user_id=user_id, is_read=False).count(),
+            wishlist_items=WishlistItem.objects.filter(wishlist__user_id=user_id).count(),
+            unread_messages=Message.objects.filter(
+                Q(chat_room__user_id=user_id) | Q(chat_room__admin_id=user_id), is_read=False,
+            ).exclude(sender_id=user_id).count(),
+        )
+        for user_id in CustomUser.objects.values_list('pk', flat=True)
+    ])
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_keyset_pagination_indexes'),
+        ('chat', '0001_initial'),
+        ('notifications', '0002_keyset_pagination_indexes'),
+        ('wishlist', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserCounters',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='counters', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('unread_notifications', models.PositiveIntegerField(default=0)),
+                ('wishlist_items', models.PositiveIntegerField(default=0)),
+                ('unread_messages', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'User counters',
+            },
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
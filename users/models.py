@@ -1,5 +1,7 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
 
 
 class CustomUser(AbstractUser):
@@ -22,5 +24,92 @@ class CustomUser(AbstractUser):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            models.Index(fields=['date_joined', 'id'], name='user_date_joined_idx'),
+        ]
+
     def __str__(self):
         return self.email
+
+
+class UserCounters(models.Model):
+    """
+    Denormalised navbar badge counts, adjusted atomically by the notification,
+    wishlist and chat signal handlers so reading them is a single row lookup.
+    """
+    user = models.OneToOneField(CustomUser, on_delete=models.CASCADE, primary_key=True, related_name='counters')
+    unread_notifications = models.PositiveIntegerField(default=0)
+    wishlist_items = models.PositiveIntegerField(default=0)
+    unread_messages = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = "User counters"
+
+    def __str__(self):
+        return f"Counters for {self.user_id}"
+
+    @classmethod
+    def get_for(cls, user):
+        # Read-only: a user without a row yet simply has nothing to count
+        return cls.objects.filter(user_id=user.pk).first() or cls(user_id=user.pk)
+
+    @classmethod
+    def for_request(cls, request):
+        """The current user's counters, loaded once per request and shared by every caller."""
+        from core.lazy_context import request_memo
+        return request_memo(request, 'user_counters', lambda: cls.get_for(request.user))
+
+    @classmethod
+    def lock(cls, user):
+        """
+        Lock the user's row until the end of the transaction, creating it if missing:
+        a per-user mutex for check-then-act sequences such as the trivia daily limit.
+        """
+        return cls.objects.select_for_update().get_or_create(user_id=user.pk)[0]
+
+    @classmethod
+    def adjust(cls, user_id, **deltas):
+        """Add `deltas` (e.g. unread_notifications=-1) with a single UPDATE, never going below zero."""
+        changes = {field: Greatest(F(field) + delta, Value(0)) for field, delta in deltas.items() if delta}
+        if not changes:
+            return
+        updated = cls.objects.filter(user_id=user_id).update(**changes)
+        # Only increments create the row; a decrement on a missing row (e.g. while the
+        # user is being deleted) has nothing to take away from
+        if not updated and any(delta > 0 for delta in deltas.values()):
+            cls.objects.get_or_create(user_id=user_id)
+            cls.objects.filter(user_id=user_id).update(**changes)
+
+    @classmethod
+    def increment_many(cls, field, counts):
+        """
+        Add counts[user_id] to `field` for many users at once, for writes that bypass
+        the signal handlers (bulk_create). Users sharing an increment share one UPDATE.
+        """
+        counts = {user_id: count for user_id, count in counts.items() if count > 0}
+        if not counts:
+            return
+        cls.objects.bulk_create([cls(user_id=user_id) for user_id in counts], ignore_conflicts=True)
+        by_count = {}
+        for user_id, count in counts.items():
+            by_count.setdefault(count, []).append(user_id)
+        for count, user_ids in by_count.items():
+            cls.objects.filter(user_id__in=user_ids).update(**{field: F(field) + count})
+
+    @classmethod
+    def recount(cls, user_ids=None):
+        """Recompute counters from the source tables, e.g. after bulk updates."""
+        from chat.models import Message
+        from notifications.models import Notification
+        from wishlist.models import WishlistItem
+
+        users = CustomUser.objects.all()
+        if user_ids is not None:
+            users = users.filter(pk__in=user_ids)
+        for user_id in users.values_list('pk', flat=True).iterator():
+            cls.objects.update_or_create(user_id=user_id, defaults={
+                'unread_notifications': Notification.objects.filter(user_id=user_id, is_read=False).count(),
+                'wishlist_items': WishlistItem.objects.filter(wishlist__user_id=user_id).count(),
+                'unread_messages': Message.unread_for(user_id).count(),
+            })
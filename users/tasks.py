@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.mail import send_mail
+from django.template.loader import render_to_string
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from taskqueue.runner import task
+
+from .models import CustomUser
+from .tokens import account_activation_token
+
+
+@task(max_attempts=5)
+def send_verification_email(user_id, domain):
+    user = CustomUser.objects.filter(pk=user_id, is_active=False).first()
+    if user is None:
+        # Already verified, or the account is gone
+        return
+    message = render_to_string('users/email_verification.html', {
+        'user': user,
+        'domain': domain,
+        'uid': urlsafe_base64_encode(force_bytes(user.pk)),
+        'token': account_activation_token.make_token(user),
+    })
+    send_mail(
+        'Activate your Sports Shop account',
+        message,
+        settings.EMAIL_HOST_USER,
+        [user.email],
+        html_message=message
+    )
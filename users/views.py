@@ -2,14 +2,12 @@ from django.shortcuts import render, redirect
 from django.contrib.auth import login, authenticate, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.conf import settings
-from django.core.mail import send_mail
-from django.template.loader import render_to_string
-from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
-from django.utils.encoding import force_bytes, force_str
+from django.utils.http import urlsafe_base64_decode
+from django.utils.encoding import force_str
 from django.contrib.sites.shortcuts import get_current_site
 from .models import CustomUser
 from .forms import UserRegistrationForm, UserLoginForm, UserProfileForm, CustomUserUpdateForm, CustomUserUpdateForm2
+from .tasks import send_verification_email
 from .tokens import account_activation_token
 from leaderboard.models import UserDiscount
 
@@ -18,13 +16,15 @@ from django.views.generic import ListView, UpdateView, DeleteView
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.urls import reverse_lazy
 from django.db import models
+from core.pagination import CursorPaginationMixin
 
 
-class UserListView(LoginRequiredMixin, UserPassesTestMixin, ListView):
+class UserListView(LoginRequiredMixin, UserPassesTestMixin, CursorPaginationMixin, ListView):
     model = CustomUser
     template_name = 'users/list.html'
     context_object_name = 'users'
     paginate_by = 20
+    cursor_ordering = ('-date_joined', '-id')
 
     def test_func(self):
         return self.request.user.is_staff
@@ -93,22 +93,8 @@ def register_view(request):
             user.is_active = False  # User inactive until email verification
             user.save()
 
-            # Send verification email
-            current_site = get_current_site(request)
-            mail_subject = 'Activate your Sports Shop account'
-            message = render_to_string('users/email_verification.html', {
-                'user': user,
-                'domain': current_site.domain,
-                'uid': urlsafe_base64_encode(force_bytes(user.pk)),
-                'token': account_activation_token.make_token(user),
-            })
-            send_mail(
-                mail_subject,
-                message,
-                settings.EMAIL_HOST_USER,
-                [user.email],
-                html_message=message
-            )
+            # Send verification email from the task worker
+            send_verification_email.delay(user.pk, get_current_site(request).domain)
 
             messages.success(request, 'Please confirm your email address to complete registration')
             return redirect('login')
@@ -1,9 +1,6 @@
+from core.lazy_context import lazy_context
 from . models import SiteConfiguration
 
 
 def site_config(request):
-    try:
-        site_config_obj = SiteConfiguration.objects.first()
-    except Exception as e:
-        site_config_obj = None
-    return {'site_config': site_config_obj}
+    return {'site_config': lazy_context(request, 'site_config', SiteConfiguration.get_cached)}
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from website.query_plans import audit_query_plans
+
+
+class Command(BaseCommand):
+    help = "EXPLAIN the representative hot-path queries and flag any that fall back to a full table scan"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose-plans', action='store_true', help="Print every query plan")
+
+    def handle(self, *args, **options):
+        flagged = []
+        for label, plan, scans in audit_query_plans():
+            if scans:
+                flagged.append(label)
+                self.stdout.write(self.style.ERROR(f"{label}: full scan of {', '.join(scans)}"))
+            else:
+                self.stdout.write(f"{label}: ok")
+            if scans or options['verbose_plans']:
+                self.stdout.write(plan)
+
+        if flagged:
+            raise CommandError(f"{len(flagged)} queries scan a whole table: {', '.join(flagged)}")
+        self.stdout.write(self.style.SUCCESS("Every query uses an index"))
@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from products.models import Category, Product
+from users.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = "Render the main pages and report the number of database queries each one runs"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--email', help="Render the pages logged in as this user")
+
+    def get_urls(self, logged_in):
+        urls = [
+            reverse('home'),
+            reverse('product_list'),
+            reverse('category_list'),
+            reverse('cart_detail'),
+            reverse('contact'),
+            reverse('notifications_unread_count'),
+        ]
+        product = Product.objects.filter(is_active=True).first()
+        if product:
+            urls.append(product.get_absolute_url())
+        category = Category.objects.filter(is_active=True).first()
+        if category:
+            urls.append(category.get_absolute_url())
+            urls.append(reverse('product_list_by_category', args=[category.slug]))
+        if logged_in:
+            urls += [
+                reverse('notifications'),
+                reverse('order_list'),
+                reverse('wishlist'),
+                reverse('game_home'),
+                reverse('profile'),
+            ]
+        return urls
+
+    def handle(self, *args, **options):
+        client = Client()
+        if options['email']:
+            try:
+                client.force_login(CustomUser.objects.get(email=options['email']))
+            except CustomUser.DoesNotExist:
+                raise CommandError(f"No user with email {options['email']}")
+
+        for url in self.get_urls(logged_in=bool(options['email'])):
+            client.get(url)  # warm process-level caches
+            with CaptureQueriesContext(connection) as ctx:
+                response = client.get(url)
+            self.stdout.write(f"{len(ctx.captured_queries):4d} queries  {response.status_code}  {url}")
@@ -1,7 +1,18 @@
+import time
+
+from django.core.cache import cache
 from django.db import models
 
+_MISSING = object()
+
 
 class SiteConfiguration(models.Model):
+    CACHE_KEY = 'website:site_configuration'
+    LOCAL_CACHE_TTL = 60  # seconds a process trusts its own copy before re-checking the shared cache
+
+    # (expires_at, configuration) for this process
+    _local_cache = None
+
     site_name = models.CharField(max_length=100, default='Sports Shop')
     site_logo = models.ImageField(upload_to='site/')
     offer_message = models.CharField(max_length=300,  default='Welcome to SportsHub!', null=True, blank=True)
@@ -21,6 +32,26 @@ class SiteConfiguration(models.Model):
     class Meta:
         verbose_name = "Site Configuration"
 
+    @classmethod
+    def get_cached(cls):
+        """The active configuration (or None), served from process memory and the shared cache."""
+        now = time.monotonic()
+        local = cls._local_cache
+        if local is not None and local[0] > now:
+            return local[1]
+
+        config = cache.get(cls.CACHE_KEY, _MISSING)
+        if config is _MISSING:
+            config = cls.objects.first()
+            cache.set(cls.CACHE_KEY, config, None)
+        cls._local_cache = (now + cls.LOCAL_CACHE_TTL, config)
+        return config
+
+    @classmethod
+    def clear_cache(cls):
+        cache.delete(cls.CACHE_KEY)
+        cls._local_cache = None
+
 
 class Banner(models.Model):
     title = models.CharField(max_length=200)
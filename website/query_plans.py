@@ -0,0 +1,95 @@
+import re
+from contextlib import contextmanager
+
+from django.db import connection, transaction
+from django.db.models import Count, Exists, OuterRef
+from django.utils import timezone
+
+# SQLite: "SCAN products_product" is a full scan, "SCAN t USING [COVERING] INDEX ..." walks an index
+SQLITE_FULL_SCAN_RE = re.compile(r'\bSCAN (?!.*\bUSING\b.*\bINDEX\b)(\S+)')
+POSTGRES_FULL_SCAN_RE = re.compile(r'\bSeq Scan on (\S+)')
+
+
+def representative_queries():
+    """
+    (label, queryset) pairs mirroring the filters and orderings of the hot pages.
+    The ids are placeholders, the planner only needs the shape of the query.
+    """
+    from chat.models import Message
+    from leaderboard.models import TriviaAnswer, TriviaQuestion, UserDiscount
+    from leaderboard.ranking import MonthlyLeaderboard
+    from notifications.models import Notification
+    from orders.models import Order
+    from products.models import Product
+    from users.models import UserCounters
+
+    now = timezone.now()
+    board = MonthlyLeaderboard(now.year, now.month)
+    return [
+        ('notifications.unread',
+         Notification.objects.filter(user_id=1, is_read=False).order_by('-created_at')),
+        ('notifications.list',
+         Notification.objects.filter(user_id=1).order_by('-created_at', '-id')[:11]),
+        ('orders.list',
+         Order.objects.filter(user_id=1).order_by('-created_at', '-id')[:11]),
+        ('leaderboard.current',
+         board.scores().order_by(*board.ordering)[:5]),
+        ('leaderboard.ahead_of',
+         board.ahead_of(10, 1)),
+        ('leaderboard.active_discount',
+         UserDiscount.objects.filter(user_id=1, is_used=False, expires_at__gte=now)),
+        ('leaderboard.question_candidates',
+         TriviaQuestion.objects.filter(is_active=True, pk__in=[1, 2, 3]).exclude(
+             Exists(TriviaAnswer.objects.filter(user_id=1, question=OuterRef('pk'))))),
+        ('leaderboard.answered_today',
+         TriviaAnswer.objects.filter(user_id=1, answered_at__gte=now)),
+        ('products.list',
+         Product.objects.filter(is_active=True).order_by('-created_at', '-id')[:13]),
+        ('products.list_by_price',
+         Product.objects.filter(is_active=True).order_by('price', 'id')[:13]),
+        ('products.brand_facet',
+         Product.objects.filter(is_active=True).order_by().values('brand').annotate(count=Count('pk'))),
+        ('products.category',
+         Product.objects.filter(category_id__in=[1, 2, 3], is_active=True)),
+        ('chat.history',
+         Message.objects.filter(chat_room_id=1).order_by('created_at')),
+        ('chat.unread',
+         Message.unread_for(1)),
+        ('chat.mark_read',
+         Message.objects.filter(chat_room_id=1, is_read=False).exclude(sender_id=1)),
+        ('users.counters',
+         UserCounters.objects.filter(user_id=1)),
+        ('dashboard.unread_messages',
+         Message.objects.filter(is_read=False).exclude(sender_id=1)),
+    ]
+
+
+@contextmanager
+def planner_without_seq_scans():
+    """
+    PostgreSQL happily seq-scans tiny tables, which would hide a missing index on a
+    development database. Discourage it for the audit so a Seq Scan means "no usable index".
+    """
+    if connection.vendor != 'postgresql':
+        yield
+        return
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        yield
+
+
+def full_scans(plan):
+    """Tables the plan reads in full."""
+    pattern = POSTGRES_FULL_SCAN_RE if connection.vendor == 'postgresql' else SQLITE_FULL_SCAN_RE
+    return [match.group(1) for match in pattern.finditer(plan)]
+
+
+def audit_query_plans(queries=None):
+    """Explain each query and return (label, plan, full_scans) tuples."""
+    results = []
+    with planner_without_seq_scans():
+        for label, queryset in queries or representative_queries():
+            plan = queryset.explain()
+            results.append((label, plan, full_scans(plan)))
+    return results
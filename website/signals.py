@@ -0,0 +1,12 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import SiteConfiguration
+
+
+@receiver(post_save, sender=SiteConfiguration)
+@receiver(post_delete, sender=SiteConfiguration)
+def clear_site_configuration_cache(sender, **kwargs):
+    SiteConfiguration.clear_cache()
+    # Clear again once committed, so a reader that cached the old row mid-transaction is discarded
+    transaction.on_commit(SiteConfiguration.clear_cache)
@@ -1,3 +1,61 @@
+from django.core.cache import cache
 from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from products.models import Product
+from .models import SiteConfiguration
+from .query_plans import audit_query_plans
+
+
+class SiteConfigurationCacheTests(TestCase):
+    def setUp(self):
+        SiteConfiguration.clear_cache()
+
+    def test_get_cached_hits_database_once(self):
+        config = SiteConfiguration.objects.create(site_name='Sports Shop', contact_phone='1', address='Dhaka')
+        self.assertEqual(SiteConfiguration.get_cached(), config)
+        with self.assertNumQueries(0):
+            self.assertEqual(SiteConfiguration.get_cached(), config)
+
+    def test_save_and_delete_invalidate(self):
+        self.assertIsNone(SiteConfiguration.get_cached())
+        config = SiteConfiguration.objects.create(site_name='Sports Shop', contact_phone='1', address='Dhaka')
+        self.assertEqual(SiteConfiguration.get_cached().site_name, 'Sports Shop')
+        config.shipping_cost = 60
+        config.save()
+        self.assertEqual(SiteConfiguration.get_cached().shipping_cost, 60)
+        config.delete()
+        self.assertIsNone(SiteConfiguration.get_cached())
+
+    def test_copy_cached_before_commit_is_discarded(self):
+        config = SiteConfiguration.objects.create(site_name='Sports Shop', contact_phone='1', address='Dhaka')
+        stale = SiteConfiguration.objects.get(pk=config.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            config.shipping_cost = 60
+            config.save()
+            # Another request reading before the commit caches the old row again
+            cache.set(SiteConfiguration.CACHE_KEY, stale, None)
+        self.assertEqual(SiteConfiguration.get_cached().shipping_cost, 60)
+
+
+class LazyContextProcessorTests(TestCase):
+    def test_unrendered_context_costs_nothing(self):
+        # The JSON endpoint never touches the navbar context, so no processor hits the database
+        with self.assertNumQueries(0):
+            self.client.get(reverse('notifications_unread_count'))
+
+    def test_anonymous_page_does_not_write_session(self):
+        self.client.get(reverse('contact'))
+        with self.assertNumQueries(0):
+            self.client.get(reverse('contact'))
+
+
+class QueryPlanAuditTests(TestCase):
+    def test_hot_path_queries_use_indexes(self):
+        for label, plan, scans in audit_query_plans():
+            with self.subTest(label):
+                self.assertEqual(scans, [], plan)
+
+    def test_unindexed_filter_is_flagged(self):
+        results = audit_query_plans([('description', Product.objects.filter(description='x'))])
+        self.assertEqual(results[0][2], [Product._meta.db_table])
@@ -1,9 +1,10 @@
 from django.shortcuts import render, redirect
 from django.contrib import messages
 from django.conf import settings
-from django.core.mail import BadHeaderError, send_mail
 from .models import SiteConfiguration, Banner, ContactUs
-from products.models import Product, Category
+from products.models import Product
+from products.category_tree import get_category_tree
+from taskqueue.tasks import send_email
 
 from django.urls import reverse_lazy
 from django.views.generic import ListView, CreateView, UpdateView, DeleteView, DetailView
@@ -11,13 +12,10 @@ from .forms import SiteConfigurationForm, BannerForm
 
 
 def home_page(request):
-    try:
-        site_config = SiteConfiguration.objects.first()
-    except Exception as e:
-        site_config = None
+    site_config = SiteConfiguration.get_cached()
     banners = Banner.objects.filter(is_active=True).order_by('-created_at')[:5]
-    products = Product.objects.filter(is_active=True).order_by('-created_at')[:8]  # latest 8 products
-    categories = Category.objects.filter(is_active=True)[:3]
+    products = Product.objects.for_cards().filter(is_active=True).order_by('-created_at')[:8]  # latest 8 products
+    categories = get_category_tree().active[:3]
     context = {
         'site_config': site_config,
         'banners': banners,
@@ -96,25 +94,19 @@ def contact(request):
         if name and email and subject and message:
             ContactUs(name=name, email=email,
                       subject=subject, message=message).save()
-            try:
-                from_email = settings.DEFAULT_FROM_EMAIL
-                send_mail(subject, message, from_email, [
-                          email],  fail_silently=False,)
-                messages.success(request, f"Hello {name},\nThanks for contact with us!")
-                return redirect('home')
-            except BadHeaderError as error:
-                messages.error(request, f"{error}")
+            # The mail backend would refuse these with BadHeaderError once the task ran
+            if any('\n' in value or '\r' in value for value in (subject, email)):
+                messages.error(request, "Header values can't contain newlines")
                 return redirect('home')
+            send_email.delay(subject, message, [email], settings.DEFAULT_FROM_EMAIL)
+            messages.success(request, f"Hello {name},\nThanks for contact with us!")
+            return redirect('home')
         else:
             messages.error(request, f"Mail Subject or message body or your email error")
             return redirect('home')
     else:
         context = {}
-        try:
-            site_config_obj = SiteConfiguration.objects.first()
-        except Exception as e:
-            site_config_obj = None
-
+        site_config_obj = SiteConfiguration.get_cached()
         if site_config_obj:
             context['site_config'] = site_config_obj
         return render(request, 'website/contact.html', context)
@@ -1,8 +1,11 @@
-from .models import Wishlist
+from core.lazy_context import lazy_context
+from users.models import UserCounters
 
 
 def wishlist_count(request):
-    if request.user.is_authenticated:
-        wishlist, created = Wishlist.objects.get_or_create(user=request.user)
-        return {'wishlist_count': wishlist.items.count()}
-    return {'wishlist_count': 0}
+    def count():
+        if request.user.is_authenticated:
+            return UserCounters.for_request(request).wishlist_items
+        return 0
+
+    return {'wishlist_count': lazy_context(request, 'wishlist_count', count)}
@@ -1,10 +1,21 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from users.models import CustomUser
-from .models import Wishlist
+from users.models import CustomUser, UserCounters
+from .models import Wishlist, WishlistItem
 
 
 @receiver(post_save, sender=CustomUser)
 def create_user_wishlist(sender, instance, created, **kwargs):
     if created:
         Wishlist.objects.create(user=instance)
+
+
+@receiver(post_save, sender=WishlistItem)
+def count_wishlist_item(sender, instance, created, **kwargs):
+    if created:
+        UserCounters.adjust(instance.wishlist.user_id, wishlist_items=1)
+
+
+@receiver(post_delete, sender=WishlistItem)
+def release_wishlist_item(sender, instance, **kwargs):
+    UserCounters.adjust(instance.wishlist.user_id, wishlist_items=-1)
@@ -2,8 +2,9 @@ from django.views.generic import ListView
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.shortcuts import get_object_or_404, redirect
 from django.contrib import messages
+from django.db.models import Prefetch
 from .models import Wishlist, WishlistItem
-from products.models import Product
+from products.models import Product, ProductImage
 
 
 class WishlistView(LoginRequiredMixin, ListView):
@@ -13,7 +14,13 @@ class WishlistView(LoginRequiredMixin, ListView):
 
     def get_queryset(self):
         wishlist, created = Wishlist.objects.get_or_create(user=self.request.user)
-        return wishlist.items.select_related('product').all()
+        return wishlist.items.select_related('product').prefetch_related(
+            Prefetch(
+                'product__images',
+                queryset=ProductImage.objects.order_by('-is_default', 'id'),
+                to_attr='card_images',
+            )
+        )
 
 
 def add_to_wishlist(request, product_id):